@@ -0,0 +1,129 @@
+"""Actualización masiva de usuarios con los datos de Gestión de Identidades.
+
+Las consultas al WS de Identidades se hacen en paralelo desde un número limitado de hilos, que
+comparten el cliente SOAP de `accounts.soap` y sus conexiones persistentes.  Los usuarios se
+guardan al final con un único `bulk_update`, y el error de un usuario no impide actualizar al
+resto.
+"""
+
+import statistics
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from social_django.models import UserSocialAuth
+
+from indo.loaders import TIPOS_COORDINADOR
+
+from .models import CustomUser
+from .pipeline import (
+    CAMPOS_IDENTIDAD,
+    aplicar_identidad,
+    guardar_relaciones,
+    obtener_identidad,
+)
+
+
+def _consultar(usuario: CustomUser) -> tuple:
+    inicio = time.monotonic()
+    try:
+        identidad, aviso = obtener_identidad(usuario.username)
+    except Exception as err:
+        return usuario, None, None, err, time.monotonic() - inicio
+    return usuario, identidad, aviso, None, time.monotonic() - inicio
+
+
+def actualizar_identidades(usuarios: Iterable[CustomUser], hilos: int | None = None) -> dict:
+    """Actualiza los usuarios indicados con los datos de Gestión de Identidades.
+
+    Devuelve un diccionario con el número de usuarios actualizados, los errores y advertencias
+    del WS por NIP, y las métricas de la ejecución (duración, usuarios por segundo y latencia
+    media y percentil 95 de las consultas, en milisegundos).
+    """
+    # Un mismo usuario puede coordinar varios proyectos: se consulta una sola vez.
+    usuarios = list({usuario.pk: usuario for usuario in usuarios if usuario is not None}.values())
+    actualizados = []
+    errores = {}
+    avisos = {}
+    latencias = []
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=hilos or settings.SOAP_CONEXIONES) as ejecutor:
+        for usuario, identidad, aviso, err, latencia in ejecutor.map(_consultar, usuarios):
+            latencias.append(latencia * 1000)
+            if err is not None:
+                errores[usuario.username] = str(err)
+                continue
+            if aviso:
+                avisos[usuario.username] = aviso
+            try:
+                aplicar_identidad(usuario, identidad)
+            except Exception as err:
+                errores[usuario.username] = str(err)
+            else:
+                actualizados.append(usuario)
+
+    CustomUser.objects.bulk_update(actualizados, CAMPOS_IDENTIDAD, batch_size=500)
+    guardar_relaciones(actualizados)
+    duracion = time.monotonic() - inicio
+    if len(latencias) > 1:
+        latencia_p95 = statistics.quantiles(latencias, n=20)[-1]
+    else:
+        latencia_p95 = latencias[0] if latencias else 0
+
+    return {
+        'actualizados': len(actualizados),
+        'errores': errores,
+        'avisos': avisos,
+        'duracion': duracion,
+        'usuarios_por_segundo': len(usuarios) / duracion if duracion else 0,
+        'latencia_media': statistics.fmean(latencias) if latencias else 0,
+        'latencia_p95': latencia_p95,
+    }
+
+
+def crear_usuarios(nips: Iterable[str], hilos: int | None = None) -> dict:
+    """Crea los usuarios con los NIPs indicados y los datos de Gestión de Identidades.
+
+    Los usuarios que no se puedan actualizar (p. ej. porque el WS no reconoce el NIP) se borran.
+    Devuelve el resultado de `actualizar_identidades`.
+    """
+    nuevos = []
+    for nip in nips:
+        usuario = CustomUser(username=nip)
+        usuario.set_unusable_password()
+        nuevos.append(usuario)
+    CustomUser.objects.bulk_create(nuevos)
+
+    # MySQL no devuelve los ID de las filas insertadas con `bulk_create`.
+    usuarios = list(CustomUser.objects.filter(username__in=[u.username for u in nuevos]))
+    resultado = actualizar_identidades(usuarios, hilos)
+    CustomUser.objects.filter(username__in=resultado['errores']).delete()
+
+    # HACK - Indicamos que la autenticación es vía Single Sign On con SAML.
+    UserSocialAuth.objects.bulk_create(
+        UserSocialAuth(uid=f'sir:{usuario.username}', provider='saml', user=usuario)
+        for usuario in usuarios
+        if usuario.username not in resultado['errores']
+    )
+    return resultado
+
+
+def describir_resultado(resultado: dict) -> str:
+    """Resume en una línea el resultado de `actualizar_identidades`."""
+    return (
+        f"Actualizados {resultado['actualizados']} usuarios "
+        f"({len(resultado['errores'])} errores) en {resultado['duracion']:.1f} s: "
+        f"{resultado['usuarios_por_segundo']:.1f} usuarios/s, "
+        f"latencia media {resultado['latencia_media']:.0f} ms, "
+        f"p95 {resultado['latencia_p95']:.0f} ms."
+    )
+
+
+def get_coordinadores(anyo: int):
+    """Devuelve, sin repeticiones, los coordinadores de los proyectos de una convocatoria."""
+    return CustomUser.objects.filter(
+        vinculaciones__tipo_participacion_id__in=TIPOS_COORDINADOR,
+        vinculaciones__proyecto__convocatoria_id=anyo,
+    ).distinct()
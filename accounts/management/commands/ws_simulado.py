@@ -0,0 +1,58 @@
+import time
+
+import zeep
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from accounts import soap
+from accounts.ws_simulado import ServidorWsSimulado
+
+
+class Command(BaseCommand):
+    help = (
+        'Arranca un servidor local que simula los web services de Identidades y Vinculaciones. '
+        'Con --benchmark mide las llamadas a obtenIdentidad a través de `accounts.soap`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--puerto', type=int, default=8001, help='Puerto del servidor')
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            metavar='N',
+            help='Realiza N llamadas creando un cliente nuevo en cada una, y N reutilizándolo',
+        )
+
+    def handle(self, *args, **options):
+        servidor = ServidorWsSimulado(('127.0.0.1', options['puerto']))
+        if not options['benchmark']:
+            self.stdout.write(f'WSDL del servicio simulado: {servidor.url_wsdl}')
+            self.stdout.write('Use WSDL_IDENTIDAD y WSDL_VINCULACIONES con esa dirección.')
+            try:
+                servidor.serve_forever()
+            except KeyboardInterrupt:
+                servidor.server_close()
+            return
+
+        servidor.iniciar()
+        try:
+            self._benchmark(servidor, options['benchmark'])
+        finally:
+            servidor.detener()
+
+    def _benchmark(self, servidor, num_llamadas):
+        def medir(descripcion, obtener_cliente):
+            inicio = time.monotonic()
+            for nip in range(num_llamadas):
+                obtener_cliente().service.obtenIdentidad(str(nip))
+            duracion = time.monotonic() - inicio
+            self.stdout.write(
+                f'{descripcion}: {num_llamadas} llamadas en {duracion:.2f} s '
+                f'({duracion * 1000 / num_llamadas:.1f} ms/llamada)'
+            )
+
+        with override_settings(WSDL_IDENTIDAD=servidor.url_wsdl, SOAP_CACHE_WSDL=''):
+            soap.reiniciar_clientes()
+            medir('Cliente nuevo en cada llamada', lambda: zeep.Client(servidor.url_wsdl))
+            medir('Cliente compartido (accounts.soap)', lambda: soap.get_cliente('identidades'))
+            soap.reiniciar_clientes()
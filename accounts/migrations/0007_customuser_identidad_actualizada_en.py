@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customuser_cuerpo_pod'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='identidad_actualizada_en',
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name='datos de Identidades actualizados en'
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+import json
+
+from django.db import migrations, models
+
+# Campo JSON antiguo -> (relación, modelo de la unidad)
+CAMPOS = {
+    'centro_id_nks': ('centros', 'Centro'),
+    'departamento_id_nks': ('departamentos', 'Departamento'),
+}
+
+
+def copiar_a_relaciones(apps, schema_editor):
+    """Crea los vínculos con los centros y departamentos guardados en los campos JSON."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+
+    for campo, (relacion, nombre_modelo) in CAMPOS.items():
+        Unidad = apps.get_model('indo', nombre_modelo)
+        Vinculo = getattr(CustomUser, relacion).through
+        columna = f'{nombre_modelo.lower()}_id'
+        ids = dict(Unidad.objects.values_list('academico_id_nk', 'id'))
+
+        vinculos = []
+        for user_id, valor in CustomUser.objects.exclude(**{f'{campo}__isnull': True}).values_list(
+            'id', campo
+        ):
+            try:
+                id_nks = set(json.loads(valor)) if valor else set()
+            except (TypeError, ValueError):
+                continue
+            vinculos.extend(
+                Vinculo(customuser_id=user_id, **{columna: ids[id_nk]})
+                for id_nk in id_nks
+                if id_nk in ids
+            )
+        Vinculo.objects.bulk_create(vinculos, batch_size=1000)
+
+
+def copiar_a_json(apps, schema_editor):
+    """Reconstruye los campos JSON a partir de los vínculos."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+
+    for campo, (relacion, nombre_modelo) in CAMPOS.items():
+        Vinculo = getattr(CustomUser, relacion).through
+        columna = f'{nombre_modelo.lower()}__academico_id_nk'
+        id_nks = {}
+        for user_id, id_nk in Vinculo.objects.values_list('customuser_id', columna):
+            id_nks.setdefault(user_id, []).append(id_nk)
+        for user_id, valores in id_nks.items():
+            CustomUser.objects.filter(id=user_id).update(**{campo: json.dumps(sorted(valores))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_customuser_identidad_actualizada_en'),
+        ('indo', '0042_correo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='centros',
+            field=models.ManyToManyField(
+                blank=True, related_name='usuarios', to='indo.centro', verbose_name='centros'
+            ),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='departamentos',
+            field=models.ManyToManyField(
+                blank=True,
+                related_name='usuarios',
+                to='indo.departamento',
+                verbose_name='departamentos',
+            ),
+        ),
+        migrations.RunPython(copiar_a_relaciones, copiar_a_json),
+    ]
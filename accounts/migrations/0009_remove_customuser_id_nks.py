@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_customuser_centros_departamentos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='centro_id_nks',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='departamento_id_nks',
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:45
+
+import json
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+PRELACION = ('PDI', 'PAS', 'ADS', 'EST')
+
+
+def copiar_a_colectivos(apps, schema_editor):
+    """Crea los colectivos y el colectivo principal a partir del campo JSON."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Colectivo = apps.get_model('accounts', 'Colectivo')
+
+    colectivos = []
+    principales = {}
+    for user_id, valor in CustomUser.objects.exclude(colectivos_json__isnull=True).values_list(
+        'id', 'colectivos_json'
+    ):
+        try:
+            nombres = set(json.loads(valor)) if valor else set()
+        except (TypeError, ValueError):
+            continue
+        colectivos.extend(Colectivo(usuario_id=user_id, nombre=nombre) for nombre in nombres)
+        principal = next((nombre for nombre in PRELACION if nombre in nombres), None)
+        if principal:
+            principales.setdefault(principal, []).append(user_id)
+
+    Colectivo.objects.bulk_create(colectivos, batch_size=1000)
+    for principal, ids in principales.items():
+        CustomUser.objects.filter(id__in=ids).update(colectivo_principal=principal)
+
+
+def copiar_a_json(apps, schema_editor):
+    """Reconstruye el campo JSON a partir de los colectivos."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Colectivo = apps.get_model('accounts', 'Colectivo')
+
+    nombres = {}
+    for user_id, nombre in Colectivo.objects.values_list('usuario_id', 'nombre'):
+        nombres.setdefault(user_id, []).append(nombre)
+    for user_id, valores in nombres.items():
+        CustomUser.objects.filter(id=user_id).update(colectivos_json=json.dumps(valores))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_remove_customuser_id_nks'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='customuser',
+            old_name='colectivos',
+            new_name='colectivos_json',
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='colectivo_principal',
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ('PDI', 'PDI'),
+                    ('PAS', 'PAS'),
+                    ('ADS', 'PDI de centros adscritos'),
+                    ('EST', 'Estudiantes'),
+                ],
+                db_index=True,
+                help_text='Colectivo con más prelación del usuario: PDI > PAS > ADS > EST.',
+                max_length=3,
+                null=True,
+                verbose_name='colectivo principal',
+            ),
+        ),
+        migrations.CreateModel(
+            name='Colectivo',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('nombre', models.CharField(db_index=True, max_length=15, verbose_name='nombre')),
+                (
+                    'usuario',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='colectivos',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'colectivo',
+                'verbose_name_plural': 'colectivos',
+                'constraints': [
+                    models.UniqueConstraint(fields=('usuario', 'nombre'), name='colectivo_unico')
+                ],
+            },
+        ),
+        migrations.RunPython(copiar_a_colectivos, copiar_a_json),
+    ]
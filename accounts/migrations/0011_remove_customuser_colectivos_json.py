@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_colectivo'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='colectivos_json',
+        ),
+    ]
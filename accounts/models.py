@@ -1,23 +1,18 @@
 from __future__ import annotations
 
-import json
-
-import zeep
-from annoying.functions import get_config, get_object_or_None
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from lxml.etree import XMLSyntaxError
-from requests import Session
-from requests.auth import HTTPBasicAuth
-from requests.exceptions import ConnectionError as RequestConnectionError
 from social_django.models import UserSocialAuth
 from social_django.utils import load_strategy
 
 from indo.models import Centro, Departamento
 
-from .pipeline import get_identidad
+from .pipeline import COLECTIVOS_PRINCIPALES, get_identidad
+from .soap import get_cliente
 
 
 class CustomUserManager(UserManager):
@@ -58,13 +53,26 @@ class CustomUser(AbstractUser):
     sexo = models.CharField(max_length=1, blank=True, null=True)
     sexo_oficial = models.CharField(max_length=1, blank=True, null=True)
     nombre_oficial = models.CharField(max_length=50, blank=True, null=True)
-    centro_id_nks = models.CharField(_('Cód. centros'), max_length=127, blank=True, null=True)
-    departamento_id_nks = models.CharField(
-        _('Cód. departamentos'), max_length=127, blank=True, null=True
+    centros = models.ManyToManyField(
+        Centro, blank=True, related_name='usuarios', verbose_name=_('centros')
+    )
+    departamentos = models.ManyToManyField(
+        Departamento, blank=True, related_name='usuarios', verbose_name=_('departamentos')
+    )
+    colectivo_principal = models.CharField(
+        _('colectivo principal'),
+        max_length=3,
+        blank=True,
+        null=True,
+        choices=COLECTIVOS_PRINCIPALES,
+        db_index=True,
+        help_text=_('Colectivo con más prelación del usuario: PDI > PAS > ADS > EST.'),
     )
-    colectivos = models.CharField(max_length=127, blank=True, null=True)
     cuerpo_pod = models.CharField(_('Cuerpo POD'), max_length=15, blank=True, null=True)
     orcid = models.CharField(max_length=19, blank=True, null=True)
+    identidad_actualizada_en = models.DateTimeField(
+        _('datos de Identidades actualizados en'), blank=True, null=True
+    )
 
     class Meta:
         ordering = (
@@ -74,50 +82,26 @@ class CustomUser(AbstractUser):
         )
 
     @property
-    def id_nk_centros(self):
-        """Devuelve una lista con los ID de los centros del usuario."""
-        return set(json.loads(self.centro_id_nks)) if self.centro_id_nks else []
+    def antiguedad_identidad(self) -> float | None:
+        """Segundos transcurridos desde que se obtuvieron los datos de Gestión de Identidades."""
+        if not self.identidad_actualizada_en:
+            return None
+        return (timezone.now() - self.identidad_actualizada_en).total_seconds()
 
     @property
-    def centros(self):
-        """Devuelve una lista con los centros del usuario."""
-        return list(
-            filter(
-                lambda x: x is not None and x.esta_activo,
-                [
-                    get_object_or_None(Centro, academico_id_nk=id_nk)
-                    for id_nk in self.id_nk_centros
-                ],
-            )
-        )
+    def centros_activos(self) -> list:
+        """Devuelve una lista con los centros activos del usuario."""
+        return [centro for centro in self.centros.all() if centro.esta_activo]
 
     @property
     def nombres_centros(self):
-        """Devuelve una cadena con los nombres de los centros del usuario."""
-        return ', '.join([centro.nombre for centro in self.centros])
-
-    @property
-    def id_nk_departamentos(self):
-        """Devuelve una lista con los ID de los departamentos del usuario."""
-        return set(json.loads(self.departamento_id_nks)) if self.departamento_id_nks else []
-
-    @property
-    def departamentos(self):
-        """Devuelve una lista con los departamentos del usuario."""
-        return list(
-            filter(
-                lambda x: x is not None,
-                [
-                    get_object_or_None(Departamento, academico_id_nk=id_nk)
-                    for id_nk in self.id_nk_departamentos
-                ],
-            )
-        )
+        """Devuelve una cadena con los nombres de los centros activos del usuario."""
+        return ', '.join([centro.nombre for centro in self.centros_activos])
 
     @property
     def nombres_departamentos(self):
         """Devuelve una cadena con los nombres de los departamentos del usuario."""
-        return ', '.join([departamento.nombre for departamento in self.departamentos])
+        return ', '.join([departamento.nombre for departamento in self.departamentos.all()])
 
     @property
     def full_name(self):
@@ -148,49 +132,28 @@ class CustomUser(AbstractUser):
         """Actualiza el usuario con los datos de Gestión de Identidades."""
         get_identidad(load_strategy(request), None, self)
 
-    def get_colectivo_principal(self):
-        """Devuelve el colectivo principal del usuario.
+    def actualizar_si_caducado(self, request) -> None:
+        """Actualiza el usuario con los datos de Gestión de Identidades si no están al día.
 
-        Se determina usando el orden de prelación PDI > PAS > ADS > EST.
-        PDI y PAS pueden solicitar financiación, pero el profesorado de los centros adscritos no.
+        * Si se obtuvieron hace menos de `IDENTIDAD_VIGENCIA` segundos, no hace nada.
+        * Si se obtuvieron hace menos de `IDENTIDAD_VIGENCIA_MAXIMA` segundos, se siguen usando
+          los datos guardados y se encola su actualización en Huey.
+        * En otro caso (o si nunca se obtuvieron) consulta al WS y espera su respuesta.
         """
-        colectivos_del_usuario = json.loads(self.colectivos) if self.colectivos else []
-        for col in ('PDI', 'PAS', 'ADS', 'EST'):
-            if col in colectivos_del_usuario:
-                return col
-        return None
-
-    def get_num_equipos(self, anyo):
-        """Devuelve el número de equipos de trabajo en los que participa el usuario."""
-        # Avoiding circular import
-        from indo.models import ParticipanteProyecto
-
-        num_como_participante = (
-            self.vinculaciones.filter(
-                tipo_participacion='participante', proyecto__convocatoria_id=anyo
-            )
-            .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-            .count()
-        )
-        num_como_coordinador = (
-            ParticipanteProyecto.objects.filter(
-                usuario=self,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria_id=anyo,
-                proyecto__estado__in=[
-                    'SOLICITADO',
-                    'APROBADO',
-                    'ACEPTADO',
-                    'MEM_PRESENTADA',
-                    'MEM_NO_ADMITIDA',
-                    'MEM_ADMITIDA',
-                    'FINALIZADO_SIN_MEMORIA',
-                ],
-            )
-            .count()
-        )
-        num_equipos = num_como_participante + num_como_coordinador
-        return num_equipos
+        antiguedad = self.antiguedad_identidad
+        if antiguedad is not None:
+            if antiguedad < settings.IDENTIDAD_VIGENCIA:
+                return
+            if antiguedad < settings.IDENTIDAD_VIGENCIA_MAXIMA:
+                from .tasks import actualizar_identidad
+
+                actualizar_identidad(self.id)
+                return
+        self.actualizar(request)
+
+    def tiene_colectivo(self, *colectivos: str) -> bool:
+        """Devuelve si el usuario pertenece a alguno de los colectivos indicados."""
+        return self.colectivos.filter(nombre__in=colectivos).exists()
 
     @classmethod
     def crear_usuario(cls, request, nip: str) -> CustomUser:
@@ -218,22 +181,7 @@ class CustomUser(AbstractUser):
         """Devuelve los NIPs que tengan el código de vinculación indicado.
 
         También devuelve la descripción de la advertencia en caso de producirse."""
-        wsdl = get_config('WSDL_VINCULACIONES')
-        session = Session()
-        session.auth = HTTPBasicAuth(
-            get_config('USER_VINCULACIONES'), get_config('PASS_VINCULACIONES')
-        )
-
-        try:
-            client = zeep.Client(wsdl=wsdl, transport=zeep.transports.Transport(session=session))
-        except RequestConnectionError:
-            raise RequestConnectionError('No fue posible conectarse al WS de Vinculaciones.')
-        except XMLSyntaxError:
-            raise XMLSyntaxError('El WS de Identidades no devolvió un XML válido.')
-        except Exception as e:
-            print(e)
-            raise e
-
+        client = get_cliente('vinculaciones')
         response = client.service.mostrarVinculaciones(cod_vinculacion)
 
         # Si el WS produce una advertencia, la devolveremos con el resultado para mostrarla.
@@ -247,3 +195,22 @@ class CustomUser(AbstractUser):
 
     # Custom Manager
     objects = CustomUserManager()
+
+
+class Colectivo(models.Model):
+    """Colectivo (perfil) de un usuario en Gestión de Identidades: PDI, PAS, EST, etc."""
+
+    usuario = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='colectivos'
+    )
+    nombre = models.CharField(_('nombre'), max_length=15, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'nombre'], name='colectivo_unico')
+        ]
+        verbose_name = _('colectivo')
+        verbose_name_plural = _('colectivos')
+
+    def __str__(self):
+        return f'{self.usuario.username}: {self.nombre}'
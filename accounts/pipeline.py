@@ -1,44 +1,73 @@
-import json
-
-import zeep
-from annoying.functions import get_config
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from lxml.etree import XMLSyntaxError
-from requests import Session
-from requests.auth import HTTPBasicAuth
-from requests.exceptions import ConnectionError as RequestConnectionError
+from django.utils import timezone
 from social_core.strategy import BaseStrategy
 
+from indo.models import Centro, Departamento
+
+from .soap import get_cliente
+
+# Campos del usuario que se actualizan con los datos de Gestión de Identidades.
+CAMPOS_IDENTIDAD = (
+    'first_name',
+    'last_name',
+    'last_name_2',
+    'email',
+    'is_active',
+    'nombre_oficial',
+    'numero_documento',
+    'sexo',
+    'sexo_oficial',
+    'tipo_documento',
+    'colectivo_principal',
+    'cuerpo_pod',
+    'orcid',
+    'identidad_actualizada_en',
+)
+
+# Colectivos que pueden ser el principal de un usuario, en orden de prelación.
+# PDI y PAS pueden solicitar financiación, pero el profesorado de los centros adscritos no.
+COLECTIVOS_PRINCIPALES = (
+    ('PDI', 'PDI'),
+    ('PAS', 'PAS'),
+    ('ADS', 'PDI de centros adscritos'),
+    ('EST', 'Estudiantes'),
+)
+
 
 def get_identidad(strategy: BaseStrategy, response, user, *args, **kwargs) -> None:
     """Actualiza el usuario con los datos obtenidos de Gestión de Identidades."""
+    identidad, aviso = obtener_identidad(user.username)
+    if aviso:
+        # El WS produjo una advertencia. La mostramos y seguimos.
+        messages.warning(strategy.request, aviso)
 
-    wsdl = get_config('WSDL_IDENTIDAD')
-    session = Session()
-    session.auth = HTTPBasicAuth(get_config('USER_IDENTIDAD'), get_config('PASS_IDENTIDAD'))
+    aplicar_identidad(user, identidad)
+    # user.save()
+    strategy.storage.user.changed(user)
+    guardar_relaciones([user])
 
-    try:
-        client = zeep.Client(wsdl=wsdl, transport=zeep.transports.Transport(session=session))
-    except RequestConnectionError:
-        raise RequestConnectionError('No fue posible conectarse al WS de Identidades.')
-    except XMLSyntaxError:
-        raise XMLSyntaxError('El WS de Identidades no devolvió un XML válido.')
-    except Exception as e:
-        print(e)
-        raise e
-
-    response = client.service.obtenIdentidad(user.username)
-    if response.aviso:
-        # El WS produjo una advertencia. La mostramos y seguimos.
-        messages.warning(strategy.request, response.descripcionAviso)
 
+def obtener_identidad(nip: str) -> tuple:
+    """Consulta el WS de Identidades y devuelve la identidad del NIP indicado y su advertencia.
+
+    Si el WS no produjo ninguna advertencia, ésta será `None`.
+    """
+    response = get_cliente('identidades').service.obtenIdentidad(nip)
     if response.error:
         # La comunicación con el WS fue correcta, pero éste devolvió un error. Finalizamos.
         raise Exception('WS Identidad: ' + response.descripcionResultado)
 
-    identidad = response.identidad
+    return response.identidad, response.descripcionAviso if response.aviso else None
+
+
+def aplicar_identidad(user, identidad) -> None:
+    """Copia en el usuario (sin guardarlo) los datos de la identidad devuelta por el WS.
+
+    Los colectivos, centros y departamentos se guardan aparte con `guardar_relaciones`, una vez
+    guardado el usuario.
+    """
     user.first_name = identidad.nombre
     user.last_name = identidad.primerApellido
     user.last_name_2 = identidad.segundoApellido
@@ -56,20 +85,62 @@ def get_identidad(strategy: BaseStrategy, response, user, *args, **kwargs) -> No
     user.sexo = identidad.sexo
     user.sexo_oficial = identidad.sexoAdmin
     user.tipo_documento = identidad.tipoDocumento
-    user.centro_id_nks = json.dumps(identidad.centros)
-    user.departamento_id_nks = json.dumps(identidad.departamentos)
+    user._unidades_identidad = (identidad.centros, identidad.departamentos)
     colectivos = identidad.perfiles
     cods_vinculaciones = identidad.vinculaciones
     if any(cod_adscritos in cods_vinculaciones for cod_adscritos in (12, 13, 42)):
         colectivos.append('ADS')
     if any(cod_adscritos in cods_vinculaciones for cod_adscritos in (25, 61)):
         colectivos.append('INV')  # Investigadores sin contrato pero con docencia
-    user.colectivos = json.dumps(list(set(colectivos)))
+    user._colectivos_identidad = set(colectivos)
+    user.colectivo_principal = get_colectivo_principal(colectivos)
     user.cuerpo_pod = identidad.cuerpoPod
     user.orcid = identidad.orcid if identidad.orcid != '-' else None
+    user.identidad_actualizada_en = timezone.now()
 
-    # user.save()
-    strategy.storage.user.changed(user)
+
+def get_colectivo_principal(colectivos) -> str | None:
+    """Devuelve el colectivo con más prelación (PDI > PAS > ADS > EST) de los indicados."""
+    for colectivo, _nombre in COLECTIVOS_PRINCIPALES:
+        if colectivo in colectivos:
+            return colectivo
+    return None
+
+
+def guardar_relaciones(usuarios) -> None:
+    """Guarda los colectivos, centros y departamentos que `aplicar_identidad` obtuvo.
+
+    Sustituye los anteriores de los usuarios con un número fijo de consultas.  Se omiten los
+    códigos de centros y departamentos que no existan en la aplicación.
+    """
+    # Avoiding circular import
+    from .models import Colectivo
+
+    usuarios = [usuario for usuario in usuarios if hasattr(usuario, '_unidades_identidad')]
+    if not usuarios:
+        return
+
+    Colectivo.objects.filter(usuario__in=usuarios).delete()
+    Colectivo.objects.bulk_create(
+        Colectivo(usuario_id=usuario.id, nombre=nombre)
+        for usuario in usuarios
+        for nombre in usuario._colectivos_identidad
+    )
+
+    for posicion, modelo, campo in ((0, Centro, 'centros'), (1, Departamento, 'departamentos')):
+        codigos = set().union(*(usuario._unidades_identidad[posicion] for usuario in usuarios))
+        ids = dict(
+            modelo.objects.filter(academico_id_nk__in=codigos).values_list('academico_id_nk', 'id')
+        )
+        relacion = getattr(type(usuarios[0]), campo).through
+        campo_unidad = f'{modelo._meta.model_name}_id'
+        relacion.objects.filter(customuser__in=usuarios).delete()
+        relacion.objects.bulk_create(
+            relacion(customuser_id=usuario.id, **{campo_unidad: ids[codigo]})
+            for usuario in usuarios
+            for codigo in set(usuario._unidades_identidad[posicion])
+            if codigo in ids
+        )
 
 
 def is_email_valid(email: str) -> bool:
@@ -0,0 +1,85 @@
+"""Clientes de los servicios web SOAP de Gestión de Identidades.
+
+Crear un `zeep.Client` supone descargar y analizar el WSDL, así que los clientes se crean una
+sola vez por proceso y se reutilizan.  Cada cliente usa una sesión HTTP propia, con conexiones
+persistentes (keep-alive) y autenticación, y los WSDL descargados se guardan en una caché
+compartida por todos los procesos (`settings.SOAP_CACHE_WSDL`).
+"""
+
+import threading
+from pathlib import Path
+
+import zeep
+from annoying.functions import get_config
+from django.conf import settings
+from lxml.etree import XMLSyntaxError
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.exceptions import ConnectionError as RequestConnectionError
+from zeep.cache import InMemoryCache, SqliteCache
+from zeep.transports import Transport
+
+# Nombre del servicio -> (nombre legible, ajustes con el WSDL, el usuario y la contraseña)
+SERVICIOS = {
+    'identidades': (
+        'Identidades',
+        ('WSDL_IDENTIDAD', 'USER_IDENTIDAD', 'PASS_IDENTIDAD'),
+    ),
+    'vinculaciones': (
+        'Vinculaciones',
+        ('WSDL_VINCULACIONES', 'USER_VINCULACIONES', 'PASS_VINCULACIONES'),
+    ),
+}
+
+_clientes = {}
+_cerrojo = threading.Lock()
+
+
+def get_cliente(servicio: str) -> zeep.Client:
+    """Devuelve el cliente del servicio indicado, creándolo la primera vez que se pide."""
+    with _cerrojo:
+        cliente = _clientes.get(servicio)
+        if cliente is None:
+            cliente = _clientes[servicio] = _crear_cliente(servicio)
+    return cliente
+
+
+def reiniciar_clientes() -> None:
+    """Descarta los clientes creados, p. ej. tras cambiar la configuración de los servicios."""
+    with _cerrojo:
+        for cliente in _clientes.values():
+            cliente.transport.session.close()
+        _clientes.clear()
+
+
+def _get_cache_wsdl():
+    if settings.SOAP_CACHE_WSDL:
+        Path(settings.SOAP_CACHE_WSDL).parent.mkdir(parents=True, exist_ok=True)
+        return SqliteCache(path=settings.SOAP_CACHE_WSDL, timeout=settings.SOAP_DURACION_CACHE)
+    return InMemoryCache(timeout=settings.SOAP_DURACION_CACHE)
+
+
+def _crear_cliente(servicio: str) -> zeep.Client:
+    nombre, (ajuste_wsdl, ajuste_usuario, ajuste_clave) = SERVICIOS[servicio]
+
+    session = Session()
+    session.auth = HTTPBasicAuth(get_config(ajuste_usuario), get_config(ajuste_clave))
+    adaptador = HTTPAdapter(pool_maxsize=settings.SOAP_CONEXIONES)
+    session.mount('http://', adaptador)
+    session.mount('https://', adaptador)
+    transporte = Transport(
+        cache=_get_cache_wsdl(),
+        session=session,
+        timeout=settings.SOAP_TIMEOUT,
+        operation_timeout=settings.SOAP_TIMEOUT,
+    )
+
+    try:
+        return zeep.Client(wsdl=get_config(ajuste_wsdl), transport=transporte)
+    except RequestConnectionError:
+        raise RequestConnectionError(f'No fue posible conectarse al WS de {nombre}.')
+    except XMLSyntaxError as err:
+        raise XMLSyntaxError(
+            f'El WS de {nombre} no devolvió un XML válido.', err.code, err.lineno, err.offset
+        ) from err
@@ -0,0 +1,29 @@
+from django.conf import settings
+
+from manhattan_project.colas import tarea
+
+
+# Lo provoca la navegación de un usuario: se atiende antes que las actualizaciones masivas.
+@tarea('identidades', priority=10)
+def actualizar_identidad(usuario_id):
+    """Actualiza un usuario con los datos de Gestión de Identidades.
+
+    Si entretanto otra petición ya lo ha actualizado, no vuelve a consultar el WS.
+    """
+    from .models import CustomUser
+    from .pipeline import (
+        CAMPOS_IDENTIDAD,
+        aplicar_identidad,
+        guardar_relaciones,
+        obtener_identidad,
+    )
+
+    usuario = CustomUser.objects.get(pk=usuario_id)
+    antiguedad = usuario.antiguedad_identidad
+    if antiguedad is not None and antiguedad < settings.IDENTIDAD_VIGENCIA:
+        return
+
+    identidad, _aviso = obtener_identidad(usuario.username)
+    aplicar_identidad(usuario, identidad)
+    usuario.save(update_fields=CAMPOS_IDENTIDAD)
+    guardar_relaciones([usuario])
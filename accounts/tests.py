@@ -1,3 +1,108 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from social_django.models import UserSocialAuth
+
+from indo.models import Centro, Departamento
+from indo.tasks import sincronizar_evaluadores
+from manhattan_project import colas
+
+from . import soap
+from .actualizacion import actualizar_identidades
+from .ws_simulado import ServidorWsSimulado
+
+
+class ClientesSoapTests(TestCase):
+    def setUp(self):
+        self.servidor = ServidorWsSimulado()
+        self.servidor.iniciar()
+        self.addCleanup(self.servidor.detener)
+
+        ajustes = override_settings(
+            WSDL_IDENTIDAD=self.servidor.url_wsdl,
+            WSDL_VINCULACIONES=self.servidor.url_wsdl,
+            SOAP_CACHE_WSDL='',
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        soap.reiniciar_clientes()
+        self.addCleanup(soap.reiniciar_clientes)
+
+    def test_cliente_compartido(self):
+        cliente = soap.get_cliente('identidades')
+        self.assertIs(soap.get_cliente('identidades'), cliente)
+        self.assertIsNot(soap.get_cliente('vinculaciones'), cliente)
+
+    def test_actualizar_usuario(self):
+        centro = Centro.objects.create(nombre='Centro', academico_id_nk=110, esta_activo=True)
+        departamento = Departamento.objects.create(nombre='Departamento', academico_id_nk=7)
+        usuario = get_user_model().objects.create_user(username='181818')
+        for _ in range(2):
+            usuario.actualizar(None)
+
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.email, '181818@unizar.es')
+        self.assertEqual(usuario.last_name_2, '181818')
+        self.assertEqual(self.servidor.num_peticiones, 2)
+        self.assertEqual(list(usuario.centros.all()), [centro])
+        self.assertEqual(list(usuario.departamentos.all()), [departamento])
+        self.assertEqual(usuario.nombres_departamentos, 'Departamento')
+        self.assertEqual(usuario.colectivo_principal, 'PDI')
+        self.assertEqual(list(usuario.colectivos.values_list('nombre', flat=True)), ['PDI'])
+
+    def test_get_nips_vinculacion(self):
+        advertencia, nips = get_user_model().get_nips_vinculacion(42)
+        self.assertIsNone(advertencia)
+        self.assertEqual(nips[0], 1000)
+
+    def test_actualizacion_masiva(self):
+        User = get_user_model()
+        usuarios = [User.objects.create_user(username=nip) for nip in ('191919', '202020', 'x')]
+
+        resultado = actualizar_identidades(usuarios + usuarios[:1], hilos=2)
+
+        self.assertEqual(resultado['actualizados'], 2)
+        self.assertEqual(resultado['errores'], {'x': 'WS Identidad: NIP desconocido'})
+        self.assertEqual(self.servidor.num_peticiones, 3)
+        self.assertEqual(User.objects.get(username='202020').email, '202020@unizar.es')
+        self.assertEqual(User.objects.get(username='202020').centros.count(), 0)
+        self.assertEqual(User.objects.get(username='x').email, '')
+
+    def test_actualizar_si_caducado(self):
+        colas.set_inmediato(True)
+        self.addCleanup(colas.set_inmediato, False)
+        usuario = get_user_model().objects.create_user(username='212121')
+
+        # Sin datos previos, se consulta el WS.
+        usuario.actualizar_si_caducado(None)
+        self.assertEqual(self.servidor.num_peticiones, 1)
+
+        # Con datos recientes, no.
+        usuario.actualizar_si_caducado(None)
+        self.assertEqual(self.servidor.num_peticiones, 1)
+
+        # Con datos algo antiguos, se actualizan en segundo plano.
+        hace_un_dia = timezone.now() - timedelta(days=1)
+        get_user_model().objects.filter(pk=usuario.pk).update(identidad_actualizada_en=hace_un_dia)
+        usuario.refresh_from_db()
+        usuario.actualizar_si_caducado(None)
+        self.assertEqual(self.servidor.num_peticiones, 2)
+        usuario.refresh_from_db()
+        self.assertGreater(usuario.identidad_actualizada_en, hace_un_dia)
+
+    def test_sincronizar_evaluadores(self):
+        User = get_user_model()
+        evaluadores = Group.objects.get_or_create(name='Evaluadores')[0]
+        User.objects.create_user(username='1000')
+        User.objects.create_user(username='999').groups.add(evaluadores)
+
+        sincronizar_evaluadores.call_local()
+
+        nips = sorted(evaluadores.user_set.values_list('username', flat=True))
+        self.assertEqual(nips, [str(nip) for nip in range(1000, 1010)])
+        # Una consulta de vinculaciones y otra de identidad por cada usuario nuevo.
+        self.assertEqual(self.servidor.num_peticiones, 10)
+        self.assertEqual(UserSocialAuth.objects.filter(user__username='1009').count(), 1)
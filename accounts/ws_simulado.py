@@ -0,0 +1,190 @@
+"""Servidor local que simula los web services de Identidades y Vinculaciones.
+
+Sirve un WSDL con las operaciones `obtenIdentidad` y `mostrarVinculaciones` y responde a ellas
+con datos ficticios (o con un error, si el NIP no es numérico), de modo que `accounts.soap` se
+pueda probar y medir sin acceso a los servicios reales.  Véase la orden `manage.py ws_simulado`.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lxml import etree
+
+NS = 'http://ws.simulado.manhattan.local/'
+
+WSDL = '''<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+             xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xs="http://www.w3.org/2001/XMLSchema"
+             xmlns:tns="{ns}" targetNamespace="{ns}">
+  <types>
+    <xs:schema targetNamespace="{ns}">
+      <xs:complexType name="identidad">
+        <xs:sequence>
+          <xs:element name="activo" type="xs:string"/>
+          <xs:element name="centros" type="xs:int" minOccurs="0" maxOccurs="unbounded"/>
+          <xs:element name="correoPersonal" type="xs:string"/>
+          <xs:element name="correoPrincipal" type="xs:string"/>
+          <xs:element name="cuerpoPod" type="xs:string"/>
+          <xs:element name="departamentos" type="xs:int" minOccurs="0" maxOccurs="unbounded"/>
+          <xs:element name="documento" type="xs:string"/>
+          <xs:element name="nombre" type="xs:string"/>
+          <xs:element name="nombreAdmin" type="xs:string"/>
+          <xs:element name="orcid" type="xs:string"/>
+          <xs:element name="perfiles" type="xs:string" minOccurs="0" maxOccurs="unbounded"/>
+          <xs:element name="primerApellido" type="xs:string"/>
+          <xs:element name="segundoApellido" type="xs:string"/>
+          <xs:element name="sexo" type="xs:string"/>
+          <xs:element name="sexoAdmin" type="xs:string"/>
+          <xs:element name="tipoDocumento" type="xs:string"/>
+          <xs:element name="vinculaciones" type="xs:int" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="resultado">
+        <xs:sequence>
+          <xs:element name="aviso" type="xs:boolean"/>
+          <xs:element name="descripcionAviso" type="xs:string" minOccurs="0"/>
+          <xs:element name="error" type="xs:boolean"/>
+          <xs:element name="descripcionResultado" type="xs:string" minOccurs="0"/>
+          <xs:element name="identidad" type="tns:identidad" minOccurs="0"/>
+          <xs:element name="nipsInteger" type="xs:int" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:element name="obtenIdentidad">
+        <xs:complexType><xs:sequence>
+          <xs:element name="nip" type="xs:string"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="obtenIdentidadResponse">
+        <xs:complexType><xs:sequence>
+          <xs:element name="return" type="tns:resultado"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="mostrarVinculaciones">
+        <xs:complexType><xs:sequence>
+          <xs:element name="codVinculacion" type="xs:int"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="mostrarVinculacionesResponse">
+        <xs:complexType><xs:sequence>
+          <xs:element name="return" type="tns:resultado"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+    </xs:schema>
+  </types>
+  <message name="obtenIdentidad"><part name="parameters" element="tns:obtenIdentidad"/></message>
+  <message name="obtenIdentidadResponse">
+    <part name="parameters" element="tns:obtenIdentidadResponse"/>
+  </message>
+  <message name="mostrarVinculaciones">
+    <part name="parameters" element="tns:mostrarVinculaciones"/>
+  </message>
+  <message name="mostrarVinculacionesResponse">
+    <part name="parameters" element="tns:mostrarVinculacionesResponse"/>
+  </message>
+  <portType name="Identidades">
+    <operation name="obtenIdentidad">
+      <input message="tns:obtenIdentidad"/><output message="tns:obtenIdentidadResponse"/>
+    </operation>
+    <operation name="mostrarVinculaciones">
+      <input message="tns:mostrarVinculaciones"/>
+      <output message="tns:mostrarVinculacionesResponse"/>
+    </operation>
+  </portType>
+  <binding name="IdentidadesBinding" type="tns:Identidades">
+    <soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="obtenIdentidad">
+      <soap:operation soapAction=""/>
+      <input><soap:body use="literal"/></input><output><soap:body use="literal"/></output>
+    </operation>
+    <operation name="mostrarVinculaciones">
+      <soap:operation soapAction=""/>
+      <input><soap:body use="literal"/></input><output><soap:body use="literal"/></output>
+    </operation>
+  </binding>
+  <service name="IdentidadesService">
+    <port name="IdentidadesPort" binding="tns:IdentidadesBinding">
+      <soap:address location="{url}"/>
+    </port>
+  </service>
+</definitions>
+'''
+
+RESPUESTA = '''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" xmlns:tns="{ns}">
+  <soap:Body>
+    <tns:{operacion}Response><return>{resultado}</return></tns:{operacion}Response>
+  </soap:Body>
+</soap:Envelope>
+'''
+
+IDENTIDAD = '''<aviso>false</aviso><error>false</error><identidad>
+<activo>S</activo><centros>110</centros><correoPersonal>-</correoPersonal>
+<correoPrincipal>{nip}@unizar.es</correoPrincipal><cuerpoPod>-</cuerpoPod>
+<departamentos>7</departamentos><documento>{nip}X</documento><nombre>Usuario</nombre>
+<nombreAdmin>Usuario</nombreAdmin><orcid>-</orcid><perfiles>PDI</perfiles>
+<primerApellido>Simulado</primerApellido><segundoApellido>{nip}</segundoApellido>
+<sexo>F</sexo><sexoAdmin>F</sexoAdmin><tipoDocumento>NIF</tipoDocumento>
+<vinculaciones>1</vinculaciones></identidad>'''
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Conexiones persistentes, como el servidor real.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = f'http://{self.server.server_address[0]}:{self.server.server_address[1]}/'
+        self._responder(WSDL.format(ns=NS, url=url))
+
+    def do_POST(self):
+        self.server.num_peticiones += 1
+        peticion = etree.fromstring(self.rfile.read(int(self.headers['Content-Length'])))
+        operacion = peticion.find(f'.//{{{NS}}}obtenIdentidad')
+        if operacion is not None:
+            nip = operacion.findtext('nip')
+            if nip.isdigit():
+                resultado = IDENTIDAD.format(nip=nip)
+            else:
+                resultado = (
+                    '<aviso>false</aviso><error>true</error>'
+                    '<descripcionResultado>NIP desconocido</descripcionResultado>'
+                )
+            operacion = 'obtenIdentidad'
+        else:
+            resultado = '<aviso>false</aviso><error>false</error>' + ''.join(
+                f'<nipsInteger>{nip}</nipsInteger>' for nip in range(1000, 1010)
+            )
+            operacion = 'mostrarVinculaciones'
+        self._responder(RESPUESTA.format(ns=NS, operacion=operacion, resultado=resultado))
+
+    def _responder(self, contenido):
+        contenido = contenido.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorWsSimulado(ThreadingHTTPServer):
+    """Servidor HTTP del WS simulado.  Con `iniciar` se ejecuta en un hilo aparte."""
+
+    daemon_threads = True
+
+    def __init__(self, direccion=('127.0.0.1', 0)):
+        super().__init__(direccion, _Manejador)
+        self.num_peticiones = 0
+
+    @property
+    def url_wsdl(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/?wsdl'
+
+    def iniciar(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def detener(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -15,12 +15,15 @@ TARGET_GID=${UWSGI_GID:-1501}
 if [ "$(id -u)" = '0' ]; then
     echo "Ajustando permisos de carpetas de datos (media y cola) para el usuario $TARGET_UID:$TARGET_GID..."
     chown -R $TARGET_UID:$TARGET_GID /code/media /code/cola
-    touch /code/cola/huey.log
-    chown $TARGET_UID:$TARGET_GID /code/cola/huey.log
 fi
 
-# Ejecutar el worker de Huey en segundo plano como usuario configurado
-echo "Lanzando el worker de Huey como usuario $TARGET_UID..."
-nohup python -c "import os; os.setgid($TARGET_GID); os.setuid($TARGET_UID); os.execlp('python', 'python', 'manage.py', 'run_huey')" > /code/cola/huey.log 2>&1 &
+# Ejecutar un consumidor de Huey por cola de COLAS_TAREAS en segundo plano como usuario configurado
+COLAS=$(python manage.py shell -v 0 -c "from django.conf import settings; print(*settings.COLAS_TAREAS)")
+for COLA in $COLAS; do
+    echo "Lanzando el consumidor de la cola $COLA como usuario $TARGET_UID..."
+    touch /code/cola/huey-$COLA.log
+    chown $TARGET_UID:$TARGET_GID /code/cola/huey-$COLA.log
+    nohup python -c "import os; os.setgid($TARGET_GID); os.setuid($TARGET_UID); os.execlp('python', 'python', 'manage.py', 'consumir_cola', '$COLA')" > /code/cola/huey-$COLA.log 2>&1 &
+done
 
 exec "$@"
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class IndoConfig(AppConfig):
     name = 'indo'
+
+    def ready(self):
+        from . import signals  # noqa: F401
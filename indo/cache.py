@@ -0,0 +1,187 @@
+"""Caché compartida de la aplicación, organizada en espacios de nombres.
+
+Cada espacio (`EspacioCache`) antepone su nombre a las claves, lleva la cuenta de sus aciertos y
+fallos (véase `manage.py estadisticas_cache`) y versiona sus claves por grupos, de modo que se
+pueden descartar de golpe todos los datos de un grupo (p. ej. de una convocatoria) cambiando su
+versión, sin tener que conocer las claves.  Los datos sólo se comparten entre los procesos de
+uWSGI si el backend de `CACHES` lo permite (ficheros, Redis o memcached; véase `settings`).
+
+Los espacios de la aplicación son:
+
+* `catalogo`: las últimas convocatorias, que se muestran en el selector de casi todas las páginas.
+* `convocatoria`: los datos de cada convocatoria, agrupados por convocatoria.
+* `usuario`: los listados de proyectos de cada usuario en «Mis proyectos», agrupados por
+  convocatoria.  Es la página a la que se llega tras iniciar sesión, y las vinculaciones de un
+  usuario cambian poco.
+
+Los aciertos y fallos se cuentan en la memoria de cada proceso, y se suman a los contadores
+compartidos de la caché como mucho una vez cada `INTERVALO_VOLCADO` segundos, para no escribir en
+la caché en cada consulta.  Los que un proceso no haya volcado al terminar se pierden.
+
+Los manejadores de `indo.signals` invalidan los datos cuando cambian las convocatorias, las
+vinculaciones o los datos mostrados de un proyecto (sólo para los usuarios afectados).
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.core.cache import cache
+
+from .models import Convocatoria
+
+_AUSENTE = object()
+INTERVALO_VOLCADO = 60  # segundos
+
+
+class EspacioCache:
+    """Espacio de nombres de la caché, con claves versionadas por grupo y estadísticas."""
+
+    def __init__(self, nombre: str, duracion: int):
+        self.nombre = nombre
+        self.duracion = duracion  # segundos
+        self.clave_aciertos = f'{nombre}:aciertos'
+        self.clave_fallos = f'{nombre}:fallos'
+        # Aciertos y fallos de este proceso aún no sumados a los de la caché
+        self._pendientes = {self.clave_aciertos: 0, self.clave_fallos: 0}
+        self._volcado_en = time.monotonic()
+        self._cerrojo = threading.Lock()
+
+    def __repr__(self):
+        return f'<EspacioCache: {self.nombre}>'
+
+    def _clave(self, clave, grupo) -> str:
+        return f'{self.nombre}:{grupo}:{clave}'
+
+    def _clave_version(self, grupo) -> str:
+        return f'{self.nombre}:version:{grupo}'
+
+    def get_version(self, grupo='') -> int:
+        """Devuelve la versión actual de las claves del grupo."""
+        # Si la versión se pierde (p. ej. porque la caché la descarta), la nueva versión parte de
+        # la hora actual para no recuperar datos guardados con una versión anterior.
+        version = cache.get(self._clave_version(grupo))
+        if version is None:
+            cache.add(self._clave_version(grupo), int(time.time()), None)
+            version = cache.get(self._clave_version(grupo))
+        return version
+
+    def _contar(self, clave: str) -> None:
+        with self._cerrojo:
+            self._pendientes[clave] += 1
+            if time.monotonic() - self._volcado_en < INTERVALO_VOLCADO:
+                return
+        self.volcar_estadisticas()
+
+    def volcar_estadisticas(self) -> None:
+        """Suma a los contadores de la caché los aciertos y fallos pendientes de este proceso."""
+        with self._cerrojo:
+            pendientes = self._pendientes
+            self._pendientes = dict.fromkeys(pendientes, 0)
+            self._volcado_en = time.monotonic()
+        for clave, cantidad in pendientes.items():
+            if not cantidad:
+                continue
+            cache.add(clave, 0, None)
+            try:
+                cache.incr(clave, cantidad)
+            except ValueError:  # La clave se ha borrado entretanto.
+                cache.set(clave, cantidad, None)
+
+    def get_or_set(self, clave, calcular: Callable[[], Any], grupo='') -> Any:
+        """Devuelve el valor guardado con la clave, calculándolo y guardándolo si no está.
+
+        A diferencia de `cache.get_or_set`, se pueden guardar valores `None`.
+        """
+        clave = self._clave(clave, grupo)
+        version = self.get_version(grupo)
+        valor = cache.get(clave, _AUSENTE, version=version)
+        if valor is not _AUSENTE:
+            self._contar(self.clave_aciertos)
+            return valor
+
+        self._contar(self.clave_fallos)
+        valor = calcular()
+        cache.set(clave, valor, self.duracion, version=version)
+        return valor
+
+    def borrar(self, claves: Iterable, grupo='') -> None:
+        """Descarta los valores guardados con las claves indicadas."""
+        claves = [self._clave(clave, grupo) for clave in set(claves)]
+        cache.delete_many(claves, version=self.get_version(grupo))
+
+    def invalidar(self, grupo='') -> None:
+        """Descarta todos los valores del grupo, cambiando la versión de sus claves."""
+        self.get_version(grupo)
+        try:
+            cache.incr(self._clave_version(grupo))
+        except ValueError:  # La clave se ha borrado entretanto.
+            cache.set(self._clave_version(grupo), int(time.time()), None)
+
+    def get_estadisticas(self) -> dict:
+        """Devuelve el número de aciertos y fallos del espacio, y la tasa de aciertos.
+
+        Incluye los de este proceso y los que los demás ya hayan volcado en la caché.
+        """
+        self.volcar_estadisticas()
+        contadores = cache.get_many([self.clave_aciertos, self.clave_fallos])
+        aciertos = contadores.get(self.clave_aciertos, 0)
+        fallos = contadores.get(self.clave_fallos, 0)
+        total = aciertos + fallos
+        return {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': aciertos / total if total else 0,
+        }
+
+    def reiniciar_estadisticas(self) -> None:
+        """Pone a cero los contadores de aciertos y fallos del espacio."""
+        with self._cerrojo:
+            self._pendientes = dict.fromkeys(self._pendientes, 0)
+        cache.delete_many([self.clave_aciertos, self.clave_fallos])
+
+
+catalogo = EspacioCache('catalogo', 24 * 60 * 60)
+convocatoria = EspacioCache('convocatoria', 24 * 60 * 60)
+usuario = EspacioCache('usuario', 60 * 60)
+
+ESPACIOS = {espacio.nombre: espacio for espacio in (catalogo, convocatoria, usuario)}
+
+NUM_CONVOCATORIAS_RECIENTES = 5
+
+
+def get_convocatorias_recientes() -> list:
+    """Devuelve las últimas convocatorias, para el selector de convocatoria de las páginas."""
+    return catalogo.get_or_set(
+        'recientes',
+        lambda: list(Convocatoria.objects.order_by('-id')[:NUM_CONVOCATORIAS_RECIENTES]),
+    )
+
+
+def get_convocatoria(anyo: int):
+    """Devuelve la convocatoria del año indicado, o `None` si no existe."""
+    return convocatoria.get_or_set(
+        'convocatoria', lambda: Convocatoria.objects.filter(id=anyo).first(), grupo=anyo
+    )
+
+
+def invalidar_convocatoria(anyo: int) -> None:
+    """Descarta los datos guardados de la convocatoria y las últimas convocatorias."""
+    catalogo.invalidar()
+    convocatoria.invalidar(anyo)
+
+
+def get_mis_proyectos(usuario_id: int, anyo: int, calcular: Callable[[], dict]) -> dict:
+    """Devuelve los listados del usuario en la convocatoria, calculándolos si no están en caché."""
+    return usuario.get_or_set(f'mis-proyectos:{usuario_id}', calcular, grupo=anyo)
+
+
+def invalidar_mis_proyectos(usuario_ids: Iterable[int], anyo: int) -> None:
+    """Descarta los listados guardados de los usuarios indicados en la convocatoria."""
+    usuario.borrar((f'mis-proyectos:{usuario_id}' for usuario_id in usuario_ids), grupo=anyo)
+
+
+def invalidar_mis_proyectos_convocatoria(anyo: int) -> None:
+    """Descarta los listados guardados de todos los usuarios en la convocatoria."""
+    usuario.invalidar(anyo)
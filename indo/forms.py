@@ -26,6 +26,7 @@ from .models import (
     Proyecto,
     TipoParticipacion,
     Convocatoria,
+    CupoUsuario,
 )
 
 
@@ -229,9 +230,10 @@ class InvitacionForm(forms.ModelForm):
         if not usuario:
             usuario = self._crear_usuario(nip)
 
-        # El usuario existe. Actualizamos sus datos con los de Gestión de Identidades.
+        # El usuario existe. Actualizamos sus datos con los de Gestión de Identidades
+        # (sólo se espera al WS si los datos guardados son demasiado antiguos).
         try:
-            get_identidad(load_strategy(self.request), None, usuario)
+            usuario.actualizar_si_caducado(self.request)
         except Exception as ex:
             # Si Identidades devuelve un error, finalizamos mostrando el mensaje de error.
             raise forms.ValidationError('ERROR: ' + str(ex))
@@ -271,12 +273,10 @@ class InvitacionForm(forms.ModelForm):
             )
         # En algunos programas la participación de los estudiantes puede estar limitada
         # (por ejemplo a dos por proyecto)
-        if self.proyecto.programa.max_estudiantes and usuario.get_colectivo_principal() == 'EST':
-            estudiantes = [
-                vinculado
-                for vinculado in vinculados
-                if vinculado.get_colectivo_principal() == 'EST'
-            ]
+        if self.proyecto.programa.max_estudiantes and usuario.colectivo_principal == 'EST':
+            estudiantes = CustomUser.objects.filter(
+                vinculaciones__proyecto=self.proyecto, colectivo_principal='EST'
+            )
             if len(estudiantes) >= self.proyecto.programa.max_estudiantes:
                 nombres_estudiantes = ', '.join([e.full_name for e in estudiantes])
                 raise forms.ValidationError(
@@ -293,9 +293,9 @@ class InvitacionForm(forms.ModelForm):
         # Comprobamos el número máximo de participantes por proyecto
         max_participantes = self.proyecto.convocatoria.num_max_participantes
         num_participantes = (
-            self.proyecto.participantes.exclude(
-                tipo_participacion__in=['coordinador', 'coordinador_2', 'invitacion_rehusada']
-            ).count()
+            self.proyecto.num_participantes
+            + self.proyecto.num_invitados
+            + self.proyecto.num_colaboradores
         )
         # Sumamos 1 porque estamos invitando a uno nuevo
         if max_participantes and (num_participantes + 1) > max_participantes:
@@ -379,32 +379,10 @@ class ProyectoForm(forms.ModelForm):
         # IMPORTANTE: Los proyectos del programa PIPOUZ no computan para el límite
         if programa.nombre_corto != 'PIPOUZ':
             convocatoria = Programa.objects.get(id=programa.id).convocatoria
+            # Si estamos editando un proyecto existente, no lo contamos.
+            cupo = CupoUsuario.get(self.user, convocatoria, excluir_proyecto_id=self.instance.pk)
 
-            num_coordinaciones = (
-                ParticipanteProyecto.objects.filter(
-                    usuario=self.user,
-                    tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                    proyecto__convocatoria=convocatoria,
-                )
-                .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-                .exclude(proyecto__programa__nombre_corto='PIPOUZ')
-                .count()
-            )
-
-            # Si estamos editando un proyecto existente, restamos 1 al conteo si somos nosotros
-            # quien lo estamos editando y somos coordinador/coordinador_2
-            if self.instance.pk:
-                es_coordinador = (
-                    ParticipanteProyecto.objects.filter(
-                        usuario=self.user,
-                        proyecto=self.instance,
-                        tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                    ).exists()
-                )
-                if es_coordinador:
-                    num_coordinaciones -= 1
-
-            if num_coordinaciones >= convocatoria.num_max_coordinaciones:
+            if cupo.limite_coordinaciones_alcanzado:
                 self.add_error(
                     None,
                     _(
@@ -431,7 +409,7 @@ class ProyectoForm(forms.ModelForm):
             .values_list('id', 'nombre')
             .all()
         )
-        centros_del_usuario = [(c.id, str(c)) for c in self.user.centros]
+        centros_del_usuario = [(c.id, str(c)) for c in self.user.centros_activos]
         self.fields['centro'].widget.choices = (
             BLANK_CHOICE_DASH + centros_del_usuario
             if len(centros_del_usuario) > 1
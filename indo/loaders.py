@@ -0,0 +1,36 @@
+"""Carga por lotes de los datos relacionados con los proyectos.
+
+Los listados y exportaciones de proyectos necesitan, por cada fila, el coordinador del proyecto
+y los centros y departamentos de éste.  Obtenerlos de uno en uno supone varias consultas por
+proyecto; estas funciones los cargan para un lote completo con un número fijo de consultas y los
+dejan guardados en los propios objetos, de modo que `Proyecto.coordinador` y los centros y
+departamentos de los usuarios ya no acceden a la base de datos.
+"""
+
+from collections.abc import Iterable
+
+from django.db.models import prefetch_related_objects
+
+from .models import Proyecto
+
+TIPOS_COORDINADOR = ('coordinador', 'coordinador_2')
+
+
+def precargar_unidades(usuarios: Iterable) -> None:
+    """Carga los centros y departamentos de los usuarios indicados con dos consultas."""
+    usuarios = [usuario for usuario in usuarios if usuario is not None]
+    prefetch_related_objects(usuarios, 'centros', 'departamentos')
+
+
+def precargar_proyectos(proyectos: Iterable[Proyecto]) -> list[Proyecto]:
+    """Carga programa, centro, coordinadores y sus unidades de un lote de proyectos.
+
+    Devuelve la lista de proyectos.  Sirve tanto para una página de una tabla como para un
+    bloque de una exportación.
+    """
+    proyectos = list(proyectos)
+    prefetch_related_objects(proyectos, 'programa', 'centro', 'coordinador', 'coordinador_2')
+    precargar_unidades(
+        coordinador for proyecto in proyectos for coordinador in proyecto.get_coordinadores()
+    )
+    return proyectos
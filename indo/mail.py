@@ -0,0 +1,220 @@
+"""Cola de correo electrónico con envío en segundo plano.
+
+Los mensajes no se envían durante la petición HTTP: `encolar_correo` los renderiza y los guarda
+como `Correo` pendientes, y la tarea Huey `indo.tasks.enviar_correos` los envía después
+reutilizando una única conexión SMTP por lote, sin superar el número de mensajes por minuto
+que admite el servidor (`settings.EMAIL_MENSAJES_POR_MINUTO`).  Si el envío de un mensaje falla,
+se reintenta más tarde con una espera creciente, sin afectar al resto de mensajes.
+"""
+
+import os
+import time
+from collections.abc import Iterable
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.utils import timezone
+from templated_email import get_templated_mail
+
+from .models import Correo
+
+MAX_INTENTOS = 5
+ESPERA_REINTENTO = 60  # segundos; se duplica en cada nuevo intento
+TAMANYO_LOTE = 100
+DURACION_CACHE_PREVIAS = 600  # segundos
+
+
+class LimitadorTasa:
+    """Cubo de fichas («token bucket») que limita el número de envíos por minuto.
+
+    El cubo se rellena a razón de `por_minuto / 60` fichas por segundo, hasta un máximo de
+    `capacidad`.  Cada envío consume una ficha; si no queda ninguna, `esperar` duerme lo
+    necesario hasta que se genere la siguiente.
+    """
+
+    def __init__(
+        self, por_minuto: int, capacidad: int = 1, reloj=time.monotonic, dormir=time.sleep
+    ):
+        self.tasa = por_minuto / 60
+        self.capacidad = capacidad
+        self.fichas = float(capacidad)
+        self._reloj = reloj
+        self._dormir = dormir
+        self._ultimo = reloj()
+
+    def _rellenar(self) -> None:
+        ahora = self._reloj()
+        self.fichas = min(self.capacidad, self.fichas + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def esperar(self) -> None:
+        """Consume una ficha, esperando si es necesario a que haya alguna disponible."""
+        self._rellenar()
+        if self.fichas < 1:
+            self._dormir((1 - self.fichas) / self.tasa)
+            self._rellenar()
+        self.fichas -= 1
+
+
+def encolar_correo(
+    plantilla: str,
+    destinatarios: Iterable[str],
+    contexto: dict,
+    cc: Iterable[str] = (),
+    convocatoria=None,
+    proyecto=None,
+    enviar: bool = True,
+) -> Correo:
+    """Renderiza la plantilla de `templated_email` indicada y guarda el mensaje en la cola.
+
+    Si `enviar` es verdadero, se lanza la tarea de envío al confirmarse la transacción en curso.
+    Quien encole muchos mensajes seguidos puede pasar `enviar=False` y llamar después una sola
+    vez a `programar_envio`.
+    """
+    mensaje = get_templated_mail(
+        template_name=plantilla,
+        context=contexto,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=list(destinatarios),
+        cc=list(cc),
+    )
+    cuerpo_html = next(
+        (
+            contenido
+            for contenido, tipo in getattr(mensaje, 'alternatives', [])
+            if tipo == 'text/html'
+        ),
+        None,
+    )
+    correo = Correo.objects.create(
+        convocatoria=convocatoria or (proyecto.convocatoria if proyecto else None),
+        proyecto=proyecto,
+        plantilla=plantilla,
+        remitente=mensaje.from_email,
+        destinatarios=mensaje.to,
+        cc=mensaje.cc,
+        asunto=mensaje.subject,
+        cuerpo=mensaje.body,
+        cuerpo_html=cuerpo_html,
+    )
+    if enviar:
+        programar_envio()
+    return correo
+
+
+def _get_ficheros_plantilla(nombre: str, vistas: set | None = None) -> list[str]:
+    """Devuelve el fichero de la plantilla y los de las que extiende o incluye, recursivamente.
+
+    Sólo se siguen las plantillas de nombre fijo (`{% include "x.html" %}`), no las variables.
+    """
+    vistas = set() if vistas is None else vistas
+    vistas.add(nombre)
+    plantilla = get_template(nombre).template
+    ficheros = [plantilla.origin.name]
+    for nodo in plantilla.nodelist.get_nodes_by_type((ExtendsNode, IncludeNode)):
+        expresion = nodo.parent_name if isinstance(nodo, ExtendsNode) else nodo.template
+        if isinstance(expresion.var, str) and expresion.var not in vistas:
+            ficheros.extend(_get_ficheros_plantilla(expresion.var, vistas))
+    return ficheros
+
+
+def previsualizar_correo(plantilla: str, contexto: dict, clave: str) -> dict:
+    """Devuelve el asunto y el cuerpo en texto plano del mensaje de la plantilla indicada.
+
+    El resultado se guarda en la caché bajo `clave` y las fechas de modificación de la plantilla
+    y de las que extiende o incluye, de modo que editarlas invalida las previsualizaciones
+    anteriores.  Con `DEBUG` no se usa la caché.
+    """
+
+    def renderizar():
+        mensaje = get_templated_mail(template_name=plantilla, context=contexto, to=[])
+        return {'subject': mensaje.subject, 'body': mensaje.body}
+
+    if settings.DEBUG:
+        return renderizar()
+
+    fechas = ':'.join(
+        str(os.path.getmtime(fichero))
+        for fichero in _get_ficheros_plantilla(f'templated_email/{plantilla}.email')
+    )
+    clave_cache = f'previa-correo:{plantilla}:{clave}:{fechas}'
+    return cache.get_or_set(clave_cache, renderizar, DURACION_CACHE_PREVIAS)
+
+
+def programar_envio() -> None:
+    """Lanza la tarea de envío de los correos pendientes cuando termine la transacción."""
+    from .tasks import enviar_correos
+
+    transaction.on_commit(enviar_correos)
+
+
+def _construir_mensaje(correo: Correo, conexion) -> EmailMultiAlternatives:
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.cuerpo,
+        from_email=correo.remitente,
+        to=correo.destinatarios,
+        cc=correo.cc,
+        connection=conexion,
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _registrar_fallo(correo: Correo, err: Exception) -> None:
+    correo.intentos += 1
+    correo.error = f'{type(err).__name__}: {err}'
+    if correo.intentos >= MAX_INTENTOS:
+        correo.estado = Correo.Estado.FALLIDO
+        correo.proximo_intento = None
+    else:
+        espera = ESPERA_REINTENTO * 2 ** (correo.intentos - 1)
+        correo.proximo_intento = timezone.now() + timedelta(seconds=espera)
+    correo.save(update_fields=['intentos', 'error', 'estado', 'proximo_intento'])
+
+
+def enviar_correos_pendientes(limitador: LimitadorTasa | None = None) -> dict:
+    """Envía los correos pendientes cuyo próximo intento ya ha llegado.
+
+    Usa una sola conexión SMTP para todos los mensajes, que se vuelve a abrir si un envío falla.
+    Devuelve un diccionario con el número de mensajes enviados y fallidos.
+    """
+    if limitador is None:
+        limitador = LimitadorTasa(settings.EMAIL_MENSAJES_POR_MINUTO)
+    resultado = {'enviados': 0, 'fallidos': 0}
+    conexion = get_connection()
+    try:
+        while True:
+            lote = list(
+                Correo.objects.filter(estado=Correo.Estado.PENDIENTE).filter(
+                    Q(proximo_intento__isnull=True) | Q(proximo_intento__lte=timezone.now())
+                )[:TAMANYO_LOTE]
+            )
+            if not lote:
+                break
+
+            for correo in lote:
+                limitador.esperar()
+                try:
+                    conexion.open()
+                    _construir_mensaje(correo, conexion).send()
+                except Exception as err:  # smtplib.SMTPException, OSError, etc
+                    _registrar_fallo(correo, err)
+                    resultado['fallidos'] += 1
+                    conexion.close()
+                else:
+                    correo.estado = Correo.Estado.ENVIADO
+                    correo.fecha_envio = timezone.now()
+                    correo.error = None
+                    correo.save(update_fields=['estado', 'fecha_envio', 'error'])
+                    resultado['enviados'] += 1
+    finally:
+        conexion.close()
+    return resultado
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.actualizacion import actualizar_identidades, describir_resultado, get_coordinadores
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza los coordinadores de los proyectos de una convocatoria '
+        'con los datos de Gestión de Identidades.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anyo', type=int, help='Año de la convocatoria')
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            default=settings.SOAP_CONEXIONES,
+            help='Número de consultas simultáneas al WS de Identidades',
+        )
+
+    def handle(self, *args, **options):
+        coordinadores = get_coordinadores(options['anyo'])
+        self.stdout.write(f'Coordinadores a actualizar: {len(coordinadores)}')
+
+        resultado = actualizar_identidades(coordinadores, hilos=options['hilos'])
+        for nip, error in resultado['errores'].items():
+            self.stderr.write(f'ERROR al actualizar el usuario «{nip}»: {error}')
+        for nip, aviso in resultado['avisos'].items():
+            self.stdout.write(self.style.WARNING(f'Aviso sobre el usuario «{nip}»: {aviso}'))
+        self.stdout.write(self.style.SUCCESS(describir_resultado(resultado)))
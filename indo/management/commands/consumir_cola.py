@@ -0,0 +1,50 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import autodiscover_modules
+from huey.consumer_options import ConsumerConfig
+
+from manhattan_project.colas import get_cola
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta el consumidor de una cola de tareas, con los trabajadores indicados en '
+        '`settings.COLAS_TAREAS`.  Sólo el de la cola `general` programa las tareas periódicas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('cola', help='Cola a consumir: ' + ', '.join(settings.COLAS_TAREAS))
+        parser.add_argument(
+            '--trabajadores',
+            type=int,
+            help='Número de trabajadores (por omisión, el configurado)',
+        )
+
+    def handle(self, *args, **options):
+        nombre = options['cola']
+        if nombre not in settings.COLAS_TAREAS:
+            raise CommandError(f'Cola de tareas desconocida: {nombre}')
+        configuracion = settings.COLAS_TAREAS[nombre]
+
+        # Registra las tareas de las aplicaciones en sus colas, y con ellas sus cerrojos.
+        autodiscover_modules('tasks')
+
+        config = ConsumerConfig(
+            workers=options['trabajadores'] or configuracion['trabajadores'],
+            worker_type=configuracion['tipo'],
+            periodic=nombre == 'general',
+            # Libera los cerrojos de `indo.tasks` que quedaran tomados si el consumidor anterior
+            # terminó a la fuerza; si no, las tareas que los usan no volverían a ejecutarse.
+            flush_locks=True,
+        )
+        config.validate()
+        logger = logging.getLogger('huey')
+        if not logger.handlers:
+            config.setup_logger(logger)
+
+        if configuracion['nice']:
+            os.nice(configuracion['nice'])
+        get_cola(nombre).create_consumer(**config.values).run()
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from indo.cache import ESPACIOS
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra los aciertos y fallos de cada espacio de nombres de la caché. '
+        'Los contadores sólo son comunes a todos los procesos si la caché es compartida, y '
+        'cada proceso suma los suyos como mucho una vez por minuto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'espacios',
+            nargs='*',
+            metavar='espacio',
+            help='Espacios a mostrar (por omisión, todos): ' + ', '.join(sorted(ESPACIOS)),
+        )
+        parser.add_argument(
+            '--reiniciar', action='store_true', help='Pone los contadores a cero tras mostrarlos'
+        )
+
+    def handle(self, *args, **options):
+        desconocidos = set(options['espacios']) - set(ESPACIOS)
+        if desconocidos:
+            raise CommandError(f"Espacios desconocidos: {', '.join(sorted(desconocidos))}")
+
+        for nombre in options['espacios'] or ESPACIOS:
+            espacio = ESPACIOS[nombre]
+            estadisticas = espacio.get_estadisticas()
+            self.stdout.write(
+                f"{nombre}: {estadisticas['aciertos']} aciertos, "
+                f"{estadisticas['fallos']} fallos "
+                f"({estadisticas['tasa_aciertos']:.1%} de aciertos)."
+            )
+            if options['reiniciar']:
+                espacio.reiniciar_estadisticas()
@@ -0,0 +1,97 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+
+from indo.models import Proyecto
+from indo.tasks import generar_pdf
+from indo.utils import get_id_tarea_memoria_pdf, registrar_memorias_pdf
+
+
+def _generar_memoria(proyecto_id: int, base_url: str, pdf_destino: str) -> None:
+    """Genera el PDF de una memoria en un proceso hijo, que abrirá su propia conexión a la BD."""
+    generar_pdf.call_local(proyecto_id, base_url, pdf_destino)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera los PDF de las memorias presentadas en una convocatoria, '
+        'omitiendo los que son posteriores a la última modificación de la memoria.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anyo', type=int, help='Año de la convocatoria')
+        parser.add_argument(
+            '--forzar', action='store_true', help='Regenera también los PDF ya actualizados'
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count(),
+            help='Número de procesos que generan PDF simultáneamente',
+        )
+        parser.add_argument(
+            '--huey',
+            action='store_true',
+            help='Encola la generación en Huey, en lugar de realizarla en este proceso',
+        )
+
+    def handle(self, *args, **options):
+        proyectos = [
+            proyecto
+            for proyecto in Proyecto.get_memorias_presentadas(options['anyo'])
+            if options['forzar'] or not proyecto.tiene_pdf_memoria_actualizado()
+        ]
+        trabajos = [
+            (
+                proyecto.id,
+                f"{settings.SITE_URL}{reverse('memoria_detail', args=[proyecto.id])}",
+                str(proyecto.get_ruta_pdf_memoria()),
+            )
+            for proyecto in proyectos
+        ]
+        total = len(trabajos)
+        self.stdout.write(f'Memorias a generar: {total}')
+        if not total:
+            return
+
+        if options['huey']:
+            # El progreso se muestra en la página de envío de las memorias a Zaguán.
+            registrar_memorias_pdf(options['anyo'], [proyecto.id for proyecto in proyectos])
+            for trabajo in trabajos:
+                generar_pdf(*trabajo, id=get_id_tarea_memoria_pdf(trabajo[0]))
+            self.stdout.write(self.style.SUCCESS(f'Encoladas {total} memorias en Huey.'))
+            return
+
+        # Los procesos hijos no deben compartir la conexión a la BD del proceso padre.
+        connections.close_all()
+        generados = 0
+        inicio = time.monotonic()
+        with ProcessPoolExecutor(max_workers=options['procesos']) as ejecutor:
+            futuros = {
+                ejecutor.submit(_generar_memoria, *trabajo): trabajo for trabajo in trabajos
+            }
+            for numero, futuro in enumerate(as_completed(futuros), start=1):
+                proyecto_id, _base_url, pdf_destino = futuros[futuro]
+                try:
+                    futuro.result()
+                except Exception as ex:
+                    self.stderr.write(
+                        f'[{numero}/{total}] ERROR en el proyecto {proyecto_id}: {ex}'
+                    )
+                else:
+                    generados += 1
+                    self.stdout.write(f'[{numero}/{total}] {os.path.basename(pdf_destino)}')
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generados {generados} de {total} PDF en {duracion:.1f} s '
+                f'({generados * 60 / duracion:.1f} PDF/minuto).'
+            )
+        )
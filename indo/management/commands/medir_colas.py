@@ -0,0 +1,97 @@
+import signal
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from manhattan_project.colas import crear_huey
+
+
+def _medir_espera(encolada_en: float, duracion: float) -> float:
+    """Devuelve los segundos transcurridos desde que se encoló la tarea, y simula su trabajo."""
+    espera = time.time() - encolada_en
+    time.sleep(duracion)
+    return espera
+
+
+def _resumir(esperas: list[float]) -> str:
+    esperas = [espera * 1000 for espera in esperas]
+    p95 = statistics.quantiles(esperas, n=20)[-1] if len(esperas) > 1 else esperas[0]
+    return (
+        f'espera media {statistics.fmean(esperas):.0f} ms, '
+        f'p95 {p95:.0f} ms, máxima {max(esperas):.0f} ms.'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia entre que se encola una tarea y empieza a ejecutarse, con la cola '
+        'cargada.  Usa una cola aparte (`medicion-<cola>`) con el backend y los trabajadores '
+        'de la indicada, y un consumidor en este proceso, así que no interfiere con los '
+        'consumidores en marcha.  Tras las tareas normales se encolan otras urgentes, de mayor '
+        'prioridad.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cola', nargs='?', default='pdf', help='Cola a simular (por omisión, pdf)'
+        )
+        parser.add_argument('--tareas', type=int, default=200, help='Número de tareas normales')
+        parser.add_argument('--urgentes', type=int, default=10, help='Número de tareas urgentes')
+        parser.add_argument(
+            '--duracion', type=float, default=0.05, help='Segundos que dura cada tarea'
+        )
+        parser.add_argument(
+            '--trabajadores',
+            type=int,
+            help='Número de trabajadores (por omisión, el de la cola)',
+        )
+
+    def handle(self, *args, **options):
+        nombre = options['cola']
+        if nombre not in settings.COLAS_TAREAS:
+            raise CommandError(f'Cola de tareas desconocida: {nombre}')
+        if options['tareas'] < 1:
+            raise CommandError('Debe haber al menos una tarea normal.')
+        trabajadores = options['trabajadores'] or settings.COLAS_TAREAS[nombre]['trabajadores']
+        duracion = options['duracion']
+
+        huey = crear_huey(f'medicion-{nombre}', settings.HUEY_BACKEND, settings.HUEY_LOCATION)
+        huey.flush()  # Restos de una medición interrumpida.
+        tarea = huey.task()(_medir_espera)
+        # Los trabajadores son hilos: se mide la espera en la cola, no la capacidad de cálculo.
+        consumidor = huey.create_consumer(workers=trabajadores, periodic=False)
+
+        # El consumidor instala sus manejadores de señales, que hay que restaurar después.
+        senales = {
+            senal: signal.getsignal(senal)
+            for senal in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+        }
+        inicio = time.monotonic()
+        consumidor.start()
+        try:
+            normales = [tarea(time.time(), duracion) for _ in range(options['tareas'])]
+            urgentes = [
+                huey.enqueue(tarea.s(time.time(), duracion, priority=10))
+                for _ in range(options['urgentes'])
+            ]
+            limite = (len(normales) + len(urgentes)) * duracion / trabajadores + 30
+            esperas_normales = [r.get(blocking=True, timeout=limite) for r in normales]
+            esperas_urgentes = [r.get(blocking=True, timeout=limite) for r in urgentes]
+        finally:
+            consumidor.stop(graceful=True)
+            for senal, manejador in senales.items():
+                signal.signal(senal, manejador)
+            huey.flush()
+        total = time.monotonic() - inicio
+
+        num_tareas = len(normales) + len(urgentes)
+        self.stdout.write(
+            f'Cola {nombre} ({settings.HUEY_BACKEND}, {trabajadores} trabajadores): '
+            f'{num_tareas} tareas de {duracion * 1000:.0f} ms en {total:.1f} s '
+            f'({num_tareas / total:.1f} tareas/s).'
+        )
+        self.stdout.write(f'Normales ({len(normales)}): {_resumir(esperas_normales)}')
+        if urgentes:
+            self.stdout.write(f'Urgentes ({len(urgentes)}): {_resumir(esperas_urgentes)}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from indo.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los contadores de participantes, invitados y colaboradores de los proyectos, '
+        'y sus coordinadores (p. ej. tras modificar vinculaciones directamente en la BD).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anyo', type=int, help='Año de la convocatoria (por omisión, todas)'
+        )
+
+    def handle(self, *args, **options):
+        proyecto_ids = None
+        if options['anyo']:
+            proyecto_ids = Proyecto.objects.filter(convocatoria_id=options['anyo']).values('id')
+        corregidos = Proyecto.actualizar_contadores(proyecto_ids)
+        self.stdout.write(self.style.SUCCESS(f'Proyectos con contadores corregidos: {corregidos}'))
+        corregidos = Proyecto.actualizar_coordinadores(proyecto_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Proyectos con coordinadores corregidos: {corregidos}')
+        )
@@ -0,0 +1,233 @@
+"""Registros MARCXML de las memorias, para catalogarlas en Zaguán (el repositorio institucional).
+
+Véase [MARC 21 Format for Bibliographic Data](https://www.loc.gov/marc/bibliographic/).
+
+Los registros se crean de uno en uno a partir de un único queryset, cuyas relaciones se cargan
+por bloques, y se escriben con `lxml.etree.xmlfile` según se crean, de modo que la memoria usada
+no depende del número de memorias.  Cada registro se valida con el esquema MARC21 slim
+(`esquemas/MARC21slim.xsd`) antes de escribirlo.
+
+Zaguán recibe las memorias en varios envíos de `MEMORIAS_POR_ENVIO` registros como máximo, y
+se espera su respuesta a cada uno `settings.REPO_TIMEOUT` segundos como máximo.
+"""
+
+import sys
+from collections.abc import Iterable, Iterator
+from functools import cache
+from itertools import islice
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.db.models import Prefetch, QuerySet
+from lxml import etree
+
+from .models import ParticipanteProyecto, Proyecto
+from .utils import CARACTERES_ILEGALES_XML, Tuberia
+
+MARC_NS = 'http://www.loc.gov/MARC21/slim'
+# Proyectos leídos de la BD (con sus relaciones) de una vez
+TAMANO_BLOQUE = 100
+MEMORIAS_POR_ENVIO = 100
+
+
+@cache
+def get_esquema() -> etree.XMLSchema:
+    """Devuelve el esquema MARC21 slim con el que se validan los registros."""
+    ruta = Path(__file__).parent / 'esquemas' / 'MARC21slim.xsd'
+    return etree.XMLSchema(etree.parse(str(ruta)))
+
+
+def precargar_relaciones(proyectos: QuerySet) -> QuerySet:
+    """Añade al queryset las relaciones que necesitan los registros, para cargarlas por bloques."""
+    participantes = (
+        ParticipanteProyecto.objects.filter(tipo_participacion_id='participante')
+        .select_related('usuario')
+        .order_by('usuario__first_name', 'usuario__last_name')
+    )
+    return proyectos.select_related(
+        'programa', 'linea', 'licencia', 'coordinador', 'coordinador_2'
+    ).prefetch_related(
+        Prefetch('participantes', queryset=participantes, to_attr='participantes_marc')
+    )
+
+
+def get_memorias_publicables(anyo: int) -> QuerySet:
+    """Devuelve los proyectos de la convocatoria cuya memoria se publica, con sus relaciones."""
+    return precargar_relaciones(
+        Proyecto.objects.filter(convocatoria_id=anyo, es_publicable=True)
+    ).order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
+
+
+def _url_media(carpeta: str) -> str:
+    return f'{settings.SITE_URL}{settings.MEDIA_URL}{carpeta}/'
+
+
+def _campo(registro, etiqueta: str, subcampos: Iterable[tuple[str, object]], ind1=' ', ind2=' '):
+    """Añade al registro un campo con los subcampos indicados, omitiendo los vacíos."""
+    campo = etree.SubElement(
+        registro, f'{{{MARC_NS}}}datafield', tag=etiqueta, ind1=ind1, ind2=ind2
+    )
+    for codigo, valor in subcampos:
+        if valor is None:
+            continue
+        subcampo = etree.SubElement(campo, f'{{{MARC_NS}}}subfield', code=codigo)
+        subcampo.text = CARACTERES_ILEGALES_XML.sub('', str(valor))
+
+
+def _autor(usuario, coordinador: bool) -> list[tuple[str, object]]:
+    # El ORCID identifica al autor; si no lo tiene, no debe haber subcampo 0.
+    subcampos = [('0', f'(orcid){usuario.orcid}')] if usuario.orcid else []
+    subcampos.append(('a', usuario.apellidos_nombre))
+    if coordinador:
+        subcampos.append(('e', 'coord.'))
+    return subcampos
+
+
+def crear_registro(proyecto: Proyecto) -> etree._Element:
+    """Devuelve el registro MARCXML de la memoria del proyecto, validado con el esquema.
+
+    Los participantes se toman de `participantes_marc` (véase `precargar_relaciones`).
+    """
+    anyo = proyecto.convocatoria_id
+    identificador = f'INNODOC-{anyo}-{proyecto.id}'
+    registro = etree.Element(f'{{{MARC_NS}}}record', nsmap={None: MARC_NS})
+
+    _campo(registro, '024', [('2', 'innovaciondocente'), ('a', proyecto.id)], ind1='8')
+    _campo(registro, '037', [('a', identificador)])
+    _campo(registro, '041', [('a', 'spa')])
+    if proyecto.coordinador:
+        _campo(registro, '100', _autor(proyecto.coordinador, coordinador=True))
+    _campo(registro, '245', [('a', proyecto.titulo)])
+    _campo(registro, '260', [('a', 'Zaragoza'), ('b', 'Universidad de Zaragoza'), ('c', anyo)])
+    if proyecto.descripcion_txt:
+        _campo(registro, '520', [('a', proyecto.descripcion_txt)], ind1='3')
+    if proyecto.licencia:
+        _campo(
+            registro,
+            '540',
+            [
+                ('9', 'info:eu-repo/semantics/openAccess'),
+                ('a', proyecto.licencia.identificador),
+                ('u', proyecto.licencia.url),
+            ],
+        )
+
+    # El campo 700 se repite para cada uno de los demás autores.
+    if proyecto.coordinador_2:
+        _campo(registro, '700', _autor(proyecto.coordinador_2, coordinador=True))
+    for participante in proyecto.participantes_marc:
+        _campo(registro, '700', _autor(participante.usuario, coordinador=False))
+
+    # El campo FFT se repite para cada documento asociado: URL, nombre y descripción.
+    fichero = f'{anyo}/{proyecto.programa.nombre_corto}_{proyecto.id}.pdf'
+    url_memoria = proyecto.enlace if anyo < 2021 else _url_media('memoria') + fichero
+    _campo(
+        registro,
+        'FFT',
+        [
+            ('a', url_memoria),
+            ('n', f'memoria_{proyecto.programa}_{anyo}_{proyecto.id}'),
+            ('d', 'Memoria del proyecto'),
+        ],
+    )
+    if proyecto.tiene_infografia:
+        _campo(
+            registro,
+            'FFT',
+            [
+                ('a', _url_media('infografia') + fichero),
+                ('n', f'infografia_{proyecto.programa}_{anyo}_{proyecto.id}'),
+                ('d', 'Infografía del proyecto'),
+            ],
+        )
+
+    _campo(registro, '970', [('a', identificador)])
+    # El campo 980 categoriza los contenidos.
+    categorias = [('a', 'INNODOC'), ('b', proyecto.programa)]
+    if proyecto.linea:
+        categorias.append(('c', proyecto.linea))
+    _campo(registro, '980', categorias)
+
+    esquema = get_esquema()
+    if not esquema.validate(registro):
+        raise ValueError(
+            f'El registro MARCXML del proyecto {proyecto.id} no es válido: '
+            f'{esquema.error_log.last_error.message}'
+        )
+    return registro
+
+
+def generar_marcxml(proyectos: Iterable[Proyecto]) -> Iterator[bytes]:
+    """Genera por trozos la colección MARCXML de las memorias de los proyectos."""
+    if isinstance(proyectos, QuerySet):
+        proyectos = proyectos.iterator(chunk_size=TAMANO_BLOQUE)
+
+    tuberia = Tuberia()
+    with etree.xmlfile(tuberia, encoding='UTF-8') as xml:
+        xml.write_declaration()
+        with xml.element(f'{{{MARC_NS}}}collection', nsmap={None: MARC_NS}):
+            for proyecto in proyectos:
+                xml.write(crear_registro(proyecto))
+                xml.flush()
+                yield tuberia.recoger()
+    yield tuberia.recoger()
+
+
+def generar_lotes_marcxml(proyectos: Iterable[Proyecto], tamano: int) -> Iterator[bytes]:
+    """Genera colecciones MARCXML completas de `tamano` memorias como máximo."""
+    if isinstance(proyectos, QuerySet):
+        proyectos = proyectos.iterator(chunk_size=TAMANO_BLOQUE)
+
+    proyectos = iter(proyectos)
+    while lote := list(islice(proyectos, tamano)):
+        yield b''.join(generar_marcxml(lote))
+
+
+def _enviar_lote(datos: bytes, numero: int) -> str:
+    payload = {'mode': '-ir'}
+    files = {'file': (f'listado_{numero}.xml', datos, 'application/xml')}
+    headers = {'user-agent': 'zaguan_indo'}
+
+    try:
+        resp = requests.post(
+            settings.REPO_WSURL,
+            data=payload,
+            files=files,
+            headers=headers,
+            timeout=settings.REPO_TIMEOUT,
+        )
+        resp.raise_for_status()
+    except requests.exceptions.SSLError:
+        raise requests.exceptions.SSLError(
+            'No fue posible verificar el certificado SSL del repositorio'
+        )
+    except requests.exceptions.ConnectionError:
+        raise requests.exceptions.ConnectionError('No fue posible conectar con el repositorio')
+    except requests.exceptions.HTTPError:
+        raise requests.exceptions.HTTPError('El repositorio devolvió una respuesta HTTP no válida')
+    except requests.exceptions.Timeout:
+        raise requests.exceptions.Timeout('El repositorio no respondió')
+    except requests.exceptions.RequestException:
+        raise requests.exceptions.RequestException(
+            f'Problema desconocido al enviar la petición al repositorio ({sys.exc_info()[0]})'
+        )
+    return resp.content.decode('utf-8')
+
+
+def enviar_memorias(anyo: int) -> tuple[list[str], Exception | None]:
+    """Envía a Zaguán las memorias publicables de la convocatoria, por lotes.
+
+    Devuelve las respuestas del repositorio a los lotes enviados y, si alguno falla, el error.
+    Tras un fallo no se envían los lotes siguientes, así que el lote fallido es el siguiente al
+    último enviado.
+    """
+    respuestas = []
+    lotes = generar_lotes_marcxml(get_memorias_publicables(anyo), MEMORIAS_POR_ENVIO)
+    try:
+        # Los registros no válidos (`ValueError`) se detectan al generar su lote.
+        for numero, lote in enumerate(lotes, start=1):
+            respuestas.append(_enviar_lote(lote, numero))
+    except (requests.exceptions.RequestException, ValueError) as err:
+        return respuestas, err
+    return respuestas, None
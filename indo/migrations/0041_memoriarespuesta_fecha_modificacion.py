@@ -0,0 +1,58 @@
+import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def rellenar_fecha_modificacion(apps, schema_editor):
+    """Rellena la fecha de modificación de las respuestas existentes.
+
+    Se toma la fecha del PDF de la memoria, si existe, para que no se considere desactualizado.
+    Si no existe, la del fin del plazo de presentación de las memorias de la convocatoria.
+    """
+    MemoriaRespuesta = apps.get_model('indo', 'MemoriaRespuesta')
+    Proyecto = apps.get_model('indo', 'Proyecto')
+
+    proyectos = (
+        Proyecto.objects.filter(respuestas_memoria__fecha_modificacion__isnull=True)
+        .select_related('convocatoria', 'programa')
+        .distinct()
+    )
+    for proyecto in proyectos.iterator():
+        ruta = (
+            Path(settings.MEDIA_ROOT)
+            / 'memoria'
+            / str(proyecto.convocatoria_id)
+            / f'{proyecto.programa.nombre_corto}_{proyecto.id}.pdf'
+        )
+        if ruta.exists():
+            fecha = datetime.datetime.fromtimestamp(ruta.stat().st_mtime, tz=datetime.timezone.utc)
+        elif proyecto.convocatoria.fecha_max_memorias:
+            fecha = datetime.datetime.combine(
+                proyecto.convocatoria.fecha_max_memorias, datetime.time.max, datetime.timezone.utc
+            )
+        else:
+            fecha = timezone.now()
+        MemoriaRespuesta.objects.filter(
+            proyecto_id=proyecto.id, fecha_modificacion__isnull=True
+        ).update(fecha_modificacion=fecha)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indo', '0040_convocatoria_permite_colaboradores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memoriarespuesta',
+            name='fecha_modificacion',
+            field=models.DateTimeField(
+                auto_now=True, null=True, verbose_name='fecha de modificación'
+            ),
+        ),
+        migrations.RunPython(rellenar_fecha_modificacion, migrations.RunPython.noop),
+    ]
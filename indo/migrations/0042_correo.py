@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indo', '0041_memoriarespuesta_fecha_modificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Correo',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('plantilla', models.CharField(max_length=63, verbose_name='plantilla')),
+                ('remitente', models.CharField(max_length=255, verbose_name='remitente')),
+                ('destinatarios', models.JSONField(default=list, verbose_name='destinatarios')),
+                ('cc', models.JSONField(default=list, verbose_name='con copia a')),
+                ('asunto', models.CharField(max_length=255, verbose_name='asunto')),
+                ('cuerpo', models.TextField(verbose_name='cuerpo')),
+                (
+                    'cuerpo_html',
+                    models.TextField(blank=True, null=True, verbose_name='cuerpo HTML'),
+                ),
+                (
+                    'estado',
+                    models.CharField(
+                        choices=[
+                            ('PENDIENTE', 'Pendiente'),
+                            ('ENVIADO', 'Enviado'),
+                            ('FALLIDO', 'Fallido'),
+                        ],
+                        db_index=True,
+                        default='PENDIENTE',
+                        max_length=15,
+                        verbose_name='estado',
+                    ),
+                ),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='intentos')),
+                (
+                    'proximo_intento',
+                    models.DateTimeField(blank=True, null=True, verbose_name='próximo intento'),
+                ),
+                ('error', models.TextField(blank=True, null=True, verbose_name='último error')),
+                (
+                    'fecha_creacion',
+                    models.DateTimeField(auto_now_add=True, verbose_name='fecha de creación'),
+                ),
+                (
+                    'fecha_envio',
+                    models.DateTimeField(blank=True, null=True, verbose_name='fecha de envío'),
+                ),
+                (
+                    'convocatoria',
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='correos',
+                        to='indo.convocatoria',
+                    ),
+                ),
+                (
+                    'proyecto',
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='correos',
+                        to='indo.proyecto',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'correo',
+                'verbose_name_plural': 'correos',
+                'ordering': ('id',),
+            },
+        ),
+    ]
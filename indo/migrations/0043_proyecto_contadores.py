@@ -0,0 +1,61 @@
+from django.db import migrations, models
+
+CONTADORES = {
+    'participante': 'num_participantes',
+    'invitado': 'num_invitados',
+    'colaborador': 'num_colaboradores',
+}
+
+
+def calcular_contadores(apps, schema_editor):
+    Proyecto = apps.get_model('indo', 'Proyecto')
+    ParticipanteProyecto = apps.get_model('indo', 'ParticipanteProyecto')
+
+    cuentas = {}
+    for fila in (
+        ParticipanteProyecto.objects.filter(tipo_participacion_id__in=CONTADORES)
+        .values('proyecto_id', 'tipo_participacion_id')
+        .annotate(num=models.Count('id'))
+        .order_by()
+    ):
+        cuentas.setdefault(fila['proyecto_id'], {})[CONTADORES[fila['tipo_participacion_id']]] = (
+            fila['num']
+        )
+
+    proyectos = list(Proyecto.objects.filter(id__in=cuentas).only('id'))
+    for proyecto in proyectos:
+        for campo, valor in cuentas[proyecto.id].items():
+            setattr(proyecto, campo, valor)
+    Proyecto.objects.bulk_update(proyectos, list(CONTADORES.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indo', '0042_correo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='num_participantes',
+            field=models.PositiveSmallIntegerField(
+                db_index=True, default=0, editable=False, verbose_name='Número de participantes'
+            ),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='num_invitados',
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name='Número de invitados'
+            ),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='num_colaboradores',
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name='Número de colaboradores'
+            ),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CAMPOS = {'coordinador': 'coordinador_id', 'coordinador_2': 'coordinador_2_id'}
+
+
+def copiar_coordinadores(apps, schema_editor):
+    Proyecto = apps.get_model('indo', 'Proyecto')
+    ParticipanteProyecto = apps.get_model('indo', 'ParticipanteProyecto')
+
+    coordinadores = {}
+    for proyecto_id, tipo, usuario_id in (
+        ParticipanteProyecto.objects.filter(tipo_participacion_id__in=CAMPOS)
+        .order_by('-id')
+        .values_list('proyecto_id', 'tipo_participacion_id', 'usuario_id')
+    ):
+        coordinadores.setdefault(proyecto_id, {})[CAMPOS[tipo]] = usuario_id
+
+    proyectos = list(Proyecto.objects.filter(id__in=coordinadores).only('id'))
+    for proyecto in proyectos:
+        for campo, usuario_id in coordinadores[proyecto.id].items():
+            setattr(proyecto, campo, usuario_id)
+    Proyecto.objects.bulk_update(proyectos, list(CAMPOS), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('indo', '0043_proyecto_contadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='coordinador',
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='proyectos_coordinados',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='coordinador_2',
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='proyectos_coordinados_2',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(copiar_coordinadores, migrations.RunPython.noop),
+    ]
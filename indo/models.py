@@ -2,10 +2,14 @@
 from __future__ import annotations
 
 import datetime
+import itertools
+from pathlib import Path
 
 # Django
+from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db import connection, models
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -126,12 +130,52 @@ class Convocatoria(models.Model):
 
     @classmethod
     def get_ultima(cls) -> Convocatoria:
-        """Devuelve la última convocatoria."""
+        """Devuelve la última convocatoria (guardada en la caché, véase `indo.cache`)."""
+        from .cache import get_convocatorias_recientes
 
-        ultima_convocatoria = Convocatoria.objects.order_by('-id').first()
-        if not ultima_convocatoria:
+        convocatorias = get_convocatorias_recientes()
+        if not convocatorias:
             raise Convocatoria.DoesNotExist
-        return ultima_convocatoria
+        return convocatorias[0]
+
+
+class Correo(models.Model):
+    """Mensaje de correo encolado para su envío en segundo plano (véase `indo.mail`)."""
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', _('Pendiente')
+        ENVIADO = 'ENVIADO', _('Enviado')
+        FALLIDO = 'FALLIDO', _('Fallido')
+
+    convocatoria = models.ForeignKey(
+        'Convocatoria', null=True, on_delete=models.PROTECT, related_name='correos'
+    )
+    proyecto = models.ForeignKey(
+        'Proyecto', null=True, on_delete=models.PROTECT, related_name='correos'
+    )
+    plantilla = models.CharField(_('plantilla'), max_length=63)
+    remitente = models.CharField(_('remitente'), max_length=255)
+    destinatarios = models.JSONField(_('destinatarios'), default=list)
+    cc = models.JSONField(_('con copia a'), default=list)
+    asunto = models.CharField(_('asunto'), max_length=255)
+    cuerpo = models.TextField(_('cuerpo'))
+    cuerpo_html = models.TextField(_('cuerpo HTML'), blank=True, null=True)
+    estado = models.CharField(
+        _('estado'), max_length=15, choices=Estado, default=Estado.PENDIENTE, db_index=True
+    )
+    intentos = models.PositiveSmallIntegerField(_('intentos'), default=0)
+    proximo_intento = models.DateTimeField(_('próximo intento'), blank=True, null=True)
+    error = models.TextField(_('último error'), blank=True, null=True)
+    fecha_creacion = models.DateTimeField(_('fecha de creación'), auto_now_add=True)
+    fecha_envio = models.DateTimeField(_('fecha de envío'), blank=True, null=True)
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = _('correo')
+        verbose_name_plural = _('correos')
+
+    def __str__(self):
+        return f'{self.plantilla} → {", ".join(self.destinatarios)}'
 
 
 class Criterio(models.Model):
@@ -329,6 +373,79 @@ class ParticipanteProyecto(models.Model):
         return _('Participante')
 
 
+class CupoUsuario:
+    """Equipos y coordinaciones de un usuario en una convocatoria, y los límites de ésta.
+
+    Se obtienen con una sola consulta.  No computan los proyectos en preparación, anulados,
+    denegados o rechazados, ni para el límite de coordinaciones los del programa PIPOUZ.
+    Con `excluir_proyecto_id` no se cuenta la coordinación de ese proyecto (p. ej. al
+    presentarlo, para no contarlo dos veces).
+    """
+
+    ESTADOS_NO_COMPUTABLES = ('BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO')
+    TIPOS_COORDINADOR = ('coordinador', 'coordinador_2')
+
+    def __init__(self, usuario, convocatoria: Convocatoria, excluir_proyecto_id=None):
+        coordinaciones = models.Q(tipo_participacion_id__in=self.TIPOS_COORDINADOR) & ~models.Q(
+            proyecto__programa__nombre_corto='PIPOUZ'
+        )
+        if excluir_proyecto_id:
+            coordinaciones &= ~models.Q(proyecto_id=excluir_proyecto_id)
+
+        totales = (
+            ParticipanteProyecto.objects.filter(
+                usuario_id=usuario.id, proyecto__convocatoria_id=convocatoria.id
+            )
+            .exclude(proyecto__estado__in=self.ESTADOS_NO_COMPUTABLES)
+            .aggregate(
+                equipos=models.Count(
+                    'id',
+                    filter=models.Q(
+                        tipo_participacion_id__in=('participante',) + self.TIPOS_COORDINADOR
+                    ),
+                ),
+                coordinaciones=models.Count('id', filter=coordinaciones),
+            )
+        )
+        self.convocatoria = convocatoria
+        self.equipos = totales['equipos']
+        self.coordinaciones = totales['coordinaciones']
+
+    @classmethod
+    def get(cls, usuario, convocatoria: Convocatoria, excluir_proyecto_id=None, request=None):
+        """Devuelve el cupo del usuario.
+
+        Si se indica la petición, el cupo se guarda en ella y las siguientes comprobaciones
+        durante la petición lo reutilizan.
+        """
+        if request is None:
+            return cls(usuario, convocatoria, excluir_proyecto_id)
+        cupos = request.__dict__.setdefault('_cupos_usuario', {})
+        clave = (usuario.id, convocatoria.id, excluir_proyecto_id)
+        if clave not in cupos:
+            cupos[clave] = cls(usuario, convocatoria, excluir_proyecto_id)
+        return cupos[clave]
+
+    @property
+    def max_equipos(self) -> int:
+        return self.convocatoria.num_max_equipos
+
+    @property
+    def max_coordinaciones(self) -> int | None:
+        return self.convocatoria.num_max_coordinaciones
+
+    @property
+    def limite_equipos_alcanzado(self) -> bool:
+        return self.equipos >= self.max_equipos
+
+    @property
+    def limite_coordinaciones_alcanzado(self) -> bool:
+        """Devuelve si se ha alcanzado el límite de coordinaciones (salvo para PIPOUZ)."""
+        return self.max_coordinaciones is not None and (
+            self.coordinaciones >= self.max_coordinaciones
+        )
+
+
 class Programa(models.Model):
     """Modelo para representar un programa."""
 
@@ -713,12 +830,48 @@ class Proyecto(models.Model):
         related_name='proyectos_corregidos',
     )
     aceptacion_corrector = models.BooleanField(_('Admisión por el corrector'), null=True)
+    # Usuarios vinculados como coordinadores.  Los mantienen los manejadores de `indo.signals`
+    # al guardar o borrar un `ParticipanteProyecto`, para poder usar `select_related`.
+    coordinador = models.ForeignKey(
+        'accounts.CustomUser',
+        editable=False,
+        null=True,
+        on_delete=models.PROTECT,
+        related_name='proyectos_coordinados',
+    )
+    coordinador_2 = models.ForeignKey(
+        'accounts.CustomUser',
+        editable=False,
+        null=True,
+        on_delete=models.PROTECT,
+        related_name='proyectos_coordinados_2',
+    )
     es_publicable = models.BooleanField(_('¿Publicar la memoria?'), null=True)
     observaciones_corrector = models.TextField(
         _('Observaciones del corrector de la memoria'), null=True
     )
     aceptacion_economico = models.BooleanField(_('Cierre económico'), default=False)
     tiene_infografia = models.BooleanField(_('¿Tiene infografía?'), default=False)
+    # Número de vinculados de cada tipo.  Los mantienen los manejadores de `indo.signals` al
+    # guardar o borrar un `ParticipanteProyecto`; véase `manage.py recalcular_contadores`.
+    num_participantes = models.PositiveSmallIntegerField(
+        _('Número de participantes'), db_index=True, default=0, editable=False
+    )
+    num_invitados = models.PositiveSmallIntegerField(
+        _('Número de invitados'), default=0, editable=False
+    )
+    num_colaboradores = models.PositiveSmallIntegerField(
+        _('Número de colaboradores'), default=0, editable=False
+    )
+
+    # Campo contador de cada tipo de participación.
+    CONTADORES = {
+        'participante': 'num_participantes',
+        'invitado': 'num_invitados',
+        'colaborador': 'num_colaboradores',
+    }
+    # Campos que `save` no escribe salvo que se indiquen en `update_fields`.
+    CAMPOS_MANTENIDOS = (*CONTADORES.values(), 'coordinador', 'coordinador_2')
 
     class Meta:
         """Este código crea una lista de tuplas con los distintos permisos y su descripción."""
@@ -745,6 +898,30 @@ class Proyecto(models.Model):
     def __str__(self):
         return self.codigo
 
+    def save(self, *args, **kwargs):
+        """Guarda el proyecto, salvo los campos de `CAMPOS_MANTENIDOS` si ya existía.
+
+        Esos campos sólo los escriben `actualizar_contadores` y `actualizar_coordinadores`, así
+        que guardar un proyecto cargado antes de que cambiaran sus vinculaciones no debe
+        sobrescribirlos con los valores anteriores.  Se pueden guardar indicándolos
+        expresamente en `update_fields`.
+        """
+        if (
+            not self._state.adding
+            and not args
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.name
+                for campo in self._meta.concrete_fields
+                if not campo.primary_key
+                and campo.attname not in diferidos
+                and campo.name not in self.CAMPOS_MANTENIDOS
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('proyecto_detail', args=[str(self.id)])
 
@@ -764,7 +941,11 @@ class Proyecto(models.Model):
 
     @classmethod
     def get_todos(cls, anyo):
-        """Devuelve datos de todos los proyectos introducidos en el año indicado."""
+        """Devuelve datos de todos los proyectos introducidos en el año indicado.
+
+        Es un generador: la primera fila contiene las cabeceras, y el resto se leen
+        directamente del cursor de la base de datos.
+        """
 
         cabeceras = [
             _('Programa'),
@@ -789,6 +970,7 @@ class Proyecto(models.Model):
             _('Ayuda definitiva'),
             _('Aceptación coordinador'),
         ]
+        yield cabeceras
 
         with connection.cursor() as cursor:
             cursor.execute(
@@ -853,15 +1035,14 @@ class Proyecto(models.Model):
                 ORDER BY p.programa_id, p.linea_id, p.titulo;
                 """
             )
-            rows = cursor.fetchall()
-
-        datos_proyectos = list(rows)
-        datos_proyectos.insert(0, cabeceras)
-        return datos_proyectos
+            yield from cursor
 
     @classmethod
     def get_up_gastos(cls, anyo):
-        """Devuelve datos de las UP y gastos posibles de todos los proyectos del año indicado."""
+        """Devuelve datos de las UP y gastos posibles de todos los proyectos del año indicado.
+
+        Es un generador: la primera fila contiene las cabeceras.
+        """
         cabeceras = [
             _('Programa'),
             _('ID'),
@@ -877,21 +1058,25 @@ class Proyecto(models.Model):
             .filter(aceptacion_coordinador=True)
             .order_by('programa__nombre_corto', 'titulo')
         )
-        datos_proyectos = [
-            [
-                p.programa,
-                p.id,
-                p.titulo,
-                p.coordinador.full_name,
-                p.get_unidad_planificacion(),
-                p.ayuda_definitiva,
-                p.tipo_gasto,
-                p.id_uxxi,
-            ]
-            for p in proyectos
-        ]
-        datos_proyectos.insert(0, cabeceras)
-        return datos_proyectos
+        # Para no cargar todos los proyectos en memoria, los leemos por bloques,
+        # y precargamos los datos relacionados de cada bloque con un número fijo de consultas.
+        from .loaders import precargar_proyectos
+
+        yield cabeceras
+        tamanyo_bloque = 1000
+        iterador = proyectos.iterator(chunk_size=tamanyo_bloque)
+        while bloque := precargar_proyectos(itertools.islice(iterador, tamanyo_bloque)):
+            for p in bloque:
+                yield [
+                    p.programa,
+                    p.id,
+                    p.titulo,
+                    p.coordinador.full_name,
+                    p.get_unidad_planificacion(),
+                    p.ayuda_definitiva,
+                    p.tipo_gasto,
+                    p.id_uxxi,
+                ]
 
     def get_unidad_planificacion(self) -> str | None:
         """Devuelve el ID y nombre de la Unidad de Planificación del proyecto.
@@ -904,27 +1089,22 @@ class Proyecto(models.Model):
         if self.programa.nombre_corto in ('PIEC', 'PIPOUZ', 'PIET', 'PICT'):
             return f'{self.centro.unidad_planificacion} ({self.centro.nombre})'
         elif self.programa.nombre_corto in ('PIIDUZ', 'PRAUZ', 'MOOC', 'PISOC'):
-            # Si el coordinador está en más de un departamento, tomamos el primero.
+            # Si el coordinador está en más de un departamento, tomamos el de menor código
+            # académico, como cuando se guardaban sus códigos en el usuario.  Se ordenan aquí,
+            # y no con `order_by`, para aprovechar los departamentos precargados (`loaders`).
+            coordinador = self.coordinador
+            departamento = min(
+                coordinador.departamentos.all() if coordinador else (),
+                key=lambda d: (d.academico_id_nk is None, d.academico_id_nk, d.id),
+                default=None,
+            )
             return (
-                f'{self.coordinador.departamentos[0].unidad_planificacion}'
-                + f' ({self.coordinador.departamentos[0].nombre})'
-                if self.coordinador and self.coordinador.departamentos
+                f'{departamento.unidad_planificacion} ({departamento.nombre})'
+                if departamento
                 else None
             )
         return None
 
-    @property
-    def coordinador(self):
-        """Devuelve el usuario coordinador del proyecto (o `None` si no lo encuentra)."""
-        pp_coordinador = self.get_pp_coordinador_or_none('coordinador')
-        return pp_coordinador.usuario if pp_coordinador else None
-
-    @property
-    def coordinador_2(self):
-        """Devuelve el segundo coordinador del proyecto si lo hay (los PIET podían tenerlo)."""
-        pp_coordinador_2 = self.get_pp_coordinador_or_none('coordinador_2')
-        return pp_coordinador_2.usuario if pp_coordinador_2 else None
-
     def get_coordinadores(self):
         """Devuelve una lista con los usuarios coordinadores del proyecto."""
         coordinadores = [self.coordinador, self.coordinador_2]
@@ -937,6 +1117,47 @@ class Proyecto(models.Model):
             for valoracion in self.valoraciones.filter(evaluador__id=user_id).all()
         }
 
+    @classmethod
+    def get_memorias_presentadas(cls, anyo):
+        """Devuelve los proyectos del año indicado cuya memoria ya ha sido presentada.
+
+        Cada proyecto se anota con la fecha de la última modificación de su memoria
+        (`ultima_modificacion_memoria`).
+        """
+        return (
+            cls.objects.filter(
+                convocatoria_id=anyo,
+                estado__in=['MEM_PRESENTADA', 'MEM_NO_ADMITIDA', 'MEM_ADMITIDA'],
+            )
+            .select_related('programa')
+            .annotate(
+                ultima_modificacion_memoria=models.Max('respuestas_memoria__fecha_modificacion')
+            )
+            .order_by('id')
+        )
+
+    def get_ruta_pdf_memoria(self) -> Path:
+        """Devuelve la ruta del PDF de la memoria (`BASE_DIR/media/memoria/2021/PIIDUZ_42.pdf`)."""
+        return (
+            Path(settings.MEDIA_ROOT)
+            / 'memoria'
+            / str(self.convocatoria_id)
+            / f'{self.programa.nombre_corto}_{self.id}.pdf'
+        )
+
+    def tiene_pdf_memoria_actualizado(self) -> bool:
+        """Devuelve si el PDF de la memoria existe y es posterior a su última modificación.
+
+        Requiere la anotación `ultima_modificacion_memoria` (véase `get_memorias_presentadas`).
+        Si no se conoce la fecha de la última modificación, se considera desactualizado.
+        La migración 0041 fechó las respuestas anteriores con la del PDF, de ahí el `>=`.
+        """
+        ruta = self.get_ruta_pdf_memoria()
+        if not self.ultima_modificacion_memoria or not ruta.exists():
+            return False
+        fecha_pdf = datetime.datetime.fromtimestamp(ruta.stat().st_mtime, tz=datetime.timezone.utc)
+        return fecha_pdf >= self.ultima_modificacion_memoria
+
     def get_dict_respuestas_memoria(self):
         """Devuelve un diccionario subapartado_id => respuesta de la memoria del proyecto."""
         return {respuesta.subapartado_id: respuesta for respuesta in self.respuestas_memoria.all()}
@@ -951,6 +1172,68 @@ class Proyecto(models.Model):
         )
         return [pp.usuario for pp in participantes_proyecto]
 
+    @classmethod
+    def _corregir_campos(cls, valores: dict, proyecto_ids=None) -> int:
+        """Guarda en cada campo el valor de su expresión, en los proyectos en que difieren.
+
+        Los valores se calculan en la propia sentencia `UPDATE`, de modo que no se escriben
+        datos leídos antes.  Devuelve el número de proyectos corregidos.
+        """
+        proyectos = cls.objects.all()
+        if proyecto_ids is not None:
+            proyectos = proyectos.filter(id__in=proyecto_ids)
+        actuales = {f'{campo}_actual': valor for campo, valor in valores.items()}
+        corregidos = [
+            fila['id']
+            for fila in proyectos.annotate(**actuales).values('id', *valores, *actuales)
+            if any(fila[campo] != fila[f'{campo}_actual'] for campo in valores)
+        ]
+        for inicio in range(0, len(corregidos), 500):
+            cls.objects.filter(id__in=corregidos[inicio : inicio + 500]).update(**valores)
+        return len(corregidos)
+
+    @classmethod
+    def actualizar_contadores(cls, proyecto_ids=None) -> int:
+        """Recalcula los contadores de vinculados de los proyectos indicados (o de todos).
+
+        Devuelve el número de proyectos cuyos contadores se han corregido.
+        """
+        valores = {
+            campo: Coalesce(
+                models.Subquery(
+                    ParticipanteProyecto.objects.filter(
+                        proyecto_id=models.OuterRef('id'), tipo_participacion_id=tipo
+                    )
+                    .order_by()
+                    .values('proyecto_id')
+                    .annotate(num=models.Count('id'))
+                    .values('num')
+                ),
+                0,
+            )
+            for tipo, campo in cls.CONTADORES.items()
+        }
+        return cls._corregir_campos(valores, proyecto_ids)
+
+    @classmethod
+    def actualizar_coordinadores(cls, proyecto_ids=None) -> int:
+        """Recalcula los coordinadores de los proyectos indicados (o de todos).
+
+        Devuelve el número de proyectos cuyos coordinadores se han corregido.
+        """
+        valores = {
+            # Si hubiera más de una vinculación del mismo tipo, se toma la más antigua.
+            tipo: models.Subquery(
+                ParticipanteProyecto.objects.filter(
+                    proyecto_id=models.OuterRef('id'), tipo_participacion_id=tipo
+                )
+                .order_by('id')
+                .values('usuario_id')[:1]
+            )
+            for tipo in ('coordinador', 'coordinador_2')
+        }
+        return cls._corregir_campos(valores, proyecto_ids)
+
     def get_usuarios_vinculados(self):
         """
         Devuelve una lista de todos los usuarios vinculados al proyecto
@@ -961,12 +1244,11 @@ class Proyecto(models.Model):
     @property
     def numero_participantes(self):
         """Devuelve la cantidad de partipantes que han aceptado la invitación."""
-        return self.participantes.filter(tipo_participacion='participante').count()
+        return self.num_participantes
 
     def tiene_invitados(self):
         """Devuelve si el proyecto tiene al menos un participante de tipo `invitado`."""
-        num_invitados = self.participantes.filter(tipo_participacion='invitado').count()
-        return num_invitados >= 1
+        return self.num_invitados >= 1
 
     def tiene_participantes(self):
         """Devuelve si el proyecto tiene algún participante que haya aceptado la invitación."""
@@ -1044,6 +1326,9 @@ class MemoriaRespuesta(models.Model):
         null=True,
         validators=[FileExtensionValidator(allowed_extensions=['pdf'])],
     )
+    fecha_modificacion = models.DateTimeField(
+        _('fecha de modificación'), auto_now=True, null=True
+    )
 
     class Meta:
         ordering = ('-proyecto__id', 'subapartado')
@@ -1165,7 +1450,11 @@ class Valoracion(models.Model):
 
     @classmethod
     def get_todas(cls, anyo):
-        """Devuelve las valoraciones de todos los proyectos aceptados en el año indicado."""
+        """Devuelve las valoraciones de todos los proyectos aceptados en el año indicado.
+
+        Es un generador: la primera fila contiene las cabeceras y cada una de las siguientes,
+        las valoraciones de un evaluador sobre un proyecto, con una columna por criterio.
+        """
         cabeceras = [
             _('Programa'),
             _('Línea'),
@@ -1175,58 +1464,49 @@ class Valoracion(models.Model):
             _('Ayuda solicitada'),
             _('Financiación'),
         ]
-        criterios = Criterio.objects.filter(convocatoria_id=anyo).order_by('parte', 'peso').all()
+        criterios = list(Criterio.objects.filter(convocatoria_id=anyo).order_by('parte', 'peso'))
         cabeceras.extend([criterio.descripcion for criterio in criterios])
+        yield cabeceras
 
         with connection.cursor() as cursor:
-            # Columnas procedentes de la solicitud de proyecto
+            # Una sola consulta: cada asignación evaluador-proyecto aparece tantas veces
+            # como valoraciones haya emitido (o una vez, con criterio NULL, si no tiene ninguna).
             cursor.execute(
-                f"""
-                SELECT prog.nombre_corto, l.nombre,
-                  p.id, p.titulo, c.nombre, p.ayuda, p.financiacion_txt
+                """
+                SELECT ep.proyecto_id, ep.evaluador_id,
+                  prog.nombre_corto, l.nombre, p.id, p.titulo, c.nombre, p.ayuda,
+                  p.financiacion_txt,
+                  v.criterio_id, o.puntuacion, v.texto
                 FROM indo_evaluadorproyecto ep
                 JOIN indo_proyecto p ON ep.proyecto_id = p.id
                 JOIN indo_programa prog ON p.programa_id = prog.id
                 LEFT JOIN indo_linea l ON p.linea_id = l.id
                 LEFT JOIN indo_centro c ON p.centro_id = c.id
-                WHERE prog.convocatoria_id = {anyo}
+                LEFT JOIN indo_valoracion v
+                  ON v.proyecto_id = ep.proyecto_id AND v.evaluador_id = ep.evaluador_id
+                LEFT JOIN indo_opcion o ON v.opcion_id = o.id
+                WHERE prog.convocatoria_id = %s
                 ORDER BY ep.proyecto_id, ep.evaluador_id;
-                """
+                """,
+                [anyo],
             )
-            rows = cursor.fetchall()
-            # Podríamos añadir las columnas de la evaluación a este array bidimensional
-            #   usando NumPy o bucles.
-            # En su lugar, transponemos la matriz, y las añadiremos como filas.
-            # A continuación, volveremos a transponer la matriz.
-            valoraciones = list(zip(*rows))
-
-            # Columnas procedentes de la evaluación del proyecto
-            for criterio in criterios:
-                cursor.execute(
-                    f"""
-                    SELECT CASE
-                      WHEN c.tipo = 'opcion' THEN o.puntuacion
-                      WHEN c.tipo = 'texto' THEN v.texto
-                      ELSE NULL
-                    END AS valoracion
-                    FROM indo_proyecto proy
-                    JOIN indo_evaluadorproyecto ep ON proy.id = ep.proyecto_id
-                    JOIN indo_criterio c ON c.convocatoria_id = proy.convocatoria_id
-                    LEFT JOIN indo_valoracion v
-                      ON proy.id = v.proyecto_id
-                         AND ep.evaluador_id = v.evaluador_id
-                         AND c.id = v.criterio_id
-                    LEFT JOIN indo_opcion o ON v.opcion_id = o.id
-                    WHERE proy.convocatoria_id = {anyo}
-                          AND c.id = {criterio.id}
-                    ORDER BY ep.proyecto_id, ep.evaluador_id, c.parte, c.peso;
-                    """
-                )
-                rows = cursor.fetchall()
-                fila_del_criterio = [row[0] for row in rows]
-                valoraciones.append(fila_del_criterio)
-
-        valoraciones = list(zip(*valoraciones))
-
-        valoraciones.insert(0, cabeceras)
-        return valoraciones
+            # Pivotamos en una sola pasada: agrupamos las filas consecutivas de cada
+            # asignación y colocamos cada valoración en la columna de su criterio.
+            for _clave, filas in itertools.groupby(cursor, key=lambda fila: fila[:2]):
+                filas = list(filas)
+                valores = {}
+                for fila in filas:
+                    criterio_id, puntuacion, texto = fila[9:]
+                    if criterio_id is not None:
+                        valores[criterio_id] = (puntuacion, texto)
+
+                columnas = list(filas[0][2:9])
+                for criterio in criterios:
+                    puntuacion, texto = valores.get(criterio.id, (None, None))
+                    if criterio.tipo == Criterio.Tipo.OPCION:
+                        columnas.append(puntuacion)
+                    elif criterio.tipo == Criterio.Tipo.TEXTO:
+                        columnas.append(texto)
+                    else:
+                        columnas.append(None)
+                yield columnas
@@ -0,0 +1,140 @@
+"""Manejadores de señales del módulo.
+
+Invalidan los datos guardados en la caché (véase `indo.cache`) y mantienen los contadores de
+vinculados de los proyectos.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+
+from .cache import (
+    invalidar_convocatoria,
+    invalidar_mis_proyectos,
+    invalidar_mis_proyectos_convocatoria,
+)
+from .loaders import TIPOS_COORDINADOR
+from .models import Convocatoria, ParticipanteProyecto, Plan, Proyecto
+
+# Campos que se muestran en los listados de «Mis proyectos» o influyen en ellos.
+CAMPOS_PROYECTO = (
+    'estado',
+    'titulo',
+    'programa_id',
+    'linea_id',
+    'visto_bueno_centro',
+    'visto_bueno_estudio',
+)
+CAMPOS_CONVOCATORIA = (
+    'notificada_resolucion_provisional',
+    'num_max_equipos',
+    'num_max_coordinaciones',
+)
+
+
+def _valores(instance, campos) -> tuple:
+    # Se lee `__dict__` para no cargar los campos diferidos.
+    return tuple(instance.__dict__.get(campo) for campo in campos)
+
+
+def get_usuarios_afectados(proyecto: Proyecto) -> set[int]:
+    """Devuelve los ID de los usuarios en cuyos listados aparece el proyecto.
+
+    Son los vinculados al proyecto, el decano/director de su centro y los coordinadores de los
+    planes de su estudio.
+    """
+    usuario_ids = set(
+        ParticipanteProyecto.objects.filter(proyecto_id=proyecto.id).values_list(
+            'usuario_id', flat=True
+        )
+    )
+    nips = set()
+    if proyecto.centro_id:
+        nips.add(proyecto.centro.nip_decano)
+    if proyecto.estudio_id:
+        nips.update(
+            Plan.objects.filter(estudio_id=proyecto.estudio_id).values_list(
+                'nip_coordinador', flat=True
+            )
+        )
+    nips = {str(nip) for nip in nips if nip}
+    if nips:
+        usuario_ids.update(
+            CustomUser.objects.filter(username__in=nips).values_list('id', flat=True)
+        )
+    return usuario_ids
+
+
+def _invalidar_proyecto(proyecto: Proyecto, *usuario_ids: int) -> None:
+    usuario_ids = get_usuarios_afectados(proyecto).union(usuario_ids)
+    anyo = proyecto.convocatoria_id
+    transaction.on_commit(lambda: invalidar_mis_proyectos(usuario_ids, anyo))
+
+
+@receiver(post_init, sender=Proyecto)
+def guardar_valores_proyecto(sender, instance, **kwargs):
+    instance._valores_mis_proyectos = _valores(instance, CAMPOS_PROYECTO)
+
+
+@receiver(post_save, sender=Proyecto)
+def invalidar_proyecto_modificado(sender, instance, created, **kwargs):
+    valores = _valores(instance, CAMPOS_PROYECTO)
+    # Un proyecto nuevo aún no tiene vinculados.
+    if not created and valores != instance._valores_mis_proyectos:
+        _invalidar_proyecto(instance)
+    instance._valores_mis_proyectos = valores
+
+
+@receiver(post_delete, sender=Proyecto)
+def invalidar_proyecto_borrado(sender, instance, **kwargs):
+    _invalidar_proyecto(instance)
+
+
+@receiver(post_save, sender=ParticipanteProyecto)
+@receiver(post_delete, sender=ParticipanteProyecto)
+def invalidar_vinculacion(sender, instance, **kwargs):
+    # El resto de vinculados ven el nombre del coordinador, que puede haber cambiado.
+    _invalidar_proyecto(instance.proyecto, instance.usuario_id)
+
+
+@receiver(post_init, sender=ParticipanteProyecto)
+def guardar_tipo_participacion(sender, instance, **kwargs):
+    instance._tipo_participacion_inicial = instance.__dict__.get('tipo_participacion_id')
+
+
+@receiver(post_save, sender=ParticipanteProyecto)
+@receiver(post_delete, sender=ParticipanteProyecto)
+def actualizar_vinculados_proyecto(sender, instance, **kwargs):
+    Proyecto.actualizar_contadores([instance.proyecto_id])
+    # Sólo cambian los coordinadores si la vinculación era o es de coordinador.
+    tipos = {instance._tipo_participacion_inicial, instance.tipo_participacion_id}
+    if tipos.intersection(TIPOS_COORDINADOR):
+        Proyecto.actualizar_coordinadores([instance.proyecto_id])
+    if ParticipanteProyecto.proyecto.is_cached(instance):
+        instance.proyecto.refresh_from_db(
+            fields=[*Proyecto.CONTADORES.values(), 'coordinador', 'coordinador_2']
+        )
+    instance._tipo_participacion_inicial = instance.tipo_participacion_id
+
+
+@receiver(post_init, sender=Convocatoria)
+def guardar_valores_convocatoria(sender, instance, **kwargs):
+    instance._valores_mis_proyectos = _valores(instance, CAMPOS_CONVOCATORIA)
+
+
+@receiver(post_save, sender=Convocatoria)
+def invalidar_convocatoria_modificada(sender, instance, created, **kwargs):
+    anyo = instance.id
+    transaction.on_commit(lambda: invalidar_convocatoria(anyo))
+    valores = _valores(instance, CAMPOS_CONVOCATORIA)
+    if not created and valores != instance._valores_mis_proyectos:
+        transaction.on_commit(lambda: invalidar_mis_proyectos_convocatoria(anyo))
+    instance._valores_mis_proyectos = valores
+
+
+@receiver(post_delete, sender=Convocatoria)
+def invalidar_convocatoria_borrada(sender, instance, **kwargs):
+    anyo = instance.id
+    transaction.on_commit(lambda: invalidar_convocatoria(anyo))
@@ -3,13 +3,46 @@ import django_tables2 as tables
 
 # Django
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
+from django.db.models import Exists, OuterRef
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 # Local Django
-from .models import EvaluadorProyecto, ParticipanteProyecto, Proyecto
+from .loaders import precargar_proyectos
+from .models import EvaluadorProyecto, ParticipanteProyecto, Proyecto, Valoracion
+
+
+class RelacionesTablaMixin:
+    """Declara las relaciones y anotaciones que usan las columnas de la tabla.
+
+    Las vistas con `indo.utils.PrecargaTablaMixin` las aplican al queryset de la tabla, para no
+    hacer una consulta por cada fila al mostrarla.
+    """
+
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+    anotaciones: dict = {}
+
+    @classmethod
+    def preparar_queryset(cls, queryset):
+        """Añade al queryset las relaciones y anotaciones declaradas por la tabla."""
+        if cls.select_related:
+            queryset = queryset.select_related(*cls.select_related)
+        if cls.prefetch_related:
+            queryset = queryset.prefetch_related(*cls.prefetch_related)
+        if cls.anotaciones:
+            queryset = queryset.annotate(**cls.anotaciones)
+        return queryset
+
+
+class PrecargaProyectosMixin:
+    """Precarga coordinadores, centros y departamentos de los proyectos de la página mostrada."""
+
+    def paginate(self, *args, **kwargs):
+        super().paginate(*args, **kwargs)
+        # Al evaluar el queryset de la página queda en su caché, y se reutiliza al mostrarla.
+        precargar_proyectos(self.page.object_list.data)
 
 
 class CorrectoresTable(tables.Table):
@@ -45,9 +78,11 @@ class CorrectoresTable(tables.Table):
         per_page = 20
 
 
-class ProyectoCorrectorTable(tables.Table):
+class ProyectoCorrectorTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos aceptados y el corrector de memorias asignado a ellos."""
 
+    select_related = ('programa', 'linea', 'corrector')
+
     def render_titulo(self, record):
         enlace = reverse('proyecto_detail', args=[record.id])
         return mark_safe(f'<a href="{enlace}">{record.titulo}</a>')
@@ -72,12 +107,17 @@ class ProyectoCorrectorTable(tables.Table):
         per_page = 20
 
 
-class EvaluadoresTable(tables.Table):
+class EvaluadoresTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos solicitados y el evaluador asignado a ellos."""
 
+    select_related = ('programa', 'linea')
+    prefetch_related = ('evaluadores',)
+
     visto_bueno_centro = tables.Column(empty_values=(), verbose_name='VBC')
     visto_bueno_estudio = tables.Column(empty_values=(), verbose_name='VBE')
-    numero_participantes = tables.Column(empty_values=(), verbose_name='P')
+    numero_participantes = tables.Column(
+        accessor='num_participantes', empty_values=(), verbose_name='P'
+    )
     editar = tables.Column(empty_values=(), orderable=False, verbose_name='')
 
     def render_titulo(self, record):
@@ -108,14 +148,14 @@ class EvaluadoresTable(tables.Table):
             else f"""<span class="text-secondary" title="{_('Pendiente')}">⁇</span>"""
         )
 
-    def render_numero_participantes(self, record):
-        if record.numero_participantes == 0:
+    def render_numero_participantes(self, value):
+        if value == 0:
             return mark_safe(
                 f"""<span style="font-weight: bold;" class="text-danger">
-                  {record.numero_participantes}
+                  {value}
                 </span>"""
             )
-        return record.numero_participantes
+        return value
 
     def render_evaluadores(self, record):
         return ', '.join([evaluador.full_name for evaluador in record.evaluadores.all()])
@@ -129,16 +169,6 @@ class EvaluadoresTable(tables.Table):
                 </a>"""
         )
 
-    # Ver <https://django-tables2.readthedocs.io/en/latest/pages/ordering.html>
-    def order_numero_participantes(self, queryset, is_descending):
-        # XXX Incompatible con la opción ONLY_FULL_GROUP_BY de MariaDB/MySQL
-        queryset = queryset.annotate(
-            num_participantes=Count(
-                'participantes', filter=Q(participantes__tipo_participacion='participante')
-            )
-        ).order_by(('-' if is_descending else '') + 'num_participantes')
-        return (queryset, True)
-
     class Meta:
         attrs = {'class': 'table table-striped table-hover cabecera-azul'}
         model = Proyecto
@@ -158,9 +188,15 @@ class EvaluadoresTable(tables.Table):
         per_page = 20
 
 
-class EvaluacionProyectosTable(tables.Table):
+class EvaluacionProyectosTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos presentados, enlaces a evaluaciones, y resolución de la Comisión."""
 
+    select_related = ('programa', 'linea')
+    prefetch_related = ('evaluadores_proyectos',)
+    anotaciones = {
+        'tiene_valoraciones': Exists(Valoracion.objects.filter(proyecto=OuterRef('pk')))
+    }
+
     def render_titulo(self, record):
         enlace = reverse('proyecto_detail', args=[record.id])
         return mark_safe(f'<a href="{enlace}">{record.titulo}</a>')
@@ -200,7 +236,7 @@ class EvaluacionProyectosTable(tables.Table):
                 aria-label="{_('Editar la resolución')}">
                   <span class="fas fa-pencil-alt"></span>
                 </a>"""
-            if record.valoraciones.first()
+            if record.tiene_valoraciones
             else '—'
         )
 
@@ -213,9 +249,11 @@ class EvaluacionProyectosTable(tables.Table):
         per_page = 20
 
 
-class MemoriasAsignadasTable(tables.Table):
+class MemoriasAsignadasTable(RelacionesTablaMixin, tables.Table):
     """Muestra las memorias asignadas a un usuario corrector."""
 
+    select_related = ('programa', 'linea')
+
     memoria = tables.Column(empty_values=(), orderable=False, verbose_name=_('Memoria'))
     aceptacion_corrector = tables.BooleanColumn(null=True, verbose_name=_('Adm'))
     es_publicable = tables.BooleanColumn(null=True, verbose_name=_('Pub'))
@@ -297,9 +335,11 @@ class MemoriasAsignadasTable(tables.Table):
         per_page = 20
 
 
-class MemoriaProyectosTable(tables.Table):
+class MemoriaProyectosTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos aceptados y enlaces a su memoria y dictamen del corrector."""
 
+    select_related = ('programa', 'linea')
+
     def render_titulo(self, record):
         enlace = reverse('proyecto_detail', args=[record.id])
         return mark_safe(f'<a href="{enlace}">{record.titulo}</a>')
@@ -374,9 +414,12 @@ class MemoriaProyectosTable(tables.Table):
         # per_page = 20
 
 
-class ProyectosAceptadosTable(tables.Table):
+class ProyectosAceptadosTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos aceptados en una convocatoria (opcionalmente por centro)."""
 
+    select_related = ('proyecto__programa', 'proyecto__linea', 'proyecto__centro', 'usuario')
+    prefetch_related = ('usuario__departamentos',)
+
     proyecto__linea = tables.Column(visible=False)
     proyecto__titulo = tables.Column(visible=False)
     proyecto__centro = tables.Column(visible=False)
@@ -394,6 +437,13 @@ class ProyectosAceptadosTable(tables.Table):
         verbose_name=_('Coordinador'),
     )
 
+    departamentos = tables.Column(
+        accessor='usuario__nombres_departamentos',
+        orderable=False,
+        verbose_name=_('Departamentos del coordinador'),
+        visible=False,
+    )
+
     proyecto__descripcion_txt = tables.Column(verbose_name=_('Descripción'), visible=False)
 
     class Meta:
@@ -406,6 +456,7 @@ class ProyectosAceptadosTable(tables.Table):
             'proyecto__titulo',
             'vinculo',
             'usuario__full_name',
+            'departamentos',
             'proyecto__centro',
             'proyecto__descripcion_txt',
         )
@@ -413,9 +464,11 @@ class ProyectosAceptadosTable(tables.Table):
         template_name = 'django_tables2/bootstrap5.html'
 
 
-class ProyectosCierreEconomicoTable(tables.Table):
+class ProyectosCierreEconomicoTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos aceptados y su cierre económico."""
 
+    select_related = ('programa', 'linea')
+
     aceptacion_corrector = tables.BooleanColumn(null=True, verbose_name=_('Mem adm'))
     aceptacion_economico = tables.BooleanColumn(null=True, verbose_name=_('Cierre económico'))
 
@@ -470,9 +523,11 @@ class ProyectosCierreEconomicoTable(tables.Table):
         # per_page = 20
 
 
-class ProyectosEvaluadosTable(tables.Table):
+class ProyectosEvaluadosTable(RelacionesTablaMixin, tables.Table):
     """Muestra los proyectos asignados a un usuario evaluador."""
 
+    select_related = ('proyecto__programa', 'proyecto__linea')
+
     titulo_proyecto = tables.Column(empty_values=(), orderable=False, verbose_name=_('Título'))
 
     def render_titulo_proyecto(self, record):
@@ -508,9 +563,11 @@ class ProyectosEvaluadosTable(tables.Table):
         per_page = 20
 
 
-class ProyectosTable(tables.Table):
+class ProyectosTable(RelacionesTablaMixin, tables.Table):
     """Muestra las solicitudes de proyecto introducidas."""
 
+    select_related = ('programa', 'linea', 'coordinador', 'coordinador_2')
+
     def render_titulo(self, record):
         enlace = reverse('proyecto_detail', args=[record.id])
         return mark_safe(f'<a href="{enlace}">{record.titulo}</a>')
@@ -533,7 +590,7 @@ class ProyectosTable(tables.Table):
         per_page = 20
 
 
-class ProyectoUPTable(tables.Table):
+class ProyectoUPTable(PrecargaProyectosMixin, tables.Table):
     """Muestra los proyectos aceptados, su Unidad de Planificación y gastos autorizados."""
 
     def render_titulo(self, record):
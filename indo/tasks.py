@@ -1,14 +1,34 @@
+import logging
+import os
+import tempfile
+import time
 from pathlib import Path
 
-from huey.contrib.djhuey import task
+from huey import crontab
+from huey.contrib.djhuey import db_periodic_task
+from huey.exceptions import TaskLockedException
+from django.conf import settings
 from django.template.loader import render_to_string
 
 from weasyprint import HTML
 
+from manhattan_project.colas import get_cola, tarea
 
-@task()
+logger = logging.getLogger(__name__)
+
+# Cerrojos de las tareas que no deben ejecutarse a la vez.  Se crean al importar el módulo para
+# que el consumidor de su cola los libere al arrancar (`flush_locks`), por si quedaron tomados.
+_cerrojo_correos = get_cola('correo').lock_task('enviar-correos')
+_cerrojo_evaluadores = get_cola('identidades').lock_task('sincronizar-evaluadores')
+
+
+@tarea('pdf')
 def generar_pdf(proyecto_id, base_url, pdf_destino):
-    """Recibe un proyecto_id y base_url, renderiza el HTML y lo guarda en formato PDF."""
+    """Recibe un proyecto_id y base_url, renderiza el HTML y lo guarda en formato PDF.
+
+    Devuelve la ruta del PDF, para que la tarea figure como terminada (véase
+    `indo.utils.get_progreso_memorias_pdf`).
+    """
     from indo.models import Proyecto
     proyecto = Proyecto.objects.get(pk=proyecto_id)
     contexto = {
@@ -19,8 +39,145 @@ def generar_pdf(proyecto_id, base_url, pdf_destino):
     }
     html_string = render_to_string('memoria/detail.html', context=contexto)
 
-    # Si no existe el directorio del PDF destino, crearlo recursivamente.
-    Path(pdf_destino).parent.mkdir(parents=True, exist_ok=True)
+    # El PDF anterior se sigue sirviendo hasta que el nuevo esté completo.
+    _escribir_pdf(HTML(string=html_string, base_url=base_url), Path(pdf_destino))
+    return pdf_destino
+
+
+def _escribir_pdf(documento_html, destino: Path) -> None:
+    """Escribe el PDF en un fichero temporal del mismo directorio y después lo renombra,
+    para que nunca se sirva un documento a medio escribir."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=destino.parent, suffix='.tmp', delete=False) as temporal:
+        try:
+            documento_html.write_pdf(temporal)
+        except BaseException:
+            os.unlink(temporal.name)
+            raise
+    os.replace(temporal.name, destino)
+
+
+# Alguien espera la descarga: se genera antes que las memorias encoladas.
+@tarea('pdf', priority=10)
+def generar_documento_pdf(html_string, base_url, pdf_destino):
+    """Convierte a PDF un documento HTML ya renderizado, y lo guarda en `pdf_destino`.
+
+    Devuelve la ruta del PDF, de modo que la tarea figura como terminada aunque el documento se
+    borre después por antiguo (véase `borrar_documentos_pdf_caducados`).
+    """
+    destino = Path(pdf_destino)
+    if not destino.exists():
+        _escribir_pdf(HTML(string=html_string, base_url=base_url), destino)
+    return str(destino)
+
+
+@db_periodic_task(crontab(hour='3', minute='30'))
+def borrar_documentos_pdf_caducados():
+    """Borra los certificados y «hace constar» generados hace más de `DOCUMENTOS_PDF_VIGENCIA`.
+
+    Borra también los ficheros temporales que hayan quedado de generaciones interrumpidas.
+    """
+    limite = time.time() - settings.DOCUMENTOS_PDF_VIGENCIA
+    raiz = Path(settings.DOCUMENTOS_PDF_ROOT)
+    num_borrados = 0
+    for fichero in raiz.glob('*/*'):
+        try:
+            if fichero.suffix in ('.pdf', '.tmp') and fichero.stat().st_mtime < limite:
+                fichero.unlink()
+                num_borrados += 1
+        except FileNotFoundError:  # Borrado entretanto
+            continue
+    for directorio in raiz.glob('*/'):
+        try:
+            directorio.rmdir()
+        except OSError:  # No está vacío
+            continue
+    logger.info('Borrados %d documentos PDF caducados.', num_borrados)
+    return num_borrados
+
+
+@tarea('correo')
+def enviar_correos():
+    """Envía los correos encolados con `indo.mail.encolar_correo`.
+
+    Sólo se ejecuta un envío a la vez: si ya hay otro en curso, éste se encargará también de los
+    mensajes recién encolados.
+    """
+    from indo.mail import enviar_correos_pendientes
+
+    try:
+        with _cerrojo_correos:
+            return enviar_correos_pendientes()
+    except TaskLockedException:
+        logger.info('Ya hay un envío de correos en curso.')
+        return None
+
+
+@db_periodic_task(crontab(minute='*'))
+def reintentar_correos():
+    """Reintenta cada minuto el envío de los correos pendientes cuyo plazo de espera ha vencido.
+
+    El envío se encola en la cola `correo`; la cola `general` sólo lo programa.
+    """
+    enviar_correos()
+
+
+@tarea('identidades')
+def actualizar_coordinadores(anyo):
+    """Actualiza los coordinadores de una convocatoria con los datos de Gestión de Identidades."""
+    from accounts.actualizacion import (
+        actualizar_identidades,
+        describir_resultado,
+        get_coordinadores,
+    )
+
+    resultado = actualizar_identidades(get_coordinadores(anyo))
+    for nip, error in resultado['errores'].items():
+        logger.warning('Error al actualizar el usuario «%s»: %s', nip, error)
+    logger.info('Convocatoria %s. %s', anyo, describir_resultado(resultado))
+    return resultado
+
+
+@tarea('identidades')
+def sincronizar_evaluadores():
+    """Sincroniza el grupo Evaluadores con la vinculación «Evaluador externo innovación ACPUA».
+
+    Las vinculaciones las crea la administrativa del Secretariado de Calidad e Innovación Docente
+    <https://cau.unizar.es/osticket/kb/faq.php?id=283>.
+    Los usuarios que aún no existan en la aplicación se crean con los datos de Identidades.
+    """
+    from django.contrib.auth.models import Group
+
+    from accounts.actualizacion import crear_usuarios
+    from accounts.models import CustomUser
+
+    try:
+        with _cerrojo_evaluadores:
+            advertencia, nips = CustomUser.get_nips_vinculacion(60)
+            if advertencia:
+                logger.warning('WS de Vinculaciones: %s', advertencia)
+            nips = {str(nip) for nip in nips}
+
+            existentes = set(
+                CustomUser.objects.filter(username__in=nips).values_list('username', flat=True)
+            )
+            nuevos = nips - existentes
+            errores = crear_usuarios(nuevos)['errores'] if nuevos else {}
+            for nip, error in errores.items():
+                logger.warning('No se pudo crear el evaluador «%s»: %s', nip, error)
+
+            evaluadores = Group.objects.get(name='Evaluadores')
+            evaluadores.user_set.add(
+                *CustomUser.objects.filter(username__in=nips).exclude(groups=evaluadores)
+            )
+            evaluadores.user_set.remove(*evaluadores.user_set.exclude(username__in=nips))
+    except TaskLockedException:
+        logger.warning('Ya hay una sincronización del grupo Evaluadores en curso.')
+        return None
+    return {'evaluadores': len(nips) - len(errores), 'errores': errores}
+
 
-    documento_html = HTML(string=html_string, base_url=base_url)
-    documento_html.write_pdf(pdf_destino)
+@db_periodic_task(crontab(hour='6', minute='0'))
+def sincronizar_evaluadores_diariamente():
+    """Sincroniza cada mañana el grupo Evaluadores con Gestión de Identidades."""
+    sincronizar_evaluadores()
@@ -1,10 +1,122 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_tables2 import RequestConfig
 from django.urls import resolve, reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
 from datetime import date
+import io
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-from .views import HomePageView
-from .models import Convocatoria, Proyecto, ParticipanteProyecto, TipoParticipacion, Centro, Programa
+from lxml import etree
+
+from accounts.models import Colectivo
+from manhattan_project import colas
+
+from . import cache as cache_indo
+from . import marcxml
+from .mail import (
+    LimitadorTasa,
+    _get_ficheros_plantilla,
+    encolar_correo,
+    enviar_correos_pendientes,
+)
+from .marcxml import (
+    MARC_NS,
+    generar_lotes_marcxml,
+    generar_marcxml,
+    get_esquema,
+    get_memorias_publicables,
+)
+from .tasks import (
+    borrar_documentos_pdf_caducados,
+    enviar_correos,
+    generar_documento_pdf,
+    generar_pdf,
+)
+from .tables import (
+    EvaluacionProyectosTable,
+    EvaluadoresTable,
+    MemoriaProyectosTable,
+    MemoriasAsignadasTable,
+    ProyectoCorrectorTable,
+    ProyectosAceptadosTable,
+    ProyectosCierreEconomicoTable,
+    ProyectosEvaluadosTable,
+    ProyectosTable,
+    ProyectoUPTable,
+)
+from .utils import exportar_filas
+from .views import ChecksMixin, HomePageView
+from .models import (
+    Centro,
+    Convocatoria,
+    Correo,
+    Criterio,
+    CupoUsuario,
+    Departamento,
+    EvaluadorProyecto,
+    Linea,
+    MemoriaApartado,
+    MemoriaRespuesta,
+    MemoriaSubapartado,
+    Opcion,
+    ParticipanteProyecto,
+    Programa,
+    Proyecto,
+    TipoParticipacion,
+    Valoracion,
+)
+
+def vaciar_cache():
+    """Vacía la caché y pone a cero las estadísticas de sus espacios en este proceso.
+
+    Las pruebas usan su propia caché en memoria (véase `manhattan_project.pruebas`), pero los
+    datos que guarda una prueba siguen ahí en las siguientes.
+    """
+    cache.clear()
+    for espacio in cache_indo.ESPACIOS.values():
+        espacio.reiniciar_estadisticas()
+
+
+class ConvocatoriaTestCase(TestCase):
+    """Pruebas con una convocatoria, un centro, un programa y los tipos de participación."""
+
+    def crear_convocatoria(
+        self, nombre_programa='PIIDUZ', campos_centro=None, campos_programa=None, **campos
+    ):
+        """Crea la convocatoria (2026, salvo que se indique otro `id`) y sus datos básicos.
+
+        Se guardan en `self.convocatoria`, `self.centro`, `self.programa` y `self.tipos` (los
+        tipos de participación, por nombre).
+        """
+        campos.setdefault('id', 2026)
+        self.convocatoria = Convocatoria.objects.create(**campos)
+        self.centro = Centro.objects.create(
+            nombre='Centro Test', academico_id_nk=1, rrhh_id_nk='1', **(campos_centro or {})
+        )
+        self.programa = Programa.objects.create(
+            nombre_corto=nombre_programa,
+            nombre_largo=nombre_programa,
+            convocatoria=self.convocatoria,
+            campos='[]',
+            **(campos_programa or {}),
+        )
+        nombres = ('coordinador', 'coordinador_2', 'participante', 'invitado', 'colaborador')
+        self.tipos = {
+            nombre: TipoParticipacion.objects.get_or_create(nombre=nombre)[0] for nombre in nombres
+        }
 
 
 class HomeTests(TestCase):
@@ -112,3 +224,1121 @@ class CollaboratorsTests(TestCase):
     def test_permite_colaboradores_default_false(self):
         conv = Convocatoria.objects.create(id=2027)
         self.assertFalse(conv.permite_colaboradores)
+
+
+class ValoracionesExportTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.evaluador_1 = User.objects.create_user(username='333333')
+        self.evaluador_2 = User.objects.create_user(username='444444')
+
+        self.crear_convocatoria()
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto evaluado',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        # Creamos los criterios desordenados para comprobar que se respeta parte y peso.
+        self.criterio_texto = Criterio.objects.create(
+            convocatoria=self.convocatoria,
+            parte=2,
+            peso=1,
+            descripcion='Comentarios',
+            tipo='texto',
+        )
+        self.criterio_opcion = Criterio.objects.create(
+            convocatoria=self.convocatoria, parte=1, peso=1, descripcion='Calidad', tipo='opcion'
+        )
+        self.opcion = Opcion.objects.create(
+            criterio=self.criterio_opcion, puntuacion=4, descripcion='Alta'
+        )
+        EvaluadorProyecto.objects.create(evaluador=self.evaluador_1, proyecto=self.proyecto)
+        EvaluadorProyecto.objects.create(evaluador=self.evaluador_2, proyecto=self.proyecto)
+        Valoracion.objects.create(
+            proyecto=self.proyecto,
+            criterio=self.criterio_opcion,
+            opcion=self.opcion,
+            evaluador=self.evaluador_1,
+        )
+        Valoracion.objects.create(
+            proyecto=self.proyecto,
+            criterio=self.criterio_texto,
+            texto='Muy bien',
+            evaluador=self.evaluador_1,
+        )
+
+    def test_get_todas_pivota_valoraciones(self):
+        with self.assertNumQueries(2):
+            filas = list(Valoracion.get_todas(2026))
+
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0][-2:], ['Calidad', 'Comentarios'])
+        self.assertEqual(filas[1][2:4], [self.proyecto.id, 'Proyecto evaluado'])
+        self.assertEqual(filas[1][-2:], [4, 'Muy bien'])
+        # El segundo evaluador todavía no ha valorado el proyecto.
+        self.assertEqual(filas[2][-2:], [None, None])
+
+
+class ExportarFilasTests(TestCase):
+    filas = [['Programa', 'Título'], ['PIIDUZ', 'Innovación & <docencia>'], ['PIET', None]]
+
+    def test_exportar_csv(self):
+        response = exportar_filas(iter(self.filas), 'proyectos')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="proyectos.csv"')
+        contenido = b''.join(response.streaming_content).decode()
+        self.assertEqual(contenido.splitlines()[1], 'PIIDUZ,Innovación & <docencia>')
+
+    def test_exportar_xlsx(self):
+        response = exportar_filas(iter(self.filas), 'proyectos', 'xlsx')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="proyectos.xlsx"')
+        contenido = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(contenido)) as xlsx:
+            self.assertIsNone(xlsx.testzip())
+            hoja = xlsx.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row>'), 3)
+        self.assertIn('Innovación &amp; &lt;docencia&gt;', hoja)
+
+
+class ProyectosUpGastosTests(ConvocatoriaTestCase):
+    def setUp(self):
+        self.crear_convocatoria(campos_centro={'unidad_planificacion': '101'})
+        self.departamento = Departamento.objects.create(
+            nombre='Departamento Test', academico_id_nk=7, unidad_planificacion='273'
+        )
+
+    def crear_proyectos(self, numero):
+        User = get_user_model()
+        for i in range(numero):
+            usuario = User.objects.create_user(username=f'55{numero}{i}', first_name='Ana')
+            usuario.departamentos.add(self.departamento)
+            proyecto = Proyecto.objects.create(
+                titulo=f'Proyecto {i}',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                aceptacion_coordinador=True,
+            )
+            ParticipanteProyecto.objects.create(
+                proyecto=proyecto, tipo_participacion=self.tipos['coordinador'], usuario=usuario
+            )
+
+    def test_get_up_gastos_num_consultas_constante(self):
+        self.crear_proyectos(5)
+        # Proyectos, programas, centros, coordinadores, y centros y departamentos de éstos.
+        with self.assertNumQueries(6):
+            filas = list(Proyecto.get_up_gastos(2026))
+
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[1][3], 'Ana')
+        self.assertEqual(filas[1][4], '273 (Departamento Test)')
+
+    def test_departamento_de_menor_codigo(self):
+        self.crear_proyectos(1)
+        otro = Departamento.objects.create(
+            nombre='Otro Departamento', academico_id_nk=3, unidad_planificacion='300'
+        )
+        get_user_model().objects.get(username='5510').departamentos.add(otro)
+        proyecto = Proyecto.objects.get(convocatoria=self.convocatoria)
+        self.assertEqual(proyecto.get_unidad_planificacion(), '300 (Otro Departamento)')
+
+    def test_tabla_up_num_consultas_constante(self):
+        def consultas_tabla():
+            request = RequestFactory().get('/')
+            tabla = ProyectoUPTable(Proyecto.objects.filter(convocatoria_id=2026))
+            RequestConfig(request).configure(tabla)
+            with CaptureQueriesContext(connection) as consultas:
+                tabla.as_html(request)
+            return len(consultas)
+
+        self.crear_proyectos(2)
+        num_consultas = consultas_tabla()
+        self.crear_proyectos(3)
+        self.assertEqual(consultas_tabla(), num_consultas)
+
+
+class TablasTests(ConvocatoriaTestCase):
+    """Comprueba que el número de consultas para mostrar cada tabla no depende de sus filas."""
+
+    def setUp(self):
+        self.crear_convocatoria()
+        self.linea = Linea.objects.create(nombre='Línea Test', programa=self.programa)
+        self.criterio = Criterio.objects.create(
+            convocatoria=self.convocatoria, parte=1, peso=1, descripcion='Calidad', tipo='texto'
+        )
+        self.num_usuarios = 0
+
+    def crear_usuario(self):
+        self.num_usuarios += 1
+        return get_user_model().objects.create_user(username=f'66{self.num_usuarios}')
+
+    def crear_proyectos(self, numero):
+        for i in range(numero):
+            evaluador = self.crear_usuario()
+            proyecto = Proyecto.objects.create(
+                titulo=f'Proyecto {i}',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                linea=self.linea,
+                estado='ACEPTADO',
+                aceptacion_coordinador=True,
+                corrector=self.crear_usuario(),
+            )
+            for tipo in ('coordinador', 'participante'):
+                ParticipanteProyecto.objects.create(
+                    proyecto=proyecto,
+                    tipo_participacion=self.tipos[tipo],
+                    usuario=self.crear_usuario(),
+                )
+            EvaluadorProyecto.objects.create(
+                evaluador=evaluador, proyecto=proyecto, ha_evaluado=True
+            )
+            Valoracion.objects.create(
+                proyecto=proyecto, criterio=self.criterio, texto='Bien', evaluador=evaluador
+            )
+
+    def consultas_tabla(self, tabla_class, queryset, url='/'):
+        request = RequestFactory().get(url)
+        tabla = tabla_class(tabla_class.preparar_queryset(queryset))
+        RequestConfig(request).configure(tabla)
+        with CaptureQueriesContext(connection) as consultas:
+            tabla.as_html(request)
+        return len(consultas)
+
+    def comprobar_num_consultas_constante(self, tabla_class, model=Proyecto, url='/'):
+        self.crear_proyectos(1)
+        num_consultas = self.consultas_tabla(tabla_class, model.objects.all(), url)
+        self.crear_proyectos(3)
+        self.assertEqual(
+            self.consultas_tabla(tabla_class, model.objects.all(), url), num_consultas
+        )
+
+    def test_tabla_correctores(self):
+        self.comprobar_num_consultas_constante(ProyectoCorrectorTable)
+
+    def test_tabla_evaluadores(self):
+        self.comprobar_num_consultas_constante(
+            EvaluadoresTable, url='/?sort=-numero_participantes'
+        )
+
+    def test_tabla_evaluaciones(self):
+        self.comprobar_num_consultas_constante(EvaluacionProyectosTable)
+
+    def test_tabla_memorias_asignadas(self):
+        self.comprobar_num_consultas_constante(MemoriasAsignadasTable)
+
+    def test_tabla_memorias(self):
+        self.comprobar_num_consultas_constante(MemoriaProyectosTable)
+
+    def test_tabla_aceptados(self):
+        self.comprobar_num_consultas_constante(ProyectosAceptadosTable, ParticipanteProyecto)
+
+    def test_tabla_cierre_economico(self):
+        self.comprobar_num_consultas_constante(ProyectosCierreEconomicoTable)
+
+    def test_tabla_proyectos_evaluados(self):
+        self.comprobar_num_consultas_constante(ProyectosEvaluadosTable, EvaluadorProyecto)
+
+    def test_tabla_proyectos(self):
+        self.comprobar_num_consultas_constante(ProyectosTable)
+
+
+class ChecksMixinTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.coordinador = User.objects.create_user(username='666666')
+        self.ajeno = User.objects.create_user(username='777777')
+        self.crear_convocatoria('PIEC', campos_centro={'nip_decano': 888888})
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        ParticipanteProyecto.objects.create(
+            proyecto=self.proyecto,
+            tipo_participacion=self.tipos['coordinador'],
+            usuario=self.coordinador,
+        )
+
+    def get_mixin(self, usuario):
+        mixin = ChecksMixin()
+        mixin.request = RequestFactory().get('/')
+        mixin.request.user = usuario
+        return mixin
+
+    def test_perfil_de_acceso_reutilizado_en_la_peticion(self):
+        mixin = self.get_mixin(self.coordinador)
+        with self.assertNumQueries(2):
+            self.assertTrue(mixin.esta_vinculado_o_es_decano_o_es_coordinador(self.proyecto.id))
+            self.assertTrue(mixin.es_coordinador(self.proyecto.id))
+            self.assertFalse(mixin.es_participante(self.proyecto.id))
+            self.assertFalse(mixin.es_evaluador_del_proyecto(self.proyecto.id))
+
+    def test_usuario_no_vinculado(self):
+        mixin = self.get_mixin(self.ajeno)
+        self.assertFalse(mixin.esta_vinculado(self.proyecto.id))
+        self.assertFalse(mixin.es_decano_o_director(self.proyecto.id))
+        self.assertFalse(mixin.es_coordinador_estudio(self.proyecto.id))
+        self.assertFalse(mixin.es_corrector_del_proyecto(self.proyecto.id))
+        EvaluadorProyecto.objects.create(evaluador=self.ajeno, proyecto=self.proyecto)
+        self.assertTrue(self.get_mixin(self.ajeno).es_evaluador_del_proyecto(self.proyecto.id))
+
+    def test_es_pas_o_pdi(self):
+        self.assertFalse(self.get_mixin(self.ajeno).es_pas_o_pdi())
+        self.ajeno.colectivo_principal = 'PDI'
+        self.assertTrue(self.get_mixin(self.ajeno).es_pas_o_pdi())
+
+        # Los colaboradores extraordinarios sólo si además son PAS o de un centro adscrito.
+        self.ajeno.cuerpo_pod = 'COLEX'
+        self.assertFalse(self.get_mixin(self.ajeno).es_pas_o_pdi())
+        Colectivo.objects.create(usuario=self.ajeno, nombre='PAS')
+        self.assertTrue(self.get_mixin(self.ajeno).es_pas_o_pdi())
+
+
+class ProyectoDetailTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.coordinador = User.objects.create_user(username='999999', colectivo_principal='PDI')
+        self.crear_convocatoria(
+            'PIEC',
+            fecha_max_aceptos=date(2026, 1, 1),
+            fecha_max_modificacion_equipos=date(2026, 2, 1),
+            num_max_equipos=3,
+        )
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        ParticipanteProyecto.objects.create(
+            proyecto=self.proyecto,
+            tipo_participacion=self.tipos['coordinador'],
+            usuario=self.coordinador,
+        )
+        self.client.force_login(self.coordinador)
+
+    def anyadir_participantes(self, numero):
+        User = get_user_model()
+        for i in range(numero):
+            usuario = User.objects.create_user(username=f'88{numero}{i}')
+            ParticipanteProyecto.objects.create(
+                proyecto=self.proyecto,
+                tipo_participacion=self.tipos['participante'],
+                usuario=usuario,
+            )
+
+    def test_num_consultas_no_depende_de_los_participantes(self):
+        url = reverse('proyecto_detail', args=[self.proyecto.id])
+        self.anyadir_participantes(1)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_participantes_efectivos'], 1)
+
+        self.anyadir_participantes(4)
+        with self.assertNumQueries(len(consultas)):
+            response = self.client.get(url)
+        self.assertEqual(response.context['num_participantes_efectivos'], 5)
+
+    def test_invitaciones_rehusadas_primero(self):
+        User = get_user_model()
+        for username, tipo in (('771', 'invitado'), ('772', 'invitacion_rehusada')):
+            ParticipanteProyecto.objects.create(
+                proyecto=self.proyecto,
+                tipo_participacion=TipoParticipacion.objects.get_or_create(nombre=tipo)[0],
+                usuario=User.objects.create_user(username=username),
+            )
+        response = self.client.get(reverse('proyecto_detail', args=[self.proyecto.id]))
+        self.assertEqual(
+            [invitado.usuario.username for invitado in response.context['invitados']],
+            ['772', '771'],
+        )
+
+
+class ProyectosUsuarioTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.usuario = User.objects.create_user(username='242424', colectivo_principal='PDI')
+        self.otro = User.objects.create_user(username='252525')
+        self.crear_convocatoria(
+            'PIEC',
+            campos_centro={'nip_decano': 242424},
+            campos_programa={'requiere_visto_bueno_centro': True},
+            fecha_max_solicitudes=date(2026, 1, 1),
+        )
+        self.client.force_login(self.usuario)
+        vaciar_cache()
+
+    def crear_proyecto(self, tipo, estado='SOLICITADO'):
+        with self.captureOnCommitCallbacks(execute=True):
+            proyecto = Proyecto.objects.create(
+                titulo=f'Proyecto {tipo}',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                estado=estado,
+            )
+            ParticipanteProyecto.objects.create(
+                proyecto=proyecto, tipo_participacion=self.tipos['coordinador'], usuario=self.otro
+            )
+            ParticipanteProyecto.objects.create(
+                proyecto=proyecto, tipo_participacion=self.tipos[tipo], usuario=self.usuario
+            )
+        return proyecto
+
+    def test_num_consultas_no_depende_de_los_proyectos(self):
+        url = reverse('mis_proyectos', args=[2026])
+        self.client.get(url)  # Guarda en caché los datos de la convocatoria.
+        self.crear_proyecto('participante')
+        self.crear_proyecto('invitado')
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['proyectos_participados']), 1)
+
+        self.crear_proyecto('participante')
+        self.crear_proyecto('invitado')
+        self.crear_proyecto('invitado', estado='BORRADOR')
+        with self.assertNumQueries(len(consultas)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['proyectos_participados']), 2)
+        self.assertEqual(len(response.context['proyectos_invitado']), 2)
+        self.assertEqual(response.context['proyectos_coordinados'], [])
+        # El usuario es decano del centro de todos los proyectos.
+        self.assertEqual(len(response.context['proyectos_centros_dirigidos']), 5)
+        self.assertEqual(response.context['num_equipos_participados'], 2)
+        # El selector de convocatorias lo añade `context_processors.convocatorias`.
+        self.assertEqual([c.id for c in response.context['convocatorias']], [2026])
+
+    def test_listados_en_cache(self):
+        url = reverse('mis_proyectos', args=[2026])
+        proyecto = self.crear_proyecto('participante')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertFalse(
+            any('indo_participanteproyecto' in consulta['sql'] for consulta in consultas)
+        )
+        self.assertEqual(response.context['proyectos_participados'][0].estado, 'SOLICITADO')
+        self.assertEqual(
+            cache_indo.usuario.get_estadisticas(),
+            {'aciertos': 1, 'fallos': 1, 'tasa_aciertos': 0.5},
+        )
+
+        # Cambiar el estado del proyecto invalida los listados de sus vinculados.
+        with self.captureOnCommitCallbacks(execute=True):
+            proyecto.estado = 'ACEPTADO'
+            proyecto.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['proyectos_participados'][0].estado, 'ACEPTADO')
+
+        # `update` no emite señales, pero publicar la resolución provisional invalida los
+        # listados de todos los usuarios de la convocatoria.
+        Proyecto.objects.filter(pk=proyecto.pk).update(estado='APROBADO')
+        response = self.client.get(url)
+        self.assertEqual(response.context['proyectos_participados'][0].estado, 'ACEPTADO')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.convocatoria.notificada_resolucion_provisional = True
+            self.convocatoria.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['proyectos_participados'][0].estado, 'APROBADO')
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        vaciar_cache()
+
+    def test_get_or_set_versionado(self):
+        espacio = cache_indo.EspacioCache('prueba', 60)
+        valores = iter(range(10))
+        self.assertEqual(espacio.get_or_set('a', lambda: next(valores), grupo=1), 0)
+        self.assertEqual(espacio.get_or_set('a', lambda: next(valores), grupo=1), 0)
+        self.assertEqual(espacio.get_or_set('a', lambda: next(valores), grupo=2), 1)
+        self.assertIsNone(espacio.get_or_set('b', lambda: None))
+        self.assertIsNone(espacio.get_or_set('b', lambda: next(valores)))
+
+        espacio.invalidar(1)
+        self.assertEqual(espacio.get_or_set('a', lambda: next(valores), grupo=1), 2)
+        self.assertEqual(espacio.get_or_set('a', lambda: next(valores), grupo=2), 1)
+        self.assertEqual(
+            espacio.get_estadisticas(), {'aciertos': 3, 'fallos': 4, 'tasa_aciertos': 3 / 7}
+        )
+
+    def test_estadisticas_volcadas_periodicamente(self):
+        espacio = cache_indo.EspacioCache('prueba', 60)
+        espacio.get_or_set('a', lambda: 0)
+        espacio.get_or_set('a', lambda: 0)
+        # Se cuentan en el proceso, sin escribir en la caché en cada consulta.
+        self.assertIsNone(cache.get(espacio.clave_aciertos))
+
+        espacio._volcado_en -= cache_indo.INTERVALO_VOLCADO
+        espacio.get_or_set('a', lambda: 0)
+        self.assertEqual(cache.get(espacio.clave_aciertos), 2)
+        self.assertEqual(cache.get(espacio.clave_fallos), 1)
+
+    def test_convocatorias_recientes(self):
+        for anyo in range(2020, 2027):
+            Convocatoria.objects.create(id=anyo, fecha_max_solicitudes=date(anyo, 1, 1))
+        with self.assertNumQueries(1):
+            cache_indo.get_convocatorias_recientes()
+        with self.assertNumQueries(0):
+            recientes = cache_indo.get_convocatorias_recientes()
+        self.assertEqual([c.id for c in recientes], [2026, 2025, 2024, 2023, 2022])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Convocatoria.objects.create(id=2027, fecha_max_solicitudes=date(2027, 1, 1))
+        self.assertEqual(cache_indo.get_convocatorias_recientes()[0].id, 2027)
+        self.assertEqual(cache_indo.catalogo.get_estadisticas()['fallos'], 2)
+
+    def test_get_ultima(self):
+        with self.assertRaises(Convocatoria.DoesNotExist):
+            Convocatoria.get_ultima()
+        with self.captureOnCommitCallbacks(execute=True):
+            Convocatoria.objects.create(id=2026, fecha_max_solicitudes=date(2026, 1, 1))
+        self.assertEqual(Convocatoria.get_ultima().id, 2026)
+        with self.assertNumQueries(0):
+            ultima = Convocatoria.get_ultima()
+        self.assertEqual(ultima.fecha_max_solicitudes, date(2026, 1, 1))
+
+
+class ContadoresProyectoTests(ConvocatoriaTestCase):
+    def setUp(self):
+        self.crear_convocatoria()
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        self.usuarios = [
+            get_user_model().objects.create_user(username=f'77{i}') for i in range(4)
+        ]
+
+    def vincular(self, usuario, tipo):
+        return ParticipanteProyecto.objects.create(
+            proyecto=self.proyecto, tipo_participacion_id=tipo, usuario=usuario
+        )
+
+    def contadores(self):
+        self.proyecto.refresh_from_db()
+        return (
+            self.proyecto.num_participantes,
+            self.proyecto.num_invitados,
+            self.proyecto.num_colaboradores,
+        )
+
+    def test_contadores_mantenidos(self):
+        self.vincular(self.usuarios[0], 'coordinador')
+        invitacion = self.vincular(self.usuarios[1], 'invitado')
+        self.vincular(self.usuarios[2], 'invitado')
+        self.vincular(self.usuarios[3], 'colaborador')
+        self.assertEqual(self.contadores(), (0, 2, 1))
+        self.assertTrue(self.proyecto.tiene_invitados())
+        self.assertFalse(self.proyecto.tiene_participantes())
+
+        invitacion.tipo_participacion_id = 'participante'
+        invitacion.save()
+        self.assertEqual(self.contadores(), (1, 1, 1))
+        self.assertEqual(invitacion.proyecto.num_participantes, 1)
+
+        invitacion.delete()
+        self.assertEqual(self.contadores(), (0, 1, 1))
+
+    def test_guardar_proyecto_no_sobrescribe_contadores(self):
+        cargado = Proyecto.objects.get(pk=self.proyecto.pk)
+        self.vincular(self.usuarios[0], 'invitado')
+        cargado.titulo = 'Nuevo título'
+        cargado.save()
+        self.assertEqual(self.contadores(), (0, 1, 0))
+        self.assertEqual(self.proyecto.titulo, 'Nuevo título')
+
+    def test_recalcular_contadores(self):
+        self.vincular(self.usuarios[0], 'participante')
+        Proyecto.objects.filter(pk=self.proyecto.pk).update(num_participantes=5, num_invitados=2)
+
+        salida = io.StringIO()
+        call_command('recalcular_contadores', anyo=2026, stdout=salida)
+        self.assertIn('Proyectos con contadores corregidos: 1', salida.getvalue())
+        self.assertEqual(self.contadores(), (1, 0, 0))
+        self.assertEqual(Proyecto.actualizar_contadores(), 0)
+
+    def test_coordinadores_mantenidos(self):
+        antiguo, nuevo = self.usuarios[:2]
+        vinculacion_antigua = self.vincular(antiguo, 'coordinador')
+        vinculacion_nueva = self.vincular(nuevo, 'participante')
+        self.proyecto.refresh_from_db()
+        self.assertEqual(self.proyecto.coordinador, antiguo)
+        self.assertIsNone(self.proyecto.coordinador_2)
+
+        # Como en `CambiarCoordinadorView`.
+        vinculacion_antigua.tipo_participacion_id = 'participante'
+        vinculacion_antigua.save()
+        vinculacion_nueva.tipo_participacion_id = 'coordinador'
+        vinculacion_nueva.save()
+        self.proyecto.refresh_from_db()
+        self.assertEqual(self.proyecto.coordinador, nuevo)
+        self.assertEqual(self.proyecto.get_coordinadores(), [nuevo])
+
+        # Guardar un proyecto cargado antes del cambio no repone el coordinador anterior.
+        cargado = Proyecto.objects.get(pk=self.proyecto.pk)
+        vinculacion_nueva.delete()
+        cargado.save()
+        self.proyecto.refresh_from_db()
+        self.assertIsNone(self.proyecto.coordinador)
+
+        Proyecto.objects.filter(pk=self.proyecto.pk).update(coordinador=antiguo)
+        self.assertEqual(Proyecto.actualizar_coordinadores(), 1)
+        self.proyecto.refresh_from_db()
+        self.assertIsNone(self.proyecto.coordinador_id)
+
+
+class CupoUsuarioTests(ConvocatoriaTestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username='232323')
+        self.crear_convocatoria('PIEC', num_max_coordinaciones=2)
+        self.programas = {
+            'PIEC': self.programa,
+            'PIPOUZ': Programa.objects.create(
+                nombre_corto='PIPOUZ',
+                nombre_largo='PIPOUZ',
+                convocatoria=self.convocatoria,
+                campos='[]',
+            ),
+        }
+
+    def vincular(self, tipo, programa='PIEC', estado='SOLICITADO'):
+        proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programas[programa],
+            estado=estado,
+        )
+        ParticipanteProyecto.objects.create(
+            proyecto=proyecto,
+            tipo_participacion=self.tipos[tipo],
+            usuario=self.usuario,
+        )
+        return proyecto
+
+    def test_cupo(self):
+        proyecto = self.vincular('coordinador')
+        self.vincular('coordinador_2', programa='PIPOUZ')
+        self.vincular('coordinador', estado='BORRADOR')
+        self.vincular('participante')
+        self.vincular('participante', estado='DENEGADO')
+        self.vincular('invitado')
+
+        with self.assertNumQueries(1):
+            cupo = CupoUsuario(self.usuario, self.convocatoria)
+        self.assertEqual(cupo.equipos, 3)
+        self.assertEqual(cupo.coordinaciones, 1)
+        self.assertFalse(cupo.limite_coordinaciones_alcanzado)
+        self.assertFalse(cupo.limite_equipos_alcanzado)
+
+        self.vincular('coordinador', estado='ACEPTADO')
+        cupo = CupoUsuario(self.usuario, self.convocatoria)
+        self.assertTrue(cupo.limite_coordinaciones_alcanzado)
+        cupo = CupoUsuario(self.usuario, self.convocatoria, excluir_proyecto_id=proyecto.id)
+        self.assertEqual(cupo.coordinaciones, 1)
+        self.assertEqual(cupo.equipos, 4)
+
+    def test_cupo_guardado_en_la_peticion(self):
+        request = RequestFactory().get('/')
+        cupo = CupoUsuario.get(self.usuario, self.convocatoria, request=request)
+        with self.assertNumQueries(0):
+            self.assertIs(CupoUsuario.get(self.usuario, self.convocatoria, request=request), cupo)
+
+
+class DocumentoPdfTests(TestCase):
+    def setUp(self):
+        vaciar_cache()
+        User = get_user_model()
+        self.gestor = User.objects.create_user(username='121212')
+        self.gestor.user_permissions.add(Permission.objects.get(codename='hace_constar'))
+        self.usuario = User.objects.create_user(username='131313', email='ana@example.com')
+        self.client.force_login(self.gestor)
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(
+            DOCUMENTOS_PDF_ROOT=directorio.name, SECRETARIO='X', SECRETARIO_SEXO='M'
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        colas.set_inmediato(True)
+        self.addCleanup(colas.set_inmediato, False)
+
+    def test_certificado_generado_en_segundo_plano_y_reutilizado(self):
+        response = self.client.post(reverse('certificado'), {'nip': '131313'})
+        self.assertEqual(response.status_code, 302)
+        url_descarga = response['Location']
+
+        response = self.client.get(url_descarga)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="certificado_131313.pdf"'
+        )
+
+        # La segunda solicitud del mismo documento obtiene la misma dirección.
+        response = self.client.post(reverse('certificado'), {'nip': '131313'})
+        self.assertEqual(response['Location'], url_descarga)
+
+    def test_documentos_caducados(self):
+        response = self.client.post(reverse('certificado'), {'nip': '131313'})
+        url_descarga = response['Location']
+        with self.settings(DOCUMENTOS_PDF_VIGENCIA=-1):
+            self.assertEqual(borrar_documentos_pdf_caducados.call_local(), 1)
+        self.assertEqual(self.client.get(url_descarga).status_code, 404)
+
+        # Al volver a solicitarlo, se genera de nuevo.
+        response = self.client.post(reverse('certificado'), {'nip': '131313'})
+        self.assertEqual(self.client.get(response['Location']).status_code, 200)
+
+    def test_no_se_encola_dos_veces(self):
+        colas.set_inmediato(False)
+        cola = colas.get_cola('pdf')
+        self.addCleanup(cola.flush)
+        for _ in range(2):
+            response = self.client.post(reverse('certificado'), {'nip': '131313'})
+            self.assertEqual(self.client.get(response['Location']).headers['Refresh'], '2')
+        self.assertEqual(cola.pending_count(), 1)
+
+    def test_documento_no_solicitado(self):
+        response = self.client.get(reverse('documento_pdf', args=['0' * 64]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_error_al_generar(self):
+        # Si el directorio de los documentos es un fichero, no se puede guardar el PDF.
+        fichero = tempfile.NamedTemporaryFile()
+        self.addCleanup(fichero.close)
+        with self.settings(DOCUMENTOS_PDF_ROOT=fichero.name), self.assertLogs('huey', 'ERROR'):
+            response = self.client.post(reverse('certificado'), {'nip': '131313'})
+        response = self.client.get(response['Location'])
+        self.assertContains(response, 'No se ha podido generar el documento')
+        self.assertNotIn('Refresh', response)
+
+
+class ColasTests(TestCase):
+    def setUp(self):
+        colas.set_inmediato(True)
+        self.addCleanup(colas.set_inmediato, False)
+
+    def definir_tarea(self, fn):
+        tarea = colas.tarea('pdf')(fn)
+        self.addCleanup(tarea.unregister)
+        return tarea
+
+    def test_tareas_repartidas_en_colas(self):
+        self.assertIs(generar_pdf.huey, colas.get_cola('pdf'))
+        self.assertIs(generar_documento_pdf.huey, colas.get_cola('pdf'))
+        self.assertIs(enviar_correos.huey, colas.get_cola('correo'))
+        self.assertIsNot(colas.get_cola('pdf'), colas.get_cola('general'))
+
+    def test_cerrojos_liberados_al_arrancar(self):
+        cola = colas.get_cola('correo')
+        cola.lock_task('enviar-correos').acquire()
+        with self.assertLogs('indo.tasks', 'INFO'):
+            self.assertIsNone(enviar_correos.call_local())
+        # El consumidor los libera al arrancar (`flush_locks`), aunque no se hayan usado.
+        self.assertEqual(cola.flush_locks(), {'enviar-correos'})
+
+    def test_estado_tarea(self):
+        def consultar_estado(id_tarea):
+            return colas.get_estado_tarea('pdf', id_tarea)
+
+        def fallar():
+            raise ValueError('Fallo')
+
+        consultar_estado = self.definir_tarea(consultar_estado)
+        fallar = self.definir_tarea(fallar)
+
+        self.assertEqual(consultar_estado('a', id='a').get(preserve=True), 'en curso')
+        self.assertEqual(colas.get_estado_tarea('pdf', 'a'), 'terminada')
+        with self.assertLogs('huey', 'ERROR'):
+            fallar(id='b')
+        self.assertEqual(colas.get_estado_tarea('pdf', 'b'), 'error')
+        colas.olvidar_tarea('pdf', 'b')
+        self.assertEqual(colas.get_estado_tarea('pdf', 'b'), 'pendiente')
+
+        # Una tarea que no terminó (p. ej. porque murió su proceso) acaba figurando como error.
+        inicio = time.time() - colas.DURACION_MAXIMA_TAREA
+        colas.get_cola('pdf').put(colas._clave_en_curso('c'), inicio)
+        self.assertEqual(colas.get_estado_tarea('pdf', 'c'), 'error')
+
+    def test_prioridad(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        huey = colas.crear_huey('prueba', 'sqlite', directorio.name)
+        tarea = huey.task()(print)
+        tarea('normal')
+        huey.enqueue(tarea.s('urgente', priority=10))
+        self.assertEqual(huey.dequeue().args, ('urgente',))
+        self.assertEqual(huey.dequeue().args, ('normal',))
+
+    @override_settings(HUEY_BACKEND='memoria')
+    def test_medir_colas(self):
+        salida = io.StringIO()
+        call_command(
+            'medir_colas', 'correo', tareas=20, urgentes=2, duracion=0.001, stdout=salida
+        )
+        self.assertIn('Cola correo (memoria, 1 trabajadores): 22 tareas', salida.getvalue())
+        self.assertIn('Urgentes (2): espera media', salida.getvalue())
+
+
+class MemoriasGenerarPdfTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.gestor = User.objects.create_user(username='141414')
+        self.gestor.user_permissions.add(Permission.objects.get(codename='zaguan'))
+        self.client.force_login(self.gestor)
+
+        self.crear_convocatoria()
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+            estado='MEM_PRESENTADA',
+        )
+        apartado = MemoriaApartado.objects.create(
+            convocatoria=self.convocatoria, numero=1, descripcion='Resumen'
+        )
+        subapartado = MemoriaSubapartado.objects.create(
+            apartado=apartado, peso=1, descripcion='Resumen', ayuda='', tipo='texto'
+        )
+        self.respuesta = MemoriaRespuesta.objects.create(
+            proyecto=self.proyecto, subapartado=subapartado, texto='Texto'
+        )
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        colas.set_inmediato(True)
+        self.addCleanup(colas.set_inmediato, False)
+
+    def get_memoria(self):
+        return Proyecto.get_memorias_presentadas(2026).get(pk=self.proyecto.pk)
+
+    def test_progreso_de_la_generacion(self):
+        colas.set_inmediato(False)
+        self.addCleanup(colas.get_cola('pdf').flush)
+        self.client.post(reverse('memorias_generar_pdf', args=[2026]))
+
+        response = self.client.get(reverse('memorias_zaguan', args=[2026]))
+        self.assertEqual(response.context['progreso_pdf']['en_curso'], 1)
+        self.assertEqual(response.headers['Refresh'], '5')
+
+    def test_genera_solo_los_pdf_desactualizados(self):
+        self.assertFalse(self.get_memoria().tiene_pdf_memoria_actualizado())
+
+        response = self.client.post(reverse('memorias_generar_pdf', args=[2026]), follow=True)
+        self.assertContains(response, 'Se ha encolado la generación de 1 PDF de memorias.')
+        self.assertTrue(self.get_memoria().tiene_pdf_memoria_actualizado())
+        self.assertEqual(
+            response.context['progreso_pdf'],
+            {'total': 1, 'terminadas': 1, 'errores': 0, 'en_curso': 0, 'porcentaje': 100},
+        )
+        self.assertNotIn('Refresh', response.headers)
+
+        response = self.client.post(reverse('memorias_generar_pdf', args=[2026]), follow=True)
+        self.assertContains(response, 'Se ha encolado la generación de 0 PDF de memorias.')
+        self.assertContains(response, '1 memorias ya tenían el PDF actualizado.')
+
+        # Al modificar la memoria, el PDF queda desactualizado.
+        self.respuesta.save()
+        self.assertFalse(self.get_memoria().tiene_pdf_memoria_actualizado())
+
+
+class RepositorioFalso(BaseHTTPRequestHandler):
+    """Simula Zaguán: acepta el primer lote que recibe y rechaza los siguientes."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.lotes += 1
+        aceptado = self.server.lotes == 1
+        self.send_response(200 if aceptado else 500)
+        self.end_headers()
+        self.wfile.write(b'Lote aceptado' if aceptado else b'Error')
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(SITE_URL='https://innovaciondocente.unizar.es')
+class MarcxmlTests(ConvocatoriaTestCase):
+    def setUp(self):
+        self.crear_convocatoria()
+        User = get_user_model()
+        self.proyectos = []
+        for i in range(3):
+            proyecto = Proyecto.objects.create(
+                titulo=f'Proyecto {i}',
+                descripcion_txt='Descripción\x0b con un carácter de control',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                es_publicable=True,
+                tiene_infografia=i == 0,
+            )
+            for j, tipo in enumerate(('coordinador', 'participante', 'participante')):
+                usuario = User.objects.create_user(
+                    username=f'88{i}{j}', first_name='Ana', last_name=f'Pérez {j}', orcid=None
+                )
+                ParticipanteProyecto.objects.create(
+                    proyecto=proyecto, tipo_participacion_id=tipo, usuario=usuario
+                )
+            self.proyectos.append(proyecto)
+        Proyecto.objects.create(
+            titulo='No publicable',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        User.objects.filter(username='8800').update(orcid='0000-0002-1825-0097')
+
+    def leer(self, datos: bytes):
+        coleccion = etree.fromstring(datos)
+        get_esquema().assertValid(coleccion)
+        return coleccion
+
+    def test_coleccion_valida(self):
+        response = self.client.get(reverse('memorias_marcxml', args=[2026]))
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        coleccion = self.leer(b''.join(response.streaming_content))
+
+        registros = coleccion.findall(f'{{{MARC_NS}}}record')
+        self.assertEqual(len(registros), 3)
+        campos = {
+            campo.get('tag'): [subcampo.text for subcampo in campo]
+            for campo in registros[0].findall(f'{{{MARC_NS}}}datafield')
+        }
+        self.assertEqual(campos['100'], ['(orcid)0000-0002-1825-0097', 'Pérez 0, Ana', 'coord.'])
+        self.assertEqual(campos['520'], ['Descripción con un carácter de control'])
+        self.assertEqual(len(registros[0].findall(f'{{{MARC_NS}}}datafield[@tag="700"]')), 2)
+        self.assertEqual(
+            campos['FFT'][0],
+            f'https://innovaciondocente.unizar.es/media/infografia/2026/'
+            f'PIIDUZ_{self.proyectos[0].id}.pdf',
+        )
+
+    def test_memoria(self):
+        response = self.client.get(reverse('memoria_marcxml', args=[self.proyectos[1].id]))
+        coleccion = self.leer(response.content)
+        self.assertEqual(len(coleccion), 1)
+
+    def test_num_consultas_no_depende_de_las_memorias(self):
+        # Los proyectos y, por cada bloque de proyectos, sus participantes.
+        with self.assertNumQueries(2):
+            b''.join(generar_marcxml(get_memorias_publicables(2026)))
+
+    def test_lotes(self):
+        lotes = list(generar_lotes_marcxml(get_memorias_publicables(2026), 2))
+        self.assertEqual([len(self.leer(lote)) for lote in lotes], [2, 1])
+
+    def test_envio_interrumpido(self):
+        servidor = HTTPServer(('127.0.0.1', 0), RepositorioFalso)
+        servidor.lotes = 0
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        gestor = get_user_model().objects.create_user(username='191919')
+        gestor.user_permissions.add(Permission.objects.get(codename='zaguan'))
+        self.client.force_login(gestor)
+
+        with (
+            self.settings(
+                REPO_WSURL=f'http://127.0.0.1:{servidor.server_port}/',
+                REPO_EMAIL='zaguan@example.com',
+            ),
+            mock.patch.object(marcxml, 'MEMORIAS_POR_ENVIO', 2),
+        ):
+            response = self.client.post(reverse('memorias_zaguan', args=[2026]), follow=True)
+
+        self.assertContains(response, 'Enviados 1 lotes de memorias.')
+        self.assertContains(response, 'Falló el envío del lote 2 de memorias')
+        # Se avisa igualmente al repositorio de los lotes cargados.
+        correo = Correo.objects.get(plantilla='memorias_zaguan')
+        self.assertIn('Lote aceptado', correo.cuerpo)
+        self.assertIn('se interrumpió', correo.cuerpo)
+
+    def test_repositorio_sin_respuesta(self):
+        # El repositorio acepta la conexión, pero nunca responde.
+        servidor = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(servidor.close)
+        url = f'http://127.0.0.1:{servidor.getsockname()[1]}/'
+        with self.settings(REPO_WSURL=url, REPO_TIMEOUT=0.2):
+            respuestas, error = marcxml.enviar_memorias(2026)
+
+        self.assertEqual(respuestas, [])
+        self.assertEqual(str(error), 'El repositorio no respondió')
+
+
+class BackendSmtpCaido(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('Servidor SMTP no disponible')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class CorreoColaTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.gestor = User.objects.create_user(username='151515')
+        self.gestor.user_permissions.add(Permission.objects.get(codename='listar_evaluaciones'))
+        self.usuario = User.objects.create_user(username='161616', email='ana@example.com')
+        self.client.force_login(self.gestor)
+
+        self.crear_convocatoria()
+        self.proyecto = Proyecto.objects.create(
+            titulo='Proyecto',
+            convocatoria=self.convocatoria,
+            centro=self.centro,
+            programa=self.programa,
+        )
+        self.esperas = []
+        self.limitador = LimitadorTasa(600, reloj=lambda: 0, dormir=self.esperas.append)
+
+    def encolar(self, num):
+        for _ in range(num):
+            encolar_correo(
+                'cierre_proyecto',
+                [self.usuario.email],
+                {'destinatario': self.usuario, 'proyecto': self.proyecto},
+                proyecto=self.proyecto,
+                enviar=False,
+            )
+
+    def test_limitador_espacia_los_envios(self):
+        instante = [0.0]
+        limitador = LimitadorTasa(
+            600,
+            reloj=lambda: instante[0],
+            dormir=lambda segundos: instante.__setitem__(0, instante[0] + segundos),
+        )
+        for _ in range(3):
+            limitador.esperar()
+        self.assertAlmostEqual(instante[0], 0.2)
+
+    def test_envio_de_la_cola(self):
+        self.encolar(3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        resultado = enviar_correos_pendientes(self.limitador)
+        self.assertEqual(resultado, {'enviados': 3, 'fallidos': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, 'Cierre del proyecto «Proyecto»')
+        self.assertEqual(len(self.esperas), 2)
+        enviados = Correo.objects.filter(
+            estado=Correo.Estado.ENVIADO, convocatoria=self.convocatoria
+        )
+        self.assertEqual(enviados.count(), 3)
+
+    def test_reintento_con_espera_creciente(self):
+        self.encolar(1)
+        with self.settings(EMAIL_BACKEND='indo.tests.BackendSmtpCaido'):
+            resultado = enviar_correos_pendientes(self.limitador)
+            self.assertEqual(resultado, {'enviados': 0, 'fallidos': 1})
+            # El mensaje no se reintenta hasta que pase el tiempo de espera.
+            resultado = enviar_correos_pendientes(self.limitador)
+            self.assertEqual(resultado, {'enviados': 0, 'fallidos': 0})
+
+        correo = Correo.objects.get()
+        self.assertEqual(correo.estado, Correo.Estado.PENDIENTE)
+        self.assertEqual(correo.intentos, 1)
+        self.assertIn('Servidor SMTP no disponible', correo.error)
+
+        response = self.client.get(reverse('correos_estado', args=[2026]))
+        self.assertContains(response, 'Servidor SMTP no disponible')
+
+        Correo.objects.update(proximo_intento=None)
+        resultado = enviar_correos_pendientes(self.limitador)
+        self.assertEqual(resultado, {'enviados': 1, 'fallidos': 0})
+
+
+@override_settings(
+    SITE_URL='https://innovaciondocente.unizar.es',
+    VICERRECTOR='"Vicerrector"',
+)
+class ProyectosNotificarPreviewTests(ConvocatoriaTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.gestor = User.objects.create_user(username='171717')
+        self.gestor.user_permissions.add(Permission.objects.get(codename='listar_evaluaciones'))
+        self.client.force_login(self.gestor)
+
+        self.crear_convocatoria()
+        self.url = reverse('notificar_proyectos_preview', args=[2026]) + '?grupo_denegados=1'
+        vaciar_cache()
+
+    def crear_denegados(self, numero):
+        User = get_user_model()
+        for i in range(numero):
+            usuario = User.objects.create_user(
+                username=f'66{numero}{i}', email=f'coordinador{numero}{i}@example.com'
+            )
+            proyecto = Proyecto.objects.create(
+                titulo=f'Proyecto {numero}{i}',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                aceptacion_comision=False,
+            )
+            ParticipanteProyecto.objects.create(
+                proyecto=proyecto, tipo_participacion=self.tipos['coordinador'], usuario=usuario
+            )
+
+    def consultas_previa(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(consultas)
+
+    def test_muestra_un_ejemplo_y_todos_los_destinatarios(self):
+        self.crear_denegados(3)
+        response, _ = self.consultas_previa()
+
+        self.assertContains(response, 'Resolución provisional sobre el proyecto', count=1)
+        for i in range(3):
+            self.assertContains(response, f'coordinador3{i}@example.com')
+        self.assertEqual(response.context['num_denegados'], 3)
+
+    def test_num_consultas_independiente_del_numero_de_proyectos(self):
+        self.crear_denegados(2)
+        _, num_consultas = self.consultas_previa()
+        self.crear_denegados(4)
+        # El ejemplo del grupo es el mismo proyecto, cuya previsualización ya está en la caché.
+        self.assertEqual(self.consultas_previa()[1], num_consultas)
+
+    def test_aprobados_sin_ayuda_no_se_notifican(self):
+        for ayuda in (None, 0, 500):
+            Proyecto.objects.create(
+                titulo=f'Proyecto aprobado {ayuda}',
+                convocatoria=self.convocatoria,
+                centro=self.centro,
+                programa=self.programa,
+                aceptacion_comision=True,
+                ayuda_provisional=ayuda,
+            )
+        response = self.client.get(reverse('notificar_proyectos_preview', args=[2026]))
+
+        self.assertEqual(response.context['num_con_dotacion'], 1)
+        self.assertEqual(response.context['num_sin_dotacion'], 1)
+        self.assertEqual(response.context['total_a_notificar'], 2)
+
+    def test_corregir_el_proyecto_invalida_la_previa(self):
+        self.crear_denegados(1)
+        self.consultas_previa()
+        Proyecto.objects.filter(convocatoria=self.convocatoria).update(titulo='Título corregido')
+
+        response, _ = self.consultas_previa()
+        self.assertContains(response, 'Título corregido')
+
+    def test_la_clave_depende_de_las_plantillas_extendidas(self):
+        ficheros = _get_ficheros_plantilla('participante-proyecto/documento_pdf.html')
+        self.assertTrue(ficheros[0].endswith('documento_pdf.html'))
+        self.assertTrue(any(fichero.endswith('/base.html') for fichero in ficheros))
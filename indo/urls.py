@@ -8,16 +8,21 @@ from .views import (
     CorrectorAnyadirView,
     CorrectorCesarView,
     CorrectorTableView,
+    CorreosEstadoView,
+    CorreosReintentarView,
+    DocumentoPdfView,
     EvaluacionVerView,
     EvaluacionView,
     EvaluadorProyectoDeleteView,
     EvaluadorProyectoUpdateView,
+    EvaluadoresSincronizarView,
     HomePageView,
     InvitacionView,
     ColaboradorAnyadirView,
     ColaboradorDeleteView,
     MemoriaCorreccionUpdateView,
     MemoriaDetailView,
+    MemoriasGenerarPdfView,
     MemoriaMarcxmlView,
     MemoriaPresentarView,
     MemoriasAsignadasTableView,
@@ -105,6 +110,7 @@ urlpatterns = [
         ParticipanteCertificadoView.as_view(),
         name='certificado',
     ),
+    path('documento-pdf/<str:clave>/', DocumentoPdfView.as_view(), name='documento_pdf'),
     # Listados de proyectos
     path('gestion/proyectos/<int:anyo>/', ProyectoTableView.as_view(), name='proyectos_table'),
     path(
@@ -167,6 +173,16 @@ urlpatterns = [
         ProyectosNotificarPreviewView.as_view(),
         name='notificar_proyectos_preview',
     ),
+    path(
+        'gestion/correos/<int:anyo>/',
+        CorreosEstadoView.as_view(),
+        name='correos_estado',
+    ),
+    path(
+        'gestion/correos/<int:anyo>/reintentar/',
+        CorreosReintentarView.as_view(),
+        name='correos_reintentar',
+    ),
     path(
         'gestion/proyectos/<int:anyo>/unidades-planificacion/',
         ProyectoUPTableView.as_view(),
@@ -199,6 +215,11 @@ urlpatterns = [
         EvaluadorProyectoUpdateView.as_view(),
         name='evaluadores_update',
     ),
+    path(
+        'gestion/proyecto/<int:proyecto_id>/sincronizar-evaluadores/',
+        EvaluadoresSincronizarView.as_view(),
+        name='evaluadores_sincronizar',
+    ),
     path(
         'gestion/evaluadorproyecto/<int:pk>/delete/',
         EvaluadorProyectoDeleteView.as_view(),
@@ -230,6 +251,11 @@ urlpatterns = [
         'memorias/<int:anyo>/marcxmls/', MemoriasMarcxmlListView.as_view(), name='memorias_marcxml'
     ),
     path('memorias/<int:anyo>/zaguan/', MemoriasZaguanView.as_view(), name='memorias_zaguan'),
+    path(
+        'memorias/<int:anyo>/generar-pdf/',
+        MemoriasGenerarPdfView.as_view(),
+        name='memorias_generar_pdf',
+    ),
     # Participante en proyecto
     path(
         'participante-proyecto/colaborador-anyadir/<int:proyecto_id>/',
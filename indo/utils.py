@@ -1,10 +1,43 @@
-from django.http import HttpRequest
+import csv
+import hashlib
+import re
+import zipfile
+from collections.abc import Iterable, Iterator
+from decimal import Decimal
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
 from django_tables2 import SingleTableView
 
+from manhattan_project.colas import (
+    DURACION_MAXIMA_TAREA,
+    get_cola,
+    get_estado_tarea,
+    olvidar_tarea,
+)
+
 from .models import Evento, Proyecto, Registro
+from .tasks import generar_documento_pdf
+
+
+class PrecargaTablaMixin:
+    """Aplica al queryset de la tabla las relaciones y anotaciones que ésta declara.
+
+    Véase `indo.tables.RelacionesTablaMixin`.
+    """
+
+    def get_table_data(self):
+        datos = super().get_table_data()
+        preparar_queryset = getattr(self.get_table_class(), 'preparar_queryset', None)
+        return preparar_queryset(datos) if preparar_queryset else datos
 
 
-class PagedFilteredTableView(SingleTableView):
+class PagedFilteredTableView(PrecargaTablaMixin, SingleTableView):
     filter_class = None
     formhelper_class = None
     context_filter_name = 'filter'
@@ -51,3 +84,233 @@ def registrar_evento(
         ip_address=ip_address,
     )
     registro.save()
+
+
+# EXPORTACIÓN DE DATOS
+# --------------------
+# Las filas a exportar se reciben como un iterable (normalmente un generador que lee
+# directamente del cursor de la base de datos) y se van enviando al navegador según se
+# generan, de forma que la memoria usada no depende del número de filas.
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_XLSX_PARTES = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+_XLSX_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_XLSX_HOJA_FIN = '</sheetData></worksheet>'
+# Caracteres de control no admitidos en XML 1.0
+CARACTERES_ILEGALES_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Eco:
+    """Pseudo-fichero que devuelve lo que se escribe en él, en lugar de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+class Tuberia:
+    """Fichero de sólo escritura, sin `seek()`, que acumula los bytes hasta recogerlos."""
+
+    def __init__(self):
+        self._trozos = []
+
+    def write(self, datos):
+        self._trozos.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def recoger(self) -> bytes:
+        datos = b''.join(self._trozos)
+        self._trozos.clear()
+        return datos
+
+
+def _celda_xlsx(valor) -> str:
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, int | float | Decimal):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_ILEGALES_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def generar_csv(filas: Iterable) -> Iterator[str]:
+    """Convierte cada fila en una línea CSV según se va leyendo."""
+    escritor = csv.writer(_Eco())
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def generar_xlsx(filas: Iterable) -> Iterator[bytes]:
+    """Genera una hoja de cálculo XLSX por trozos, según se van leyendo las filas.
+
+    El fichero ZIP se escribe sobre un flujo sin `seek()`, por lo que `zipfile` añade los
+    tamaños de cada parte al final de ésta y no es necesario tener el fichero completo.
+    """
+    tuberia = Tuberia()
+    with zipfile.ZipFile(tuberia, 'w', compression=zipfile.ZIP_DEFLATED) as xlsx:
+        for nombre, contenido in _XLSX_PARTES.items():
+            xlsx.writestr(nombre, contenido)
+        yield tuberia.recoger()
+
+        with xlsx.open('xl/worksheets/sheet1.xml', 'w') as hoja:
+            hoja.write(_XLSX_HOJA_INICIO.encode())
+            for fila in filas:
+                celdas = ''.join(_celda_xlsx(valor) for valor in fila)
+                hoja.write(f'<row>{celdas}</row>'.encode())
+                if datos := tuberia.recoger():
+                    yield datos
+            hoja.write(_XLSX_HOJA_FIN.encode())
+    yield tuberia.recoger()
+
+
+def exportar_filas(filas: Iterable, nombre_fichero: str, formato: str | None = 'csv'):
+    """Devuelve una respuesta que envía las filas como fichero CSV o XLSX adjunto.
+
+    La primera fila debe contener las cabeceras.
+    """
+    if formato == 'xlsx':
+        response = StreamingHttpResponse(generar_xlsx(filas), content_type=XLSX_CONTENT_TYPE)
+    else:
+        formato = 'csv'
+        response = StreamingHttpResponse(generar_csv(filas), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_fichero}.{formato}"'
+    return response
+
+
+# DOCUMENTOS PDF
+# --------------
+# Los certificados y «hace constar» se generan en segundo plano con Huey.
+# Se guardan con el hash de su HTML como nombre, que depende del usuario, de sus proyectos
+# y de la versión de la plantilla, así que las descargas repetidas se sirven desde disco.
+
+
+def get_ruta_documento_pdf(clave: str) -> Path:
+    """Devuelve la ruta del PDF correspondiente a la clave indicada."""
+    return Path(settings.DOCUMENTOS_PDF_ROOT) / clave[:2] / f'{clave}.pdf'
+
+
+def get_id_tarea_documento_pdf(clave: str) -> str:
+    """Devuelve el ID de la tarea de la cola `pdf` que genera el documento."""
+    return f'documento-pdf:{clave}'
+
+
+def get_id_tarea_memoria_pdf(proyecto_id: int) -> str:
+    """Devuelve el ID de la tarea de la cola `pdf` que genera el PDF de la memoria."""
+    return f'memoria-pdf:{proyecto_id}'
+
+
+def _clave_memorias_pdf(anyo: int) -> str:
+    return f'memorias-pdf:{anyo}'
+
+
+def registrar_memorias_pdf(anyo: int, proyecto_ids: list[int]) -> None:
+    """Guarda qué PDF de memorias de la convocatoria se han encolado, para seguir su progreso.
+
+    Se descartan los resultados de la generación anterior, que ya no se consultarán.
+    """
+    cola = get_cola('pdf')
+    for proyecto_id in cola.get(_clave_memorias_pdf(anyo), peek=True) or ():
+        olvidar_tarea('pdf', get_id_tarea_memoria_pdf(proyecto_id))
+    cola.put(_clave_memorias_pdf(anyo), proyecto_ids)
+
+
+def get_progreso_memorias_pdf(anyo: int) -> dict | None:
+    """Devuelve cuántos de los últimos PDF de memorias encolados se han generado y cuántos han
+    fallado, o `None` si no se ha encolado ninguno."""
+    proyecto_ids = get_cola('pdf').get(_clave_memorias_pdf(anyo), peek=True)
+    if not proyecto_ids:
+        return None
+    estados = [
+        get_estado_tarea('pdf', get_id_tarea_memoria_pdf(proyecto_id))
+        for proyecto_id in proyecto_ids
+    ]
+    total = len(estados)
+    terminadas = estados.count('terminada')
+    errores = estados.count('error')
+    return {
+        'total': total,
+        'terminadas': terminadas,
+        'errores': errores,
+        'en_curso': total - terminadas - errores,
+        'porcentaje': round((terminadas + errores) * 100 / total),
+    }
+
+
+def solicitar_documento_pdf(
+    request: HttpRequest, plantilla: str, contexto: dict, nombre_fichero: str
+):
+    """Encola la generación del PDF (si no se generó antes) y redirige a la página de descarga.
+
+    La clave del documento se guarda en la sesión, y sólo quien lo ha solicitado puede
+    descargarlo.
+    """
+    html_string = render_to_string(plantilla, context=contexto, request=request)
+    # En la plantilla, las URL de los CSS y las imágenes son relativas.
+    # Al usar `HTML(string=...)` WeasyPrint no sabe cuál es la URL base, hay que dársela.
+    base_url = request.build_absolute_uri()
+    clave = hashlib.sha256(f'{base_url}\n{html_string}'.encode()).hexdigest()
+
+    ruta = get_ruta_documento_pdf(clave)
+    if not ruta.exists():
+        id_tarea = get_id_tarea_documento_pdf(clave)
+        marca = f'encolada:{id_tarea}'
+        estado = get_estado_tarea('pdf', id_tarea)
+        if estado in ('error', 'terminada'):
+            # Falló, o se generó y se ha borrado por antiguo.  Se descarta el resultado anterior,
+            # que no debe mostrarse mientras se reintenta.
+            olvidar_tarea('pdf', id_tarea)
+            cache.delete(marca)
+        # Si ya está encolada o en curso, no se vuelve a encolar (p. ej. al pulsar dos veces).
+        if estado != 'en curso' and cache.add(marca, True, DURACION_MAXIMA_TAREA):
+            generar_documento_pdf(html_string, base_url, str(ruta), id=id_tarea)
+
+    # Conservamos en la sesión sólo los documentos solicitados más recientemente.
+    documentos = request.session.get('documentos_pdf', {})
+    documentos.pop(clave, None)
+    documentos[clave] = nombre_fichero
+    request.session['documentos_pdf'] = dict(list(documentos.items())[-50:])
+
+    return redirect('documento_pdf', clave=clave)
@@ -1,9 +1,7 @@
 import csv
+import hashlib
 import json
-import os
-import sys
 from datetime import date
-from time import sleep
 from typing import Any
 
 # import bleach
@@ -30,10 +28,10 @@ from django.contrib.auth.models import Group
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from django.db.models import Count, Exists, OuterRef, Q, Value
 from django.forms.models import modelform_factory
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils.formats import localize
 from django.utils.safestring import mark_safe
@@ -45,13 +43,11 @@ from django.views.generic.edit import CreateView, DeleteView, UpdateView, FormVi
 from django_summernote.widgets import SummernoteWidget
 from django_tables2.export.views import ExportMixin
 from django_tables2.views import SingleTableView
-from social_django.utils import load_strategy
-from templated_email import send_templated_mail
-from weasyprint import HTML  # https://weasyprint.org/ - No soporta Javascript
 
 from accounts.models import CustomUser
-from accounts.pipeline import get_identidad
+from manhattan_project.colas import get_estado_tarea
 
+from .cache import get_convocatoria, get_mis_proyectos
 from .filters import ParticipanteProyectoCentroFilter, ProyectoFilter
 from .forms import (
     AsignarCorrectorForm,
@@ -69,10 +65,19 @@ from .forms import (
     ResolucionForm,
     CambiarCoordinadorForm,
 )
+from .mail import encolar_correo, previsualizar_correo, programar_envio
+from .marcxml import (
+    enviar_memorias,
+    generar_marcxml,
+    get_memorias_publicables,
+    precargar_relaciones,
+)
 from .models import (
     Centro,
     Convocatoria,
+    Correo,
     Criterio,
+    CupoUsuario,
     EvaluadorProyecto,
     MemoriaRespuesta,
     ParticipanteProyecto,
@@ -95,8 +100,19 @@ from .tables import (
     ProyectosTable,
     ProyectoUPTable,
 )
-from .tasks import generar_pdf
-from .utils import PagedFilteredTableView, registrar_evento
+from .tasks import actualizar_coordinadores, generar_pdf, sincronizar_evaluadores
+from .utils import (
+    PagedFilteredTableView,
+    PrecargaTablaMixin,
+    exportar_filas,
+    get_id_tarea_documento_pdf,
+    get_id_tarea_memoria_pdf,
+    get_progreso_memorias_pdf,
+    get_ruta_documento_pdf,
+    registrar_evento,
+    registrar_memorias_pdf,
+    solicitar_documento_pdf,
+)
 
 # import magic
 # from os.path import splitext
@@ -105,21 +121,15 @@ from .utils import PagedFilteredTableView, registrar_evento
 
 @permission_required('admin')
 def actualizar_usuarios(request, anyo):
-    """Actualiza los usuarios coordinadores con los datos de Gestión de Identidades."""
-    proyectos = Proyecto.objects.filter(convocatoria__id=anyo)
-    for proyecto in proyectos:
-        print(f'Actualizando coordinador del proyecto: {proyecto.id}')
-        coordinador = proyecto.coordinador
-
-        try:
-            get_identidad(load_strategy(request), None, coordinador)
-        except Exception as ex:
-            return HttpResponse(
-                f'ERROR al actualizar el usuario «{coordinador.username}»'
-                f' (proyecto {proyecto.id}): {ex}'
-            )
+    """Encola la actualización de los coordinadores con los datos de Gestión de Identidades.
 
-    return HttpResponse('Coordinadores actualizados!')
+    Los errores y las métricas de la actualización se registran en el log de Huey.
+    También se puede ejecutar con `manage.py actualizar_coordinadores`.
+    """
+    actualizar_coordinadores(anyo)
+    return HttpResponse(
+        f'Encolada la actualización de los coordinadores de la convocatoria {anyo}.'
+    )
 
 
 def teapot(request, whatever):
@@ -127,84 +137,130 @@ def teapot(request, whatever):
     return HttpResponse("I'm a teapot", status=418)
 
 
+class PerfilAcceso:
+    """Relaciones del usuario actual con un proyecto, para decidir si puede acceder a él.
+
+    Carga con dos consultas el proyecto (con su centro, y si el usuario es evaluador o
+    coordinador de algún plan del estudio del proyecto) y los tipos de participación del usuario
+    en el proyecto.
+    """
+
+    def __init__(self, proyecto_id: int, usuario: CustomUser):
+        # Los NIP de los coordinadores de plan son numéricos; otros usuarios nunca lo serán.
+        es_coordinador_estudio = (
+            Exists(
+                Plan.objects.filter(
+                    estudio_id=OuterRef('estudio_id'), nip_coordinador=int(usuario.username)
+                )
+            )
+            if usuario.username.isdigit()
+            else Value(False)
+        )
+        self.proyecto = get_object_or_404(
+            Proyecto.objects.select_related('centro').annotate(
+                usuario_es_evaluador=Exists(
+                    EvaluadorProyecto.objects.filter(
+                        proyecto_id=OuterRef('pk'), evaluador_id=usuario.id
+                    )
+                ),
+                usuario_es_coordinador_estudio=es_coordinador_estudio,
+            ),
+            pk=proyecto_id,
+        )
+        self.usuario = usuario
+        self.tipos_participacion = set(
+            ParticipanteProyecto.objects.filter(
+                proyecto_id=proyecto_id, usuario_id=usuario.id
+            ).values_list('tipo_participacion_id', flat=True)
+        )
+
+    @property
+    def es_coordinador(self) -> bool:
+        return bool(self.tipos_participacion & {'coordinador', 'coordinador_2'})
+
+    @property
+    def es_participante(self) -> bool:
+        return 'participante' in self.tipos_participacion
+
+    @property
+    def es_invitado(self) -> bool:
+        return 'invitado' in self.tipos_participacion
+
+    @property
+    def esta_vinculado(self) -> bool:
+        return bool(self.tipos_participacion - {'invitacion_rehusada'})
+
+    @property
+    def es_decano_o_director(self) -> bool:
+        centro = self.proyecto.centro
+        return bool(centro) and self.usuario.username == str(centro.nip_decano)
+
+    @property
+    def es_coordinador_estudio(self) -> bool:
+        return self.proyecto.usuario_es_coordinador_estudio
+
+    @property
+    def es_evaluador(self) -> bool:
+        return self.proyecto.usuario_es_evaluador
+
+    @property
+    def es_corrector(self) -> bool:
+        corrector_id = self.proyecto.corrector_id
+        return corrector_id is not None and corrector_id == self.usuario.id
+
+
 class ChecksMixin(UserPassesTestMixin):
     """Proporciona comprobaciones para autorizar o no una acción a un usuario."""
 
+    def get_perfil_acceso(self, proyecto_id: int) -> PerfilAcceso:
+        """Devuelve las relaciones del usuario actual con el proyecto.
+
+        Se guardan en la petición, de modo que todas las comprobaciones realizadas durante ésta
+        sobre un mismo proyecto y usuario (que puede cambiar al suplantar a otro) las reutilizan.
+        """
+        perfiles = self.request.__dict__.setdefault('_perfiles_acceso', {})
+        clave = (int(proyecto_id), self.request.user.id)
+        if clave not in perfiles:
+            perfiles[clave] = PerfilAcceso(proyecto_id, self.request.user)
+        return perfiles[clave]
+
     def es_coordinador(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual es coordinador del proyecto indicado."""
         self.permission_denied_message = _('Usted no es coordinador de este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        coordinadores_participantes = proyecto.participantes.filter(
-            tipo_participacion__in=['coordinador', 'coordinador_2']
-        ).all()
-        usuarios_coordinadores = [p.usuario for p in coordinadores_participantes]
-
-        return usuario_actual in usuarios_coordinadores
+        return self.get_perfil_acceso(proyecto_id).es_coordinador
 
     def es_participante(self, proyecto_id):
         """Devuelve si el usuario actual es participante del proyecto indicado."""
         self.permission_denied_message = _('Usted no es participante de este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        pp = proyecto.participantes.filter(
-            usuario=usuario_actual, tipo_participacion='participante'
-        ).all()
-
-        return True if pp else False
+        return self.get_perfil_acceso(proyecto_id).es_participante
 
     def es_invitado(self, proyecto_id):
         """Devuelve si el usuario actual es invitado del proyecto indicado."""
         self.permission_denied_message = _('Usted no está invitado a este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        pp = proyecto.participantes.filter(
-            usuario=usuario_actual, tipo_participacion='invitado'
-        ).all()
-
-        return True if pp else False
+        return self.get_perfil_acceso(proyecto_id).es_invitado
 
     def esta_vinculado(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual está vinculado al proyecto indicado."""
         self.permission_denied_message = _('Usted no está vinculado a este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        pp = (
-            proyecto.participantes.filter(usuario=usuario_actual)
-            .exclude(tipo_participacion='invitacion_rehusada')
-            .all()
-        )
-
-        return True if pp else False
+        return self.get_perfil_acceso(proyecto_id).esta_vinculado
 
     def es_pas_o_pdi(self) -> bool:
         """Devuelve si el usuario actual es PAS o PDI de la UZ o de sus centros adscritos."""
         self.permission_denied_message = _('Usted no está contratado como PAS o PDI.')
         usuario_actual = self.request.user
-        colectivos_del_usuario = json.loads(usuario_actual.colectivos)
 
         # Los colaboradores extraordinarios constan como PDI en Gestión de Identidades,
         # pero no tienen relación contractual con la universidad y no pueden coordinar proyectos.
         if usuario_actual.cuerpo_pod == 'COLEX':
-            return any(
-                col_autorizado in colectivos_del_usuario for col_autorizado in ['PAS', 'ADS']
-            )
+            return usuario_actual.tiene_colectivo('PAS', 'ADS')
 
-        return any(
-            col_autorizado in colectivos_del_usuario for col_autorizado in ['PAS', 'ADS', 'PDI']
-        )
+        # El colectivo principal es PDI, PAS o ADS si el usuario pertenece a alguno de ellos.
+        return usuario_actual.colectivo_principal in ('PAS', 'ADS', 'PDI')
 
     def es_decano_o_director(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual es decano/director del centro del proyecto."""
         self.permission_denied_message = _('Usted no es decano/director del centro del proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        centro = proyecto.centro
-        if not centro:
-            return False
-
-        nip_decano = centro.nip_decano
-        return usuario_actual.username == str(nip_decano)
+        return self.get_perfil_acceso(proyecto_id).es_decano_o_director
 
     def esta_vinculado_o_es_decano_o_es_coordinador(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual está autorizado para ver la solicitud del proyecto."""
@@ -232,32 +288,17 @@ class ChecksMixin(UserPassesTestMixin):
         self.permission_denied_message = _(
             'Usted no es coordinador del plan de estudios del proyecto.'
         )
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-        estudio = proyecto.estudio
-        if not estudio:
-            return False
-
-        nip_coordinadores = [
-            f'{p.nip_coordinador}' for p in estudio.planes.all() if p.nip_coordinador
-        ]
-        return usuario_actual.username in nip_coordinadores
+        return self.get_perfil_acceso(proyecto_id).es_coordinador_estudio
 
     def es_evaluador_del_proyecto(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual es evaluador del proyecto indicado."""
         self.permission_denied_message = _('Usted no es evaluador de este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-
-        return usuario_actual in proyecto.evaluadores.all()
+        return self.get_perfil_acceso(proyecto_id).es_evaluador
 
     def es_corrector_del_proyecto(self, proyecto_id: int) -> bool:
         """Devuelve si el usuario actual es corrector de la memoria del proyecto indicado."""
         self.permission_denied_message = _('Usted no es corrector de la memoria de este proyecto.')
-        proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-        usuario_actual = self.request.user
-
-        return usuario_actual == proyecto.corrector
+        return self.get_perfil_acceso(proyecto_id).es_corrector
 
 
 class AuthenticatedHttpRequest(HttpRequest):
@@ -383,17 +424,17 @@ class MemoriaCorreccionUpdateView(LoginRequiredMixin, ChecksMixin, UpdateView):
             plantilla = 'memoria_no_admitida'
 
         try:
-            send_templated_mail(
-                template_name=plantilla,
-                from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                recipient_list=(proyecto.coordinador.email,),
-                context={
+            encolar_correo(
+                plantilla,
+                (proyecto.coordinador.email,),
+                {
                     'proyecto': proyecto,
                     'coordinador': proyecto.coordinador,
                     'vicerrector': get_config('VICERRECTOR').strip('"'),
                     'observaciones': request.POST.get('observaciones_corrector'),
                 },
                 cc=(settings.DEFAULT_FROM_EMAIL,),  # Enviar copia al vicerrectorado
+                proyecto=proyecto,
             )
         except Exception as err:  # smtplib.SMTPAuthenticationError etc
             messages.warning(
@@ -583,7 +624,9 @@ class EvaluadorProyectoDeleteView(LoginRequiredMixin, PermissionRequiredMixin, D
         return reverse_lazy('evaluadores_update', args=[self.object.proyecto.id])
 
 
-class MemoriasAsignadasTableView(LoginRequiredMixin, UserPassesTestMixin, SingleTableView):
+class MemoriasAsignadasTableView(
+    LoginRequiredMixin, UserPassesTestMixin, PrecargaTablaMixin, SingleTableView
+):
     """Lista las memorias asignadas al usuario (corrector) actual."""
 
     permission_denied_message = _('Sólo los correctores pueden acceder a esta página.')
@@ -593,7 +636,6 @@ class MemoriasAsignadasTableView(LoginRequiredMixin, UserPassesTestMixin, Single
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -607,6 +649,45 @@ class MemoriasAsignadasTableView(LoginRequiredMixin, UserPassesTestMixin, Single
         return self.request.user.groups.filter(name='Correctores').exists()
 
 
+class MemoriasGenerarPdfView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Encola en Huey la generación de los PDF desactualizados de las memorias del año."""
+
+    permission_required = 'indo.zaguan'
+    permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
+
+    def post(self, request, *args, **kwargs):
+        anyo = kwargs.get('anyo')
+        forzar = bool(request.POST.get('forzar'))
+        num_actualizadas = 0
+        proyectos = []
+        for proyecto in Proyecto.get_memorias_presentadas(anyo):
+            if not forzar and proyecto.tiene_pdf_memoria_actualizado():
+                num_actualizadas += 1
+            else:
+                proyectos.append(proyecto)
+
+        # Se registran antes de encolarlas, por si las tareas terminan antes de acabar el bucle.
+        registrar_memorias_pdf(anyo, [proyecto.id for proyecto in proyectos])
+        for proyecto in proyectos:
+            generar_pdf(
+                proyecto.id,
+                request.build_absolute_uri(reverse('memoria_detail', args=[proyecto.id])),
+                str(proyecto.get_ruta_pdf_memoria()),
+                id=get_id_tarea_memoria_pdf(proyecto.id),
+            )
+        num_encoladas = len(proyectos)
+
+        messages.success(
+            request,
+            _(
+                'Se ha encolado la generación de %(num)s PDF de memorias. '
+                '%(actualizadas)s memorias ya tenían el PDF actualizado.'
+            )
+            % {'num': num_encoladas, 'actualizadas': num_actualizadas},
+        )
+        return redirect('memorias_zaguan', anyo)
+
+
 class MemoriasZaguanView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
     """Envía las memorias de una convocatoria al repositorio institucional"""
 
@@ -616,77 +697,64 @@ class MemoriasZaguanView(LoginRequiredMixin, PermissionRequiredMixin, TemplateVi
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
+        # Comprobar si los PDF están actualizados exige consultar el sistema de ficheros para
+        # cada memoria, así que sólo se hace al generarlos (`MemoriasGenerarPdfView`).
+        context['num_memorias'] = Proyecto.get_memorias_presentadas(self.kwargs['anyo']).count()
+        context['progreso_pdf'] = get_progreso_memorias_pdf(self.kwargs['anyo'])
         return context
 
-    def post(self, request, *args, **kwargs):
-        contexto = self.get_context_data()
-        contexto['proyecto_list'] = (
-            Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
-            .filter(es_publicable=True)
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-        )
-        contexto['url_memorias'] = get_config('SITE_URL') + get_config('MEDIA_URL') + 'memoria/'
-        contexto['url_infografias'] = (
-            get_config('SITE_URL') + get_config('MEDIA_URL') + 'infografia/'
-        )
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # El navegador volverá a pedir la página hasta que se hayan generado todos los PDF.
+        if context['progreso_pdf'] and context['progreso_pdf']['en_curso']:
+            response['Refresh'] = '5'
+        return response
 
-        cadena_xml = render_to_string('memoria/marc_list.xml', context=contexto, request=request)
+    def post(self, request, *args, **kwargs):
+        # Las memorias se envían por lotes, y Zaguán responde a cada uno.  Si falla un lote, los
+        # anteriores ya se han cargado, así que se informa igualmente de ellos.
+        respuestas, error = enviar_memorias(self.kwargs['anyo'])
 
-        payload = {'mode': '-ir'}
-        files = {'file': ('listado.xml', cadena_xml, 'application/xml')}
-        headers = {'user-agent': 'zaguan_indo'}
+        if respuestas:
+            try:
+                encolar_correo(
+                    'memorias_zaguan',
+                    (settings.REPO_EMAIL,),
+                    {
+                        'anyo': self.kwargs['anyo'],
+                        'respuesta': '\n'.join(respuestas),
+                        'error': error,
+                        'usuario': self.request.user,
+                    },
+                    convocatoria=Convocatoria(id=self.kwargs['anyo']),
+                )
+            except Exception as err:  # smtplib.SMTPAuthenticationError etc
+                messages.warning(
+                    request,
+                    _('No fue posible avisar al administrador del repositorio: %(err)s')
+                    % {'err': err},
+                )
 
-        try:
-            resp = requests.post(
-                get_config('REPO_WSURL'), data=payload, files=files, headers=headers
-            )
-            resp.raise_for_status()
-        except requests.exceptions.SSLError:
-            raise requests.exceptions.SSLError(
-                'No fue posible verificar el certificado SSL del repositorio'
-            )
-        except requests.exceptions.ConnectionError:
-            raise requests.exceptions.ConnectionError('No fue posible conectar con el repositorio')
-        except requests.exceptions.HTTPError:
-            raise requests.exceptions.HTTPError(
-                'El repositorio devolvió una respuesta HTTP no válida'
-            )
-        except requests.exceptions.Timeout:
-            raise requests.exceptions.Timeout('El repositorio no respondió')
-        # except requests.exceptions.TooManyRedirects:
-        #     raise requests.exceptions.TooManyRedirects('Demasiadas redirecciones')
-        except requests.exceptions.RequestException:
-            raise requests.exceptions.RequestException(
-                f'Problema desconocido al enviar la petición al repositorio ({sys.exc_info()[0]})'
+            messages.success(
+                request,
+                mark_safe(
+                    _(
+                        'Enviados %(num)s lotes de memorias. La respuesta de Zaguán fue:'
+                        '<br />%(respuesta)s'
+                    )
+                    % {'num': len(respuestas), 'respuesta': '<br />'.join(respuestas)}
+                ),
             )
-        respuesta = resp.content.decode('utf-8')
 
-        try:
-            send_templated_mail(
-                template_name='memorias_zaguan',
-                from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                recipient_list=(settings.REPO_EMAIL,),
-                context={
-                    'anyo': self.kwargs['anyo'],
-                    'respuesta': respuesta,
-                    'usuario': self.request.user,
-                },
-            )
-        except Exception as err:  # smtplib.SMTPAuthenticationError etc
-            messages.warning(
+        if error:
+            messages.error(
                 request,
-                _('No fue posible avisar al administrador del repositorio: %(err)s')
-                % {'err': err},
+                _(
+                    'Falló el envío del lote %(lote)s de memorias: %(err)s. '
+                    'Los lotes siguientes no se han enviado.'
+                )
+                % {'lote': len(respuestas) + 1, 'err': error},
             )
-
-        messages.success(
-            request,
-            mark_safe(
-                _('Memorias enviadas. La respuesta de Zaguán fue:<br />%(respuesta)s')
-                % {'respuesta': respuesta}
-            ),
-        )
         return redirect('memorias_zaguan', self.kwargs['anyo'])
         # TODO: Se podría crear un callback donde el repositorio notifique cómo ha ido el proceso,
         # y enviar un correo electrónico al usuario.
@@ -760,7 +828,9 @@ class ProyectoAceptarView(LoginRequiredMixin, ChecksMixin, SuccessMessageMixin,
         return self.es_coordinador(self.kwargs['pk'])
 
 
-class ProyectoCorrectorTableView(LoginRequiredMixin, PermissionRequiredMixin, SingleTableView):
+class ProyectoCorrectorTableView(
+    LoginRequiredMixin, PermissionRequiredMixin, PrecargaTablaMixin, SingleTableView
+):
     """Muestra los proyectos aceptados por su coordinador y el corrector de memorias asignado."""
 
     permission_required = 'indo.asignar_correctores'
@@ -771,7 +841,6 @@ class ProyectoCorrectorTableView(LoginRequiredMixin, PermissionRequiredMixin, Si
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -800,7 +869,9 @@ class ProyectoCorrectorUpdateView(LoginRequiredMixin, PermissionRequiredMixin, U
         return reverse('proyecto_corrector_table', kwargs={'anyo': self.object.convocatoria.id})
 
 
-class ProyectoEvaluadorTableView(LoginRequiredMixin, PermissionRequiredMixin, SingleTableView):
+class ProyectoEvaluadorTableView(
+    LoginRequiredMixin, PermissionRequiredMixin, PrecargaTablaMixin, SingleTableView
+):
     """Muestra una tabla con las solicitudes de proyectos presentadas y el evaluador asignado."""
 
     permission_required = 'indo.listar_evaluadores'
@@ -811,7 +882,6 @@ class ProyectoEvaluadorTableView(LoginRequiredMixin, PermissionRequiredMixin, Si
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -822,7 +892,9 @@ class ProyectoEvaluadorTableView(LoginRequiredMixin, PermissionRequiredMixin, Si
         )
 
 
-class ProyectosEvaluadosTableView(LoginRequiredMixin, UserPassesTestMixin, SingleTableView):
+class ProyectosEvaluadosTableView(
+    LoginRequiredMixin, UserPassesTestMixin, PrecargaTablaMixin, SingleTableView
+):
     """Lista los proyectos asignados al usuario (evaluador) actual."""
 
     permission_denied_message = _('Sólo los evaluadores pueden acceder a esta página.')
@@ -832,7 +904,6 @@ class ProyectosEvaluadosTableView(LoginRequiredMixin, UserPassesTestMixin, Singl
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -856,37 +927,8 @@ class EvaluadorProyectoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, C
     form_class = EvaluadorForm
 
     def get(self, request, *args, **kwargs):
+        # El desplegable muestra el grupo Evaluadores, que sincroniza `sincronizar_evaluadores`.
         get_object_or_404(Proyecto, pk=kwargs['proyecto_id'])
-        User = get_user_model()
-        # Obtenemos los NIPs de los usuarios con vinculación «Evaluador externo innovacion ACPUA».
-        # Las vinculaciones las crea la administrativa del Secretariado de Calidad
-        # e Innovación Docente
-        # <https://cau.unizar.es/osticket/kb/faq.php?id=283>
-        advertencia, nip_evaluadores = User.get_nips_vinculacion(60)
-        if advertencia:
-            messages.warning(request, advertencia)
-        nip_evaluadores = [str(nip) for nip in nip_evaluadores]
-        # XXX - Desarrollo
-        # nip_evaluadores += ['136040', '327618', '329639', '370109', '408704', '181785']
-
-        # Creamos los usuarios que no existan ya en la aplicación.
-        evaluadores = Group.objects.get(name='Evaluadores')
-        for nip in nip_evaluadores:
-            usuario = get_object_or_None(User, username=nip)
-            if not usuario:
-                try:
-                    usuario = User.crear_usuario(request, nip)
-                except Exception as ex:
-                    messages.error(request, 'ERROR: {e}'.format(e=ex.args[0]))
-                    return redirect('evaluadores_update')
-            # Añadimos los usuarios al grupo Evaluadores.
-            evaluadores.user_set.add(usuario)  # or usuario.groups.add(evaluadores)
-
-        # Quitamos del grupo Evaluadores a los usuarios que ya no tengan esa vinculación.
-        for usuario in evaluadores.user_set.all():
-            if usuario.username not in nip_evaluadores:
-                evaluadores.user_set.remove(usuario)  # or usuario.groups.remove(evaluadores)
-
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
@@ -908,6 +950,30 @@ class EvaluadorProyectoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, C
         )
 
 
+class EvaluadoresSincronizarView(LoginRequiredMixin, PermissionRequiredMixin, RedirectView):
+    """Encola la sincronización del grupo Evaluadores con Gestión de Identidades.
+
+    La sincronización también se ejecuta automáticamente cada mañana.
+    """
+
+    permission_required = 'indo.editar_evaluadores'
+    permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
+
+    def get_redirect_url(self, *args, **kwargs):
+        return reverse_lazy('evaluadores_update', kwargs={'proyecto_id': kwargs['proyecto_id']})
+
+    def post(self, request, *args, **kwargs):
+        sincronizar_evaluadores()
+        messages.success(
+            request,
+            _(
+                'Se ha encolado la sincronización de los evaluadores con Gestión de Identidades.'
+                ' Recargue la página en unos instantes.'
+            ),
+        )
+        return super().post(request, *args, **kwargs)
+
+
 class ProyectoResolucionUpdateView(
     LoginRequiredMixin, PermissionRequiredMixin, SuccessMessageMixin, UpdateView
 ):
@@ -990,7 +1056,6 @@ class ProyectoUPTableView(LoginRequiredMixin, PermissionRequiredMixin, SingleTab
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -1009,11 +1074,7 @@ class ProyectosUpCsvView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
     def get(self, request, *args, **kwargs):
         datos_proyectos = Proyecto.get_up_gastos(kwargs.get('anyo'))
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="proyectos_up_gastos.csv"'
-        writer = csv.writer(response)
-        writer.writerows(datos_proyectos)
-        return response
+        return exportar_filas(datos_proyectos, 'proyectos_up_gastos', request.GET.get('formato'))
 
 
 class HomePageView(TemplateView):
@@ -1083,9 +1144,9 @@ class ParticipanteAceptarView(LoginRequiredMixin, RedirectView):
         proyecto_id = kwargs.get('proyecto_id')
         proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
 
-        num_equipos = usuario_actual.get_num_equipos(proyecto.convocatoria_id)
-        num_max_equipos = proyecto.convocatoria.num_max_equipos
-        if num_equipos >= num_max_equipos:
+        cupo = CupoUsuario.get(usuario_actual, proyecto.convocatoria, request=request)
+        num_max_equipos = cupo.max_equipos
+        if cupo.limite_equipos_alcanzado:
             messages.error(
                 request,
                 _(
@@ -1202,9 +1263,9 @@ class ParticipanteAnyadirView(LoginRequiredMixin, ChecksMixin, TemplateView):
             return redirect('participante_anyadir', proyecto.id)
 
         # Comprobamos que el usuario no esté ya en el número máximo de equipos permitido.
-        num_equipos = usuario.get_num_equipos(proyecto.convocatoria_id)
-        num_max_equipos = proyecto.convocatoria.num_max_equipos
-        if num_equipos >= num_max_equipos:
+        cupo = CupoUsuario.get(usuario, proyecto.convocatoria, request=request)
+        num_max_equipos = cupo.max_equipos
+        if cupo.limite_equipos_alcanzado:
             messages.error(
                 request,
                 _(
@@ -1430,13 +1491,10 @@ class ColaboradorAnyadirView(LoginRequiredMixin, ChecksMixin, TemplateView):
         )
 
         try:
-            from templated_email import send_templated_mail
-            import smtplib
-            send_templated_mail(
-                template_name='colaborador_incluido',
-                from_email=None,
-                recipient_list=[usuario.email],
-                context={
+            encolar_correo(
+                'colaborador_incluido',
+                (usuario.email,),
+                {
                     'nombre_coordinador': request.user.full_name,
                     'nombre_colaborador': usuario.full_name,
                     'sexo_colaborador': usuario.sexo,
@@ -1446,6 +1504,7 @@ class ColaboradorAnyadirView(LoginRequiredMixin, ChecksMixin, TemplateView):
                     'descripcion_proyecto': proyecto.descripcion_txt,
                     'site_url': settings.SITE_URL,
                 },
+                proyecto=proyecto,
             )
         except Exception as err:
             messages.warning(
@@ -1565,20 +1624,12 @@ class ColaboradorHaceConstarView(LoginRequiredMixin, ChecksMixin, DetailView):
             'proyecto': proyecto,
         }
 
-        documento_html = HTML(
-            string=render_to_string(
-                'participante-proyecto/certificado_colaborador.html', context=contexto, request=request
-            ),
-            # En la plantilla, las URL de los CSS y las imágenes son relativas.
-            # Al usar `HTML(string=...)` WeasyPrint no sabe cuál es la URL base, hay que dársela.
-            base_url=request.build_absolute_uri(),
-        )
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            f'attachment; filename="hago_constar_colaborador_{colaborador.usuario.username}.pdf"'
+        return solicitar_documento_pdf(
+            request,
+            'participante-proyecto/certificado_colaborador.html',
+            contexto,
+            f'hago_constar_colaborador_{colaborador.usuario.username}.pdf',
         )
-        documento_html.write_pdf(response)
-        return response
 
 
 class ParticipanteDeleteView(LoginRequiredMixin, ChecksMixin, DeleteView):
@@ -1613,7 +1664,6 @@ class ParticipanteHaceConstarView(LoginRequiredMixin, PermissionRequiredMixin, T
         context.update(
             {
                 'anyo': self.kwargs.get('anyo'),
-                'convocatorias': Convocatoria.objects.order_by('-id').all()[:5],
                 'form': HaceConstarForm(),
                 'url_anterior': self.request.headers.get('Referer', reverse('home')),
             }
@@ -1664,19 +1714,13 @@ class ParticipanteHaceConstarView(LoginRequiredMixin, PermissionRequiredMixin, T
             'convocatoria': convocatoria,
         }
 
-        documento_html = HTML(
-            string=render_to_string(
-                'participante-proyecto/hace_constar.html', context=contexto, request=request
-            ),
-            # En la plantilla, las URL de los CSS y las imágenes son relativas.
-            # Al usar `HTML(string=...)` WeasyPrint no sabe cuál es la URL base, hay que dársela.
-            base_url=request.build_absolute_uri(),
-        )
-        response = HttpResponse(content_type='application/pdf')
         musername = usuario.email.split('@')[0]
-        response['Content-Disposition'] = f'attachment; filename="hace_constar_{musername}.pdf"'
-        documento_html.write_pdf(response)
-        return response
+        return solicitar_documento_pdf(
+            request,
+            'participante-proyecto/hace_constar.html',
+            contexto,
+            f'hace_constar_{musername}.pdf',
+        )
 
 
 class ParticipanteCertificadoView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
@@ -1764,27 +1808,55 @@ class ParticipanteCertificadoView(LoginRequiredMixin, PermissionRequiredMixin, T
             'proyecto_list': proyectos_participados,
             'mostrar_ayuda': tipo_certificado == 'con_ayuda',
         }
-        print(get_config('SECRETARIO_SEXO'))
-
 
-        documento_html = HTML(
-            string=render_to_string(
-                'participante-proyecto/certificado.html', context=contexto, request=request
-            ),
-            # En la plantilla, las URL de los CSS y las imágenes son relativas.
-            # Al usar `HTML(string=...)` WeasyPrint no sabe cuál es la URL base, hay que dársela.
-            base_url=request.build_absolute_uri(),
+        return solicitar_documento_pdf(
+            request,
+            'participante-proyecto/certificado.html',
+            contexto,
+            f'certificado_{usuario.username}.pdf',
         )
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            f'attachment; filename="certificado_{usuario.username}.pdf"'
+
+
+class DocumentoPdfView(LoginRequiredMixin, View):
+    """Descarga un documento PDF generado en segundo plano, o espera a que esté listo."""
+
+    def get(self, request, *args, **kwargs):
+        clave = kwargs.get('clave')
+        nombre_fichero = request.session.get('documentos_pdf', {}).get(clave)
+        if not nombre_fichero:
+            raise Http404(_('No se ha encontrado el documento solicitado.'))
+
+        ruta = get_ruta_documento_pdf(clave)
+        if ruta.exists():
+            return FileResponse(
+                open(ruta, 'rb'),
+                as_attachment=True,
+                filename=nombre_fichero,
+                content_type='application/pdf',
+            )
+
+        estado = get_estado_tarea('pdf', get_id_tarea_documento_pdf(clave))
+        if estado == 'terminada':  # El documento se generó, pero se ha borrado por antiguo.
+            raise Http404(_('El documento ha caducado. Vuelva a solicitarlo.'))
+        error = estado == 'error'
+        response = render(
+            request,
+            'participante-proyecto/documento_pdf.html',
+            {
+                'clave': clave,
+                'error': error,
+                'nombre_fichero': nombre_fichero,
+                'url_anterior': request.headers.get('Referer', reverse('home')),
+            },
         )
-        documento_html.write_pdf(response)
+        # El navegador volverá a pedir la página hasta que el documento esté generado.
+        if not error:
+            response['Refresh'] = '2'
         return response
 
 
 class ProyectosCierreEconomicoTableView(
-    LoginRequiredMixin, PermissionRequiredMixin, SingleTableView
+    LoginRequiredMixin, PermissionRequiredMixin, PrecargaTablaMixin, SingleTableView
 ):
     """Muestra los proyectos aceptados y su cierre económico."""
 
@@ -1796,7 +1868,6 @@ class ProyectosCierreEconomicoTableView(
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -1993,47 +2064,25 @@ class MemoriaDetailView(LoginRequiredMixin, ChecksMixin, TemplateView):
         )
 
 
-class MemoriaMarcxmlView(DetailView):
+class MemoriaMarcxmlView(View):
     """Muestra el fichero MarcXML para catalogar una memoria."""
 
-    model = Proyecto
-    template_name = 'memoria/marc_single.xml'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context.update(
-            {'url_memorias': get_config('SITE_URL') + get_config('MEDIA_URL') + 'memoria/'}
-        )
-        return context
-
     def get(self, request, *args, **kwargs):
-        self.content_type = 'application/xml'
-        return super().get(request, *args, **kwargs)
-
+        proyecto = get_object_or_404(precargar_relaciones(Proyecto.objects.all()), pk=kwargs['pk'])
+        return HttpResponse(b''.join(generar_marcxml([proyecto])), content_type='application/xml')
 
-class MemoriasMarcxmlListView(ListView):
-    """Muestra el fichero MarcXML para catalogar las memorias de una convocatoria."""
 
-    model = Proyecto
-    template_name = 'memoria/marc_list.xml'
+class MemoriasMarcxmlListView(View):
+    """Muestra el fichero MarcXML para catalogar las memorias de una convocatoria.
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context.update(
-            {'url_memorias': get_config('SITE_URL') + get_config('MEDIA_URL') + 'memoria/'}
-        )
-        return context
-
-    def get_queryset(self):
-        return (
-            Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
-            .filter(es_publicable=True)
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-        )
+    El fichero se envía según se genera, sin tenerlo completo en memoria.
+    """
 
     def get(self, request, *args, **kwargs):
-        self.content_type = 'application/xml'
-        return super().get(request, *args, **kwargs)
+        return StreamingHttpResponse(
+            generar_marcxml(get_memorias_publicables(kwargs['anyo'])),
+            content_type='application/xml',
+        )
 
 
 class MemoriaPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
@@ -2065,14 +2114,7 @@ class MemoriaPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
         proyecto.save()
 
         base_url = request.build_absolute_uri()[: -len('presentar/')]
-
-        # Generar ruta tipo `BASE_DIR/media/memoria/2021/PIIDUZ_42.pdf`
-        pdf_destino = os.path.join(
-            settings.MEDIA_ROOT,
-            'memoria',
-            str(proyecto.convocatoria_id),
-            f'{proyecto.programa.nombre_corto}_{proyecto_id}.pdf',
-        )
+        pdf_destino = str(proyecto.get_ruta_pdf_memoria())
 
         generar_pdf(proyecto_id, base_url, pdf_destino)  # Proceso lento, lo ejecutamos en segundo plano.
 
@@ -2166,61 +2208,73 @@ class ProyectoDetailView(LoginRequiredMixin, ChecksMixin, DetailView):
     model = Proyecto
     template_name = 'proyecto/detail.html'
 
+    def get_queryset(self):
+        return Proyecto.objects.select_related(
+            'convocatoria', 'programa', 'linea', 'centro', 'estudio', 'departamento'
+        )
+
+    def get_object(self, queryset=None):
+        # Lo usan tanto las comprobaciones como el contexto; lo obtenemos una sola vez.
+        if not hasattr(self, '_proyecto'):
+            self._proyecto = super().get_object(queryset)
+        return self._proyecto
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        proyecto = self.object
+        convocatoria = proyecto.convocatoria
 
-        context['anyo'] = self.get_object().convocatoria.id
-
-        context['participantes'] = (
-            self.get_object()
-            .participantes.filter(tipo_participacion='participante')
-            .order_by('usuario__first_name', 'usuario__last_name')
-            .all()
-        )
+        context['anyo'] = convocatoria.id
 
-        context['invitados'] = (
-            self.get_object()
-            .participantes.filter(tipo_participacion__in=['invitado', 'invitacion_rehusada'])
+        # Obtenemos todas las vinculaciones a mostrar con una sola consulta,
+        # y las repartimos según el tipo de participación.
+        vinculaciones = (
+            proyecto.participantes.filter(
+                tipo_participacion__in=[
+                    'participante',
+                    'invitado',
+                    'invitacion_rehusada',
+                    'colaborador',
+                ]
+            )
+            .select_related('usuario')
             .order_by('tipo_participacion', 'usuario__first_name', 'usuario__last_name')
-            .all()
         )
-
-        if self.get_object().convocatoria.permite_colaboradores:
-            context['colaboradores'] = (
-                self.get_object()
-                .participantes.filter(tipo_participacion='colaborador')
-                .order_by('usuario__first_name', 'usuario__last_name')
-                .all()
+        vinculaciones_por_tipo = {}
+        for vinculacion in vinculaciones:
+            vinculaciones_por_tipo.setdefault(vinculacion.tipo_participacion_id, []).append(
+                vinculacion
             )
+
+        context['participantes'] = vinculaciones_por_tipo.get('participante', [])
+        # Como antes, por tipo de participación: primero las invitaciones rehusadas.
+        context['invitados'] = vinculaciones_por_tipo.get(
+            'invitacion_rehusada', []
+        ) + vinculaciones_por_tipo.get('invitado', [])
+
+        if convocatoria.permite_colaboradores:
+            context['colaboradores'] = vinculaciones_por_tipo.get('colaborador', [])
         else:
             context['colaboradores'] = None
 
-        context['campos'] = json.loads(self.get_object().programa.campos)
+        context['campos'] = json.loads(proyecto.programa.campos)
+
+        es_coordinador = self.es_coordinador(proyecto.id)
+        es_gestor = self.request.user.has_perm('indo.editar_proyecto')
 
-        context['permitir_edicion'] = (
-            self.es_coordinador(self.get_object().id) and self.object.en_borrador()
-        ) or self.request.user.has_perm('indo.editar_proyecto')
+        context['permitir_edicion'] = (es_coordinador and proyecto.en_borrador()) or es_gestor
 
         context['permitir_invitar'] = (
-            context['permitir_edicion']
-            and date.today() <= self.get_object().convocatoria.fecha_max_aceptos
+            context['permitir_edicion'] and date.today() <= convocatoria.fecha_max_aceptos
         )
 
         # Comprobamos si se ha alcanzado el límite de participantes
-        num_max_participantes = self.get_object().convocatoria.num_max_participantes
-        
+        num_max_participantes = convocatoria.num_max_participantes
+
         # Calculamos participantes efectivos e invitaciones pendientes
         # Excluimos coordinadores y rehusadas
-        num_participantes_efectivos = (
-            self.get_object()
-            .participantes.filter(tipo_participacion='participante')
-            .count()
-        )
-        num_invitaciones_pendientes = (
-            self.get_object()
-            .participantes.filter(tipo_participacion='invitado')
-            .count()
-        )
+        num_participantes_efectivos = len(context['participantes'])
+        num_invitaciones_pendientes = len(vinculaciones_por_tipo.get('invitado', []))
         # El total ocupado es la suma de los que ya son participantes y los invitados pendientes
         total_ocupado = num_participantes_efectivos + num_invitaciones_pendientes
 
@@ -2235,68 +2289,52 @@ class ProyectoDetailView(LoginRequiredMixin, ChecksMixin, DetailView):
         else:
             context['limite_participantes_alcanzado'] = False
 
-        context['permitir_anyadir_sin_invitacion'] = self.request.user.has_perm(
-            'indo.editar_proyecto'
-        ) and (
+        context['permitir_anyadir_sin_invitacion'] = es_gestor and (
             # Si todavía se está dentro del plazo para que los invitados acepten participar,
             # los gestores no pueden añadirlos directamente como participantes,
             # sino que deben invitarles para que acepten la invitación.
             # Como la solicitud ya ha sido presentada, no se enviará notificacion de la invitación,
             # así que deberá comunicárselo al invitado el propio coordinador.
-            self.object.convocatoria.fecha_max_aceptos
+            convocatoria.fecha_max_aceptos
             < date.today()
-            < self.object.convocatoria.fecha_max_modificacion_equipos
+            < convocatoria.fecha_max_modificacion_equipos
         )
 
         # No mostrar si la Comisión ha aprobado o no el proyecto
         # hasta que se publique la resolución.
         if (
-            self.get_object().estado in ('DENEGADO', 'APROBADO')
-            and not self.get_object().convocatoria.notificada_resolucion_provisional
+            proyecto.estado in ('DENEGADO', 'APROBADO')
+            and not convocatoria.notificada_resolucion_provisional
         ):
             context['object'].estado = 'SOLICITADO'
 
-        context['es_coordinador'] = self.es_coordinador(self.object.id)
+        context['es_coordinador'] = es_coordinador
 
-        context['es_gestor'] = self.request.user.has_perm('indo.editar_proyecto')
+        context['es_gestor'] = es_gestor
 
-        context['permitir_anyadir_colaborador'] = self.object.convocatoria.permite_colaboradores and self.object.aceptacion_coordinador and (
-            self.request.user.has_perm('indo.editar_proyecto') or (
-                self.es_coordinador(self.object.id) and self.object.estado not in ('MEM_PRESENTADA', 'MEM_ADMITIDA', 'FINALIZADO_SIN_MEMORIA')
+        context['permitir_anyadir_colaborador'] = (
+            convocatoria.permite_colaboradores
+            and proyecto.aceptacion_coordinador
+            and (
+                es_gestor
+                or (
+                    es_coordinador
+                    and proyecto.estado
+                    not in ('MEM_PRESENTADA', 'MEM_ADMITIDA', 'FINALIZADO_SIN_MEMORIA')
+                )
             )
         )
 
-        # Comprobamos límites para la presentación
-        num_coordinaciones_presentadas = (
-            ParticipanteProyecto.objects.filter(
-                usuario=self.request.user,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria=self.get_object().convocatoria,
-            )
-            .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-            .exclude(proyecto__pk=self.get_object().pk)
-            .exclude(proyecto__programa__nombre_corto='PIPOUZ')
-            .count()
+        # Comprobamos límites para la presentación.  Se usa el mismo cupo que en
+        # `ProyectoPresentarView`: las coordinaciones sin contar este proyecto, y los equipos
+        # contándolo (un borrador no computa, así que tampoco lo cuenta).
+        cupo = CupoUsuario.get(
+            self.request.user, convocatoria, excluir_proyecto_id=proyecto.pk, request=self.request
         )
         context['limite_coordinaciones_alcanzado'] = (
-            self.get_object().convocatoria.num_max_coordinaciones is not None
-            and self.get_object().programa.nombre_corto != 'PIPOUZ'
-            and num_coordinaciones_presentadas
-            >= self.get_object().convocatoria.num_max_coordinaciones
-        )
-
-        num_equipos = self.request.user.get_num_equipos(self.get_object().convocatoria.id)
-        # Restamos 1 porque get_num_equipos cuenta el proyecto actual si ya estamos vinculados (que lo estamos como coord)
-        # y queremos saber si PODEMOS presentar este.
-        # Pero get_num_equipos cuenta "proyectos en los que participa".
-        # Si es coordinador de ESTE borrador, ya cuenta como 1.
-        # Al presentar, seguirá siendo 1.
-        # La validación en PresentarView mira: num_equipos >= num_max_equipos.
-        # Si num_equipos (incluyendo este) ya es >= max, no deja.
-        # Entonces aquí usamos la misma lógica sin restar, porque get_num_equipos ya incluye este proyecto.
-        context['limite_equipos_alcanzado'] = (
-            num_equipos >= self.get_object().convocatoria.num_max_equipos
+            proyecto.programa.nombre_corto != 'PIPOUZ' and cupo.limite_coordinaciones_alcanzado
         )
+        context['limite_equipos_alcanzado'] = cupo.limite_equipos_alcanzado
 
         context['url_anterior'] = self.request.headers.get('Referer', reverse('home'))
 
@@ -2308,36 +2346,30 @@ class ProyectoDetailView(LoginRequiredMixin, ChecksMixin, DetailView):
 
 
 class ProyectosCsvView(LoginRequiredMixin, PermissionRequiredMixin, View):
-    """Devuelve un fichero CSV con datos de todos los proyectos introducidos en el año."""
+    """Devuelve un fichero CSV o XLSX con datos de todos los proyectos introducidos en el año."""
 
     permission_required = 'indo.listar_evaluadores'
     permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
 
     def get(self, request, *args, **kwargs):
         datos_proyectos = Proyecto.get_todos(kwargs.get('anyo'))
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="proyectos.csv"'
-        writer = csv.writer(response)
-        writer.writerows(datos_proyectos)
-        return response
+        return exportar_filas(datos_proyectos, 'proyectos', request.GET.get('formato'))
 
 
 class ProyectoEvaluacionesCsvView(LoginRequiredMixin, PermissionRequiredMixin, View):
-    """Devuelve un fichero CSV con las valoraciones de todos los proyectos presentados."""
+    """Devuelve un fichero CSV o XLSX con las valoraciones de todos los proyectos presentados."""
 
     permission_required = 'indo.listar_evaluaciones'
     permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
 
     def get(self, request, *args, **kwargs):
         valoraciones = Valoracion.get_todas(kwargs.get('anyo'))
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="valoraciones.csv"'
-        writer = csv.writer(response)
-        writer.writerows(valoraciones)
-        return response
+        return exportar_filas(valoraciones, 'valoraciones', request.GET.get('formato'))
 
 
-class ProyectoEvaluacionesTableView(LoginRequiredMixin, PermissionRequiredMixin, SingleTableView):
+class ProyectoEvaluacionesTableView(
+    LoginRequiredMixin, PermissionRequiredMixin, PrecargaTablaMixin, SingleTableView
+):
     """Muestra los proyectos presentados y enlaces a su evaluación y resolución de la Comisión."""
 
     permission_required = 'indo.listar_evaluaciones'
@@ -2365,7 +2397,6 @@ class ProyectoEvaluacionesTableView(LoginRequiredMixin, PermissionRequiredMixin,
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
         context['convocatoria'] = get_object_or_404(Convocatoria, pk=self.kwargs.get('anyo'))
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -2606,7 +2637,9 @@ class ProyectoFichaView(DetailView):
         return context
 
 
-class ProyectoMemoriasTableView(LoginRequiredMixin, PermissionRequiredMixin, SingleTableView):
+class ProyectoMemoriasTableView(
+    LoginRequiredMixin, PermissionRequiredMixin, PrecargaTablaMixin, SingleTableView
+):
     """Muestra los proyectos aceptados y enlaces a su memoria y dictamen del corrector."""
 
     permission_required = 'indo.ver_memorias'
@@ -2633,7 +2666,6 @@ class ProyectoMemoriasTableView(LoginRequiredMixin, PermissionRequiredMixin, Sin
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -2674,23 +2706,23 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                 proyectos_con_dotacion = (
                     Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
                     .filter(aceptacion_comision=True, ayuda_provisional__gt=0)
-                    .all()
+                    .select_related('coordinador')
                 )
                 proyectos_sin_dotacion = (
                     Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
                     .filter(aceptacion_comision=True, ayuda_provisional=0)
-                    .all()
+                    .select_related('coordinador')
                 )
             else:
                 proyectos_con_dotacion = (
                     Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
                     .filter(aceptacion_comision=True, ayuda_definitiva__gt=0)
-                    .all()
+                    .select_related('coordinador')
                 )
                 proyectos_sin_dotacion = (
                     Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
                     .filter(aceptacion_comision=True, ayuda_definitiva=0)
-                    .all()
+                    .select_related('coordinador')
                 )
 
             try:
@@ -2699,7 +2731,6 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                     if variante == '_provisional':
                         proyecto.estado = 'APROBADO'
                         proyecto.save(update_fields=['estado'])
-                    sleep(0.1)  # El servidor SMTP tiene un control de flujo de 600 mensajes por minuto
             except Exception as err:  # smtplib.SMTPAuthenticationError etc
                 messages.warning(
                     request,
@@ -2716,7 +2747,6 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                     if variante == '_provisional':
                         proyecto.estado = 'APROBADO'
                         proyecto.save(update_fields=['estado'])
-                    sleep(0.1)  # El servidor SMTP tiene un control de flujo de 600 mensajes por minuto
             except Exception as err:  # smtplib.SMTPAuthenticationError etc
                 messages.warning(
                     request,
@@ -2731,7 +2761,7 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
             proyectos_denegados = (
                 Proyecto.objects.filter(convocatoria__id=self.kwargs['anyo'])
                 .filter(aceptacion_comision=False)
-                .all()
+                .select_related('programa', 'coordinador')
             )
             try:
                 for proyecto in proyectos_denegados:
@@ -2740,7 +2770,6 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                     if variante == '_provisional':
                         proyecto.estado = 'DENEGADO'
                         proyecto.save(update_fields=['estado'])
-                    sleep(0.1)  # El servidor SMTP tiene un control de flujo de 600 mensajes por minuto
             except Exception as err:  # smtplib.SMTPAuthenticationError etc
                 messages.warning(
                     request,
@@ -2751,6 +2780,9 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                     % {'err': err},
                 )
 
+        # Los mensajes se han encolado; se envían en segundo plano respetando el límite del SMTP.
+        programar_envio()
+
         if notificar_aceptados:
             if variante == '_provisional':
                 convocatoria.notificada_resolucion_provisional = True
@@ -2763,18 +2795,29 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
             grupos_enviados.append(str(_('proyectos aprobados')))
         if notificar_denegados:
             grupos_enviados.append(str(_('proyectos denegados')))
-        messages.success(request, _('Se han enviado las notificaciones a los %s.') % ' y '.join(grupos_enviados))
+        messages.success(
+            request,
+            mark_safe(
+                _(
+                    'Se han encolado las notificaciones a los %(grupos)s. Puede seguir su envío'
+                    ' en el <a href="%(url)s">estado de los correos</a>.'
+                )
+                % {
+                    'grupos': ' y '.join(grupos_enviados),
+                    'url': reverse('correos_estado', args=[convocatoria.id]),
+                }
+            ),
+        )
         return redirect('evaluaciones_table', anyo=self.kwargs.get('anyo'))
 
     def _enviar_notificaciones(self, proyecto, plantilla):
         # emails_coordinadores = [c.email for c in proyecto.get_coordinadores()]
         # gestores = Group.objects.get(name='Gestores').user_set.all()
         # emails_gestores = [gestor.email for gestor in gestores]
-        send_templated_mail(
-            template_name=plantilla,
-            from_email=None,  # settings.DEFAULT_FROM_EMAIL
-            recipient_list=(proyecto.coordinador.email,),
-            context={
+        encolar_correo(
+            plantilla,
+            (proyecto.coordinador.email,),
+            {
                 'proyecto': proyecto,
                 'coordinador': proyecto.coordinador,
                 'site_url': get_config('SITE_URL'),
@@ -2782,7 +2825,58 @@ class ProyectosNotificarView(LoginRequiredMixin, PermissionRequiredMixin, Redire
                 'vicerrector': get_config('VICERRECTOR').strip('"'),
             },
             cc=(get_config('DEFAULT_FROM_EMAIL'),),  # Enviar copia al vicerrectorado
+            proyecto=proyecto,
+            enviar=False,  # Se programa un único envío al final de `post`.
+        )
+
+
+class CorreosEstadoView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
+    """Muestra el estado de envío de los correos encolados de una convocatoria."""
+
+    permission_required = 'indo.listar_evaluaciones'
+    permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
+    template_name = 'gestion/correos_estado.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        anyo = self.kwargs['anyo']
+        correos = Correo.objects.filter(convocatoria_id=anyo)
+        num_por_estado = dict(
+            correos.values_list('estado').annotate(num=Count('id')).order_by()
         )
+        context.update(
+            {
+                'anyo': anyo,
+                'num_por_estado': {
+                    etiqueta: num_por_estado.get(estado, 0)
+                    for estado, etiqueta in Correo.Estado.choices
+                },
+                'correos_con_error': correos.exclude(estado=Correo.Estado.ENVIADO)
+                .exclude(error=None)
+                .select_related('proyecto'),
+            }
+        )
+        return context
+
+
+class CorreosReintentarView(LoginRequiredMixin, PermissionRequiredMixin, RedirectView):
+    """Vuelve a encolar los correos fallidos de una convocatoria."""
+
+    permission_required = 'indo.listar_evaluaciones'
+    permission_denied_message = _('Sólo los gestores pueden acceder a esta página.')
+
+    def get_redirect_url(self, *args, **kwargs):
+        return reverse_lazy('correos_estado', kwargs={'anyo': kwargs.get('anyo')})
+
+    def post(self, request, *args, **kwargs):
+        num = Correo.objects.filter(
+            convocatoria_id=self.kwargs['anyo'], estado=Correo.Estado.FALLIDO
+        ).update(estado=Correo.Estado.PENDIENTE, intentos=0, proximo_intento=None)
+        programar_envio()
+        messages.success(
+            request, _('Se han vuelto a encolar %(num)d correos.') % {'num': num}
+        )
+        return super().post(request, *args, **kwargs)
 
 
 class ProyectoTableView(LoginRequiredMixin, PermissionRequiredMixin, PagedFilteredTableView):
@@ -2820,7 +2914,6 @@ class ProyectoTableView(LoginRequiredMixin, PermissionRequiredMixin, PagedFilter
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs.get('anyo')
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -2849,34 +2942,20 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
         proyecto_id = kwargs.get('pk')
         proyecto = Proyecto.objects.get(pk=proyecto_id)
 
-        num_equipos = self.request.user.get_num_equipos(proyecto.convocatoria_id)
-        num_max_equipos = proyecto.convocatoria.num_max_equipos
-
         # Comprobamos si, al presentar este proyecto, se excede el número máximo de coordinaciones
-        num_coordinaciones_presentadas = (
-            ParticipanteProyecto.objects.filter(
-                usuario=self.request.user,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria=proyecto.convocatoria,
-            )
-            .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-            .exclude(proyecto__pk=proyecto.pk)  # Excluimos este mismo proyecto
-            .exclude(proyecto__programa__nombre_corto='PIPOUZ')  # Los PIPOUZ no computan
-            .count()
+        # (sin contar este mismo proyecto).  Los PIPOUZ no tienen límite de coordinación.
+        cupo = CupoUsuario.get(
+            request.user, proyecto.convocatoria, excluir_proyecto_id=proyecto.pk, request=request
         )
-        if (
-            proyecto.convocatoria.num_max_coordinaciones is not None
-            and proyecto.programa.nombre_corto != 'PIPOUZ'  # Los PIPOUZ no tienen límite de coordinación
-            and num_coordinaciones_presentadas
-            >= proyecto.convocatoria.num_max_coordinaciones
-        ):
+        num_max_equipos = cupo.max_equipos
+        if proyecto.programa.nombre_corto != 'PIPOUZ' and cupo.limite_coordinaciones_alcanzado:
             messages.error(
                 request,
                 _('No puede presentar esta solicitud porque ya ha alcanzado el número máximo de proyectos coordinados.'),
             )
             return super().post(request, *args, **kwargs)
 
-        if num_equipos >= num_max_equipos:
+        if cupo.limite_equipos_alcanzado:
             messages.error(
                 request,
                 _(
@@ -2889,7 +2968,7 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
             )
             return super().post(request, *args, **kwargs)
 
-        if request.user.get_colectivo_principal() == 'ADS' and proyecto.ayuda != 0:
+        if request.user.colectivo_principal == 'ADS' and proyecto.ayuda != 0:
             messages.error(
                 request,
                 _(
@@ -2943,12 +3022,14 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
     def _enviar_invitaciones(self, request, proyecto):
         """Envía un mensaje a cada uno de los invitados al proyecto."""
         try:
-            for invitado in proyecto.participantes.filter(tipo_participacion='invitado'):
-                send_templated_mail(
-                    template_name='invitacion',
-                    from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                    recipient_list=[invitado.usuario.email],
-                    context={
+            invitados = proyecto.participantes.filter(
+                tipo_participacion='invitado'
+            ).select_related('usuario')
+            for invitado in invitados:
+                encolar_correo(
+                    'invitacion',
+                    [invitado.usuario.email],
+                    {
                         'nombre_coordinador': request.user.full_name,
                         'nombre_invitado': invitado.usuario.full_name,
                         'sexo_invitado': invitado.usuario.sexo,
@@ -2958,8 +3039,10 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
                         'descripcion_proyecto': proyecto.descripcion_txt,
                         'site_url': settings.SITE_URL,
                     },
+                    proyecto=proyecto,
+                    enviar=False,
                 )
-                sleep(0.1)  # Tiene que pasar un mínimo de 100ms entre un mensaje y el siguiente
+            programar_envio()
         except Exception as err:  # smtplib.SMTPAuthenticationError etc
             messages.warning(
                 request,
@@ -2985,11 +3068,10 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
             return
 
         try:
-            send_templated_mail(
-                template_name='solicitud_visto_bueno_centro',
-                from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                recipient_list=[proyecto.centro.email_decano],
-                context={
+            encolar_correo(
+                'solicitud_visto_bueno_centro',
+                [proyecto.centro.email_decano],
+                {
                     'nombre_coordinador': request.user.full_name,
                     'nombre_decano': proyecto.centro.nombre_decano,
                     'tratamiento_decano': proyecto.centro.tratamiento_decano,
@@ -2999,6 +3081,7 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
                     'descripcion_proyecto': proyecto.descripcion_txt,
                     'site_url': settings.SITE_URL,
                 },
+                proyecto=proyecto,
             )
         except Exception as err:  # smtplib.SMTPAuthenticationError etc
             messages.warning(
@@ -3024,11 +3107,10 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
         ]
 
         try:
-            send_templated_mail(
-                template_name='solicitud_visto_bueno_estudio',
-                from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                recipient_list=email_coordinadores_estudio,
-                context={
+            encolar_correo(
+                'solicitud_visto_bueno_estudio',
+                email_coordinadores_estudio,
+                {
                     'nombre_coordinador': request.user.full_name,
                     'titulo_proyecto': proyecto.titulo,
                     'programa_proyecto': f'{proyecto.programa.nombre_corto} '
@@ -3036,6 +3118,7 @@ class ProyectoPresentarView(LoginRequiredMixin, ChecksMixin, RedirectView):
                     'descripcion_proyecto': proyecto.descripcion_txt,
                     'site_url': settings.SITE_URL,
                 },
+                proyecto=proyecto,
             )
         except Exception as err:  # smtplib.SMTPAuthenticationError etc
             messages.warning(
@@ -3190,16 +3273,17 @@ class ProyectoUpdateFieldView(LoginRequiredMixin, ChecksMixin, UpdateView):
 
         try:
             for destinatario in destinatarios:
-                send_templated_mail(
-                    template_name='cierre_proyecto',
-                    from_email=None,  # settings.DEFAULT_FROM_EMAIL
-                    recipient_list=[destinatario.email],
-                    context={
+                encolar_correo(
+                    'cierre_proyecto',
+                    [destinatario.email],
+                    {
                         'destinatario': destinatario,
                         'proyecto': proyecto,
                     },
+                    proyecto=proyecto,
+                    enviar=False,
                 )
-                sleep(0.1)  # Tiene que pasar un mínimo de 100ms entre un mensaje y el siguiente
+            programar_envio()
         except Exception as err:  # smtplib.SMTPAuthenticationError etc
             messages.warning(
                 request,
@@ -3463,7 +3547,7 @@ class ProyectoUpdateFieldView(LoginRequiredMixin, ChecksMixin, UpdateView):
                 ayuda_solicitada = cleaned_data.get('ayuda', 0)
                 if (
                     ayuda_solicitada > 0
-                    and self.instance.coordinador.get_colectivo_principal() == 'ADS'
+                    and self.instance.coordinador.colectivo_principal == 'ADS'
                 ):
                     self.add_error(
                         'ayuda',
@@ -3601,7 +3685,6 @@ class ProyectosAceptadosCentrosListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs['anyo']
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         return context
 
     def get_queryset(self):
@@ -3629,7 +3712,6 @@ class ProyectosAceptadosTableView(ExportMixin, PagedFilteredTableView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['anyo'] = self.kwargs['anyo']
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         academico_id_nk = self.request.GET.get('proyecto__centro__academico_id_nk', None)
         if academico_id_nk:
             try:
@@ -3641,12 +3723,7 @@ class ProyectosAceptadosTableView(ExportMixin, PagedFilteredTableView):
 
     def get_queryset(self):
         return (
-            ParticipanteProyecto.objects.select_related('proyecto')
-            .select_related('usuario')
-            .select_related('proyecto__programa')
-            .select_related('proyecto__linea')
-            .select_related('proyecto__centro')
-            .filter(proyecto__convocatoria_id=self.kwargs['anyo'])
+            ParticipanteProyecto.objects.filter(proyecto__convocatoria_id=self.kwargs['anyo'])
             .filter(proyecto__aceptacion_coordinador=True)
             .filter(tipo_participacion_id='coordinador')
             .order_by(
@@ -3662,62 +3739,51 @@ class ProyectosUsuarioView(LoginRequiredMixin, ChecksMixin, TemplateView):
 
     def get(self, request, *args, **kwargs):
         # `LOGIN_URL` usa el año actual, pero la convocatoria sale a mitad de año
-        convocatoria = get_object_or_None(Convocatoria, pk=kwargs['anyo'])
-        if not convocatoria:
+        self.convocatoria = get_convocatoria(kwargs['anyo'])
+        if not self.convocatoria:
             ultima_convocatoria = Convocatoria.get_ultima()
             return redirect('mis_proyectos', ultima_convocatoria.id)
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         usuario = self.request.user
-        anyo = self.kwargs['anyo']
+        convocatoria = self.convocatoria
         context = super().get_context_data(**kwargs)
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
+        context['convocatoria'] = convocatoria
 
-        proyectos_coordinados = (
-            Proyecto.objects.filter(
-                convocatoria__id=anyo,
-                participantes__usuario=usuario,
-                participantes__tipo_participacion_id__in=['coordinador', 'coordinador_2'],
-            )
-            .exclude(estado='ANULADO')
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-            .all()
+        listados = get_mis_proyectos(
+            usuario.id, convocatoria.id, lambda: self.get_listados(usuario, convocatoria)
         )
-        proyectos_participados = (
-            Proyecto.objects.filter(
-                convocatoria__id=anyo,
-                participantes__usuario=usuario,
-                participantes__tipo_participacion_id='participante',
-            )
-            .exclude(estado='ANULADO')
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-            .all()
-        )
-        proyectos_invitado = (
-            Proyecto.objects.filter(
-                convocatoria__id=anyo,
-                participantes__usuario=usuario,
-                participantes__tipo_participacion_id='invitado',
-            )
-            .exclude(estado__in=['BORRADOR', 'ANULADO'])
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-            .all()
-        )
-        proyectos_colaborados = (
-            Proyecto.objects.filter(
-                convocatoria__id=anyo,
-                participantes__usuario=usuario,
-                participantes__tipo_participacion_id='colaborador',
-            )
-            .exclude(estado__in=['BORRADOR', 'ANULADO'])
-            .order_by('programa__nombre_corto', 'linea__nombre', 'titulo')
-            .all()
+        cupo = listados.pop('cupo')
+        context.update(listados)
+
+        context['permitir_solicitar'] = (
+            self.es_pas_o_pdi() and date.today() <= convocatoria.fecha_max_solicitudes
         )
 
+        # Comprobamos si el usuario ha alcanzado el número máximo de proyectos coordinados
+        context['limite_coordinaciones_alcanzado'] = cupo.limite_coordinaciones_alcanzado
+        context['num_coordinaciones_presentadas'] = cupo.coordinaciones
+        context['num_equipos_participados'] = cupo.equipos
+
+        if context['limite_coordinaciones_alcanzado']:
+            context['permitir_solicitar'] = False
+
+        return context
+
+    @classmethod
+    def get_listados(cls, usuario, convocatoria) -> dict:
+        """Devuelve los listados de proyectos del usuario y su cupo, que se guardan en caché."""
+        anyo = convocatoria.id
+        (
+            proyectos_coordinados,
+            proyectos_participados,
+            proyectos_invitado,
+            proyectos_colaborados,
+        ) = cls.get_proyectos_vinculados(usuario, anyo)
+
         # No mostrar si la Comisión ha aprobado o no el proyecto
         # hasta que se publique la resolución.
-        convocatoria = get_object_or_None(Convocatoria, pk=kwargs['anyo'])
         if not convocatoria.notificada_resolucion_provisional:
 
             def enmascara_estado(p):
@@ -3729,60 +3795,91 @@ class ProyectosUsuarioView(LoginRequiredMixin, ChecksMixin, TemplateView):
             proyectos_invitado = [enmascara_estado(p) for p in proyectos_invitado]
             proyectos_colaborados = [enmascara_estado(p) for p in proyectos_colaborados]
 
-        context['convocatoria'] = convocatoria
-        context['proyectos_coordinados'] = proyectos_coordinados
-        context['proyectos_participados'] = proyectos_participados
-        context['proyectos_invitado'] = proyectos_invitado
-        context['proyectos_colaborados'] = proyectos_colaborados
+        # Proyectos que requieren el visto bueno del usuario como decano/director del centro
+        # o como coordinador del plan de estudios, con una sola consulta.
+        proyectos_visto_bueno = cls.get_proyectos_visto_bueno(usuario, anyo)
 
-        context['permitir_solicitar'] = (
-            self.es_pas_o_pdi() and date.today() <= convocatoria.fecha_max_solicitudes
-        )
+        return {
+            'proyectos_coordinados': proyectos_coordinados,
+            'proyectos_participados': proyectos_participados,
+            'proyectos_invitado': proyectos_invitado,
+            'proyectos_colaborados': proyectos_colaborados,
+            'proyectos_centros_dirigidos': [
+                p
+                for p in proyectos_visto_bueno
+                if p.programa.requiere_visto_bueno_centro and p.usuario_es_decano
+            ],
+            'proyectos_estudios_coordinados': [
+                p
+                for p in proyectos_visto_bueno
+                if p.programa.requiere_visto_bueno_estudio and p.usuario_es_coordinador_estudio
+            ],
+            'cupo': CupoUsuario(usuario, convocatoria),
+        }
 
-        # Comprobamos si el usuario ha alcanzado el número máximo de proyectos coordinados
-        num_coordinaciones_presentadas = (
+    @staticmethod
+    def get_proyectos_vinculados(usuario, anyo) -> tuple[list, list, list, list]:
+        """Devuelve los proyectos coordinados, participados, invitado y colaborados del usuario.
+
+        Se obtienen con una sola consulta de las vinculaciones del usuario, que se reparten por
+        tipo.  Las invitaciones y colaboraciones no son efectivas hasta que se presenta la
+        solicitud.
+        """
+        tipos = ('coordinador', 'participante', 'invitado', 'colaborador')
+        vinculaciones = (
             ParticipanteProyecto.objects.filter(
                 usuario=usuario,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria=convocatoria,
+                proyecto__convocatoria_id=anyo,
+                tipo_participacion_id__in=tipos + ('coordinador_2',),
+            )
+            .exclude(proyecto__estado='ANULADO')
+            .select_related('proyecto__programa', 'proyecto__linea', 'proyecto__coordinador')
+            .order_by(
+                'proyecto__programa__nombre_corto', 'proyecto__linea__nombre', 'proyecto__titulo'
             )
-            .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-            .exclude(proyecto__programa__nombre_corto='PIPOUZ')
-            .count()
-        )
-        context['limite_coordinaciones_alcanzado'] = (
-            convocatoria.num_max_coordinaciones is not None
-            and num_coordinaciones_presentadas >= convocatoria.num_max_coordinaciones
         )
-        context['num_coordinaciones_presentadas'] = num_coordinaciones_presentadas
-        context['num_equipos_participados'] = usuario.get_num_equipos(convocatoria.id)
-
-        if context['limite_coordinaciones_alcanzado']:
-            context['permitir_solicitar'] = False
+        proyectos = {tipo: [] for tipo in tipos}
+        for vinculacion in vinculaciones:
+            proyecto = vinculacion.proyecto
+            tipo = vinculacion.tipo_participacion_id.removesuffix('_2')  # coordinador_2
+            if tipo in ('invitado', 'colaborador') and proyecto.estado == 'BORRADOR':
+                continue
+            proyectos[tipo].append(proyecto)
+        return tuple(proyectos[tipo] for tipo in tipos)
+
+    @staticmethod
+    def get_proyectos_visto_bueno(usuario, anyo) -> list[Proyecto]:
+        """Devuelve los proyectos de la convocatoria a los que el usuario puede dar el visto bueno.
+
+        Cada proyecto indica si el usuario es decano/director de su centro y si es coordinador
+        de algún plan de su estudio.
+        """
+        # Los NIP de los decanos y coordinadores de plan son numéricos; otros usuarios nunca.
+        if not usuario.username.isdigit():
+            return []
+        nip_usuario = int(usuario.username)
 
-        try:
-            nip_usuario = int(usuario.username)
-        except ValueError:
-            nip_usuario = 0
-
-        centros_dirigidos = Centro.objects.filter(nip_decano=nip_usuario).all()
-        if centros_dirigidos:
-            context['proyectos_centros_dirigidos'] = Proyecto.objects.filter(
-                convocatoria_id=anyo,
-                programa__requiere_visto_bueno_centro=True,
-                centro__in=centros_dirigidos,
-            ).all()
-
-        planes_coordinados = Plan.objects.filter(nip_coordinador=nip_usuario).all()
-        if planes_coordinados:
-            id_estudios_coordinados = {p.estudio_id for p in planes_coordinados}
-            context['proyectos_estudios_coordinados'] = Proyecto.objects.filter(
-                convocatoria_id=anyo,
-                programa__requiere_visto_bueno_estudio=True,
-                estudio_id__in=id_estudios_coordinados,
+        return list(
+            Proyecto.objects.filter(convocatoria_id=anyo)
+            .annotate(
+                usuario_es_decano=Exists(
+                    Centro.objects.filter(pk=OuterRef('centro_id'), nip_decano=nip_usuario)
+                ),
+                usuario_es_coordinador_estudio=Exists(
+                    Plan.objects.filter(
+                        estudio_id=OuterRef('estudio_id'), nip_coordinador=nip_usuario
+                    )
+                ),
             )
-
-        return context
+            .filter(
+                Q(programa__requiere_visto_bueno_centro=True, usuario_es_decano=True)
+                | Q(
+                    programa__requiere_visto_bueno_estudio=True,
+                    usuario_es_coordinador_estudio=True,
+                )
+            )
+            .select_related('programa', 'linea', 'coordinador')
+        )
 
     # Para usar `es_pas_o_pdi()` necesitamos `ChecksMixin`,
     # lo que nos obliga a implementar `test_func()`.
@@ -3802,7 +3899,6 @@ class ProyectosDeUnUsuarioFormView(LoginRequiredMixin, PermissionRequiredMixin,
         context.update(
             {
                 'anyo': self.kwargs.get('anyo'),
-                'convocatorias': Convocatoria.objects.order_by('-id').all()[:5],
                 'form': ProyectosDeUnUsuarioForm(),
             }
         )
@@ -3850,7 +3946,6 @@ class ProyectosDeUnUsuarioView(LoginRequiredMixin, PermissionRequiredMixin, Temp
         usuario = get_object_or_404(User, id=self.kwargs.get('usuario_id'))
         convocatoria = get_object_or_404(Convocatoria, pk=self.kwargs.get('anyo'))
 
-        context['convocatorias'] = Convocatoria.objects.order_by('-id').all()[:5]
         context['convocatoria'] = convocatoria
         context['usuario'] = usuario
         context['vinculaciones'] = usuario.vinculaciones.filter(
@@ -3858,16 +3953,9 @@ class ProyectosDeUnUsuarioView(LoginRequiredMixin, PermissionRequiredMixin, Temp
         )
 
         # Estadísticas de participación
-        context['num_coordinaciones_presentadas'] = (
-            ParticipanteProyecto.objects.filter(
-                usuario=usuario,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria=convocatoria,
-            )
-            .exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO'])
-            .count()
-        )
-        context['num_equipos_participados'] = usuario.get_num_equipos(convocatoria.id)
+        cupo = CupoUsuario.get(usuario, convocatoria, request=self.request)
+        context['num_coordinaciones_presentadas'] = cupo.coordinaciones
+        context['num_equipos_participados'] = cupo.equipos
 
         return context
 
@@ -3887,7 +3975,6 @@ from django.views.generic import TemplateView
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.urls import reverse
-from django.template.loader import render_to_string
 from .models import Convocatoria, Proyecto
 import logging
 
@@ -3899,6 +3986,8 @@ def get_config(key):
     return getattr(settings, key, '')
 
 class ProyectosNotificarPreviewView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
+    """Muestra un ejemplo de cada notificación de la resolución y sus destinatarios."""
+
     template_name = 'gestion/proyecto/notificar_preview.html'
     permission_required = 'indo.listar_evaluaciones'
 
@@ -3912,7 +4001,7 @@ class ProyectosNotificarPreviewView(LoginRequiredMixin, PermissionRequiredMixin,
         # Read selection from previous page
         grupo_aceptados = self.request.GET.get('grupo_aceptados') == '1'
         grupo_denegados = self.request.GET.get('grupo_denegados') == '1'
-        
+
         # Default behavior if navigated directly
         if 'grupo_aceptados' not in self.request.GET and 'grupo_denegados' not in self.request.GET:
             grupo_aceptados = True
@@ -3923,130 +4012,119 @@ class ProyectosNotificarPreviewView(LoginRequiredMixin, PermissionRequiredMixin,
 
         if not convocatoria.notificada_resolucion_provisional:
             variante = '_provisional'
+            campo_ayuda = 'ayuda_provisional'
         else:
             variante = '_definitiva'
+            campo_ayuda = 'ayuda_definitiva'
 
-        # Fetch Aprobados only if selected
-        num_con_dotacion = 0
-        num_sin_dotacion = 0
-        total_a_notificar = 0
-        destinatarios_con_dotacion = []
-        destinatarios_sin_dotacion = []
-        mail_con_dotacion = None
-        mail_sin_dotacion = None
-
-        if grupo_aceptados:
-            if variante == '_provisional':
-                proyectos_aprobados = Proyecto.objects.filter(convocatoria__id=anyo, aceptacion_comision=True)
-                proyectos_con_dotacion = proyectos_aprobados.filter(ayuda_provisional__gt=0)
-                proyectos_sin_dotacion = proyectos_aprobados.filter(ayuda_provisional=0)
+        # Los proyectos resueltos, con su programa y coordinadores, en un número fijo de consultas.
+        proyectos = (
+            Proyecto.objects.filter(convocatoria_id=anyo, aceptacion_comision__isnull=False)
+            .select_related('convocatoria', 'programa', 'coordinador')
+            .order_by('id')
+        )
+        grupos = {}  # plantilla -> lista de proyectos
+        for proyecto in proyectos:
+            if proyecto.aceptacion_comision:
+                if not grupo_aceptados:
+                    continue
+                # Como en `ProyectosNotificarView`, no se notifican los que no tienen ayuda.
+                ayuda = getattr(proyecto, campo_ayuda)
+                if ayuda is None:
+                    continue
+                if ayuda > 0:
+                    prefijo = 'notificacion_con_dotacion'
+                else:
+                    prefijo = 'notificacion_sin_dotacion'
             else:
-                proyectos_aprobados = Proyecto.objects.filter(convocatoria__id=anyo, aceptacion_comision=True)
-                proyectos_con_dotacion = proyectos_aprobados.filter(ayuda_definitiva__gt=0)
-                proyectos_sin_dotacion = proyectos_aprobados.filter(ayuda_definitiva=0)
-
-            num_con_dotacion = proyectos_con_dotacion.count()
-            num_sin_dotacion = proyectos_sin_dotacion.count()
-            total_a_notificar = num_con_dotacion + num_sin_dotacion
-            destinatarios_con_dotacion = [p.coordinador.email for p in proyectos_con_dotacion]
-            destinatarios_sin_dotacion = [p.coordinador.email for p in proyectos_sin_dotacion]
-
-            # Generate a preview email for Dotacion
-            if proyectos_con_dotacion.exists():
-                p_con = proyectos_con_dotacion.first()
-                try:
-                    from indo.views import get_config
-                    rendered = render_to_string('templated_email/notificacion_con_dotacion' + variante + '.email', {
-                        'proyecto': p_con,
-                        'coordinador': p_con.coordinador,
-                        'site_url': get_config('SITE_URL'),
-                        'ayuda_url': get_config('SITE_URL') + reverse('ayuda'),
-                        'vicerrector': get_config('VICERRECTOR').strip('"'),
-                    })
-                    subject = rendered.split('{% block subject %}')[1].split('{% endblock %}')[0].strip() if '{% block subject %}' in rendered else ''
-                    body = rendered.split('{% block plain %}')[1].split('{% endblock %}')[0].strip() if '{% block plain %}' in rendered else ''
-                    if not subject and not body:
-                        subject = "Resolución provisional" if variante == "_provisional" else "Resolución definitiva"
-                        body = rendered
-                    from django.utils.html import escape
-                    mail_con_dotacion = {'subject': escape(subject), 'body': escape(body)}
-                except Exception as e:
-                    logger.error(f"Error rendering dotacion preview: {e}")
-
-            # Generate a preview email for Sin Dotacion
-            if proyectos_sin_dotacion.exists():
-                p_sin = proyectos_sin_dotacion.first()
-                try:
-                    from indo.views import get_config
-                    rendered = render_to_string('templated_email/notificacion_sin_dotacion' + variante + '.email', {
-                        'proyecto': p_sin,
-                        'coordinador': p_sin.coordinador,
-                        'site_url': get_config('SITE_URL'),
-                        'ayuda_url': get_config('SITE_URL') + reverse('ayuda'),
-                        'vicerrector': get_config('VICERRECTOR').strip('"'),
-                    })
-                    subject = rendered.split('{% block subject %}')[1].split('{% endblock %}')[0].strip() if '{% block subject %}' in rendered else ''
-                    body = rendered.split('{% block plain %}')[1].split('{% endblock %}')[0].strip() if '{% block plain %}' in rendered else ''
-                    if not subject and not body:
-                        subject = "Resolución provisional" if variante == "_provisional" else "Resolución definitiva"
-                        body = rendered
-                    from django.utils.html import escape
-                    mail_sin_dotacion = {'subject': escape(subject), 'body': escape(body)}
-                except Exception as e:
-                    logger.error(f"Error rendering sin dotacion preview: {e}")
-
-        # Fetch Denegados only if selected
-        num_denegados = 0
-        destinatarios_denegados = []
-        mails_denegados = []
-
-        if grupo_denegados:
-            proyectos_denegados = Proyecto.objects.filter(convocatoria__id=anyo, aceptacion_comision=False)
-            num_denegados = proyectos_denegados.count()
-            destinatarios_denegados = [p.coordinador.email for p in proyectos_denegados]
-
-            # Generate preview emails for all Denegados
-            from indo.views import get_config
-            for p_den in proyectos_denegados:
-                try:
-                    prefix = 'notificacion_negativa_prauz' if p_den.programa.nombre_corto == 'PRAUZ' else 'notificacion_negativa'
-                    rendered = render_to_string('templated_email/' + prefix + variante + '.email', {
-                        'proyecto': p_den,
-                        'coordinador': p_den.coordinador,
-                        'site_url': get_config('SITE_URL'),
-                        'ayuda_url': get_config('SITE_URL') + reverse('ayuda'),
-                        'vicerrector': get_config('VICERRECTOR').strip('"'),
-                    })
-                    subject = rendered.split('{% block subject %}')[1].split('{% endblock %}')[0].strip() if '{% block subject %}' in rendered else ''
-                    body = rendered.split('{% block plain %}')[1].split('{% endblock %}')[0].strip() if '{% block plain %}' in rendered else ''
-                    if not subject and not body:
-                        subject = "Resolución provisional" if variante == "_provisional" else "Resolución definitiva"
-                        body = rendered
-                    from django.utils.html import escape
-                    mails_denegados.append({
-                        'proyecto_id': p_den.id,
-                        'proyecto_titulo': p_den.titulo,
-                        'destinatario': p_den.coordinador.email,
-                        'subject': escape(subject),
-                        'body': escape(body)
-                    })
-                except Exception as e:
-                    logger.error(f"Error rendering denegado preview for project {p_den.id}: {e}")
+                if not grupo_denegados:
+                    continue
+                if proyecto.programa.nombre_corto == 'PRAUZ':
+                    prefijo = 'notificacion_negativa_prauz'
+                else:
+                    prefijo = 'notificacion_negativa'
+            grupos.setdefault(prefijo + variante, []).append(proyecto)
+
+        previas = []
+        for prefijo, titulo, estilo in (
+            ('notificacion_con_dotacion', _('Proyectos con dotación económica'), 'success'),
+            ('notificacion_sin_dotacion', _('Proyectos sin dotación económica'), 'secondary'),
+            ('notificacion_negativa', _('Proyectos denegados'), 'danger'),
+            ('notificacion_negativa_prauz', _('Proyectos PRAUZ denegados'), 'danger'),
+        ):
+            plantilla = prefijo + variante
+            if plantilla in grupos:
+                previa = self._get_previa(anyo, plantilla, grupos[plantilla])
+                previa.update(titulo=titulo, estilo=estilo)
+                previas.append(previa)
+
+        def num_proyectos(*prefijos):
+            return sum(len(grupos.get(prefijo + variante, ())) for prefijo in prefijos)
+
+        context['previas'] = previas
+        context['num_con_dotacion'] = num_proyectos('notificacion_con_dotacion')
+        context['num_sin_dotacion'] = num_proyectos('notificacion_sin_dotacion')
+        context['total_a_notificar'] = num_proyectos(
+            'notificacion_con_dotacion', 'notificacion_sin_dotacion'
+        )
+        context['num_denegados'] = num_proyectos(
+            'notificacion_negativa', 'notificacion_negativa_prauz'
+        )
+        return context
 
-        context['num_con_dotacion'] = num_con_dotacion
-        context['num_sin_dotacion'] = num_sin_dotacion
-        context['total_a_notificar'] = total_a_notificar
-        context['num_denegados'] = num_denegados
+    @staticmethod
+    def _get_previa(anyo, plantilla, proyectos):
+        """Previsualiza el mensaje para el primer proyecto del grupo y resume sus destinatarios.
 
-        context['destinatarios_con_dotacion'] = destinatarios_con_dotacion
-        context['destinatarios_sin_dotacion'] = destinatarios_sin_dotacion
-        context['destinatarios_denegados'] = destinatarios_denegados
+        La previsualización se guarda en la caché por convocatoria y plantilla (que incluye la
+        variante provisional o definitiva), para no tener que renderizarla de nuevo al volver.
+        La clave incluye un resumen de los datos del proyecto de ejemplo, de su convocatoria y de
+        su coordinador, de modo que corregirlos invalida la previsualización.
+        """
+        ejemplo = proyectos[0]
+        datos = [
+            [getattr(objeto, campo.attname) for campo in objeto._meta.concrete_fields]
+            for objeto in (ejemplo, ejemplo.convocatoria, ejemplo.coordinador)
+            if objeto is not None
+        ]
+        resumen = hashlib.sha256(repr(datos).encode()).hexdigest()
+        mail = None
+        try:
+            mail = previsualizar_correo(
+                plantilla,
+                {
+                    'proyecto': ejemplo,
+                    'coordinador': ejemplo.coordinador,
+                    'site_url': get_config('SITE_URL'),
+                    'ayuda_url': get_config('SITE_URL') + reverse('ayuda'),
+                    'vicerrector': get_config('VICERRECTOR').strip('"'),
+                },
+                clave=f'{anyo}:{ejemplo.id}:{resumen}',
+            )
+        except Exception as e:
+            logger.error(
+                'Error al previsualizar la plantilla %s con el proyecto %s: %s',
+                plantilla,
+                ejemplo.id,
+                e,
+            )
 
-        context['mail_con_dotacion'] = mail_con_dotacion
-        context['mail_sin_dotacion'] = mail_sin_dotacion
-        context['mails_denegados'] = mails_denegados
+        destinatarios = set()
+        sin_coordinador = []
+        for proyecto in proyectos:
+            coordinador = proyecto.coordinador
+            if coordinador and coordinador.email:
+                destinatarios.add(coordinador.email)
+            else:
+                sin_coordinador.append(proyecto)
 
-        return context
+        return {
+            'num': len(proyectos),
+            'ejemplo': ejemplo,
+            'mail': mail,
+            'destinatarios': sorted(destinatarios),
+            'sin_coordinador': sin_coordinador,
+        }
 
 
 class CambiarCoordinadorView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
@@ -4070,7 +4148,7 @@ class CambiarCoordinadorView(LoginRequiredMixin, PermissionRequiredMixin, FormVi
         nuevo_usuario = CustomUser.objects.get(username=nip)
         
         # Validar que no sea ya el coordinador
-        if proyecto.coordinador == nuevo_usuario:
+        if proyecto.coordinador_id == nuevo_usuario.id:
             form.add_error('nip_nuevo_coordinador', _('Este usuario ya es el coordinador del proyecto.'))
             return self.form_invalid(form)
 
@@ -4081,28 +4159,27 @@ class CambiarCoordinadorView(LoginRequiredMixin, PermissionRequiredMixin, FormVi
         
         # 2. Validaciones de límites
         # Límite de coordinaciones
-        if convocatoria.num_max_coordinaciones and proyecto.programa.nombre_corto != 'PIPOUZ':
-            num_coordinaciones = ParticipanteProyecto.objects.filter(
-                usuario=nuevo_usuario,
-                tipo_participacion__nombre__in=['coordinador', 'coordinador_2'],
-                proyecto__convocatoria=convocatoria
-            ).exclude(proyecto__estado__in=['BORRADOR', 'ANULADO', 'DENEGADO', 'RECHAZADO']).count()
-            
-            if num_coordinaciones >= convocatoria.num_max_coordinaciones:
-                form.add_error('nip_nuevo_coordinador', _('El usuario ha alcanzado el límite máximo de coordinaciones permitidas.'))
-                return self.form_invalid(form)
+        # En esta vista, un máximo de 0 coordinaciones equivale a no tener límite.
+        cupo = CupoUsuario.get(nuevo_usuario, convocatoria, request=self.request)
+        if (
+            cupo.max_coordinaciones
+            and proyecto.programa.nombre_corto != 'PIPOUZ'
+            and cupo.limite_coordinaciones_alcanzado
+        ):
+            form.add_error(
+                'nip_nuevo_coordinador',
+                _('El usuario ha alcanzado el límite máximo de coordinaciones permitidas.'),
+            )
+            return self.form_invalid(form)
                 
         # Límite de equipos (sólo si no estaba ya en el proyecto)
         if not vinculacion_existente:
-            num_equipos = nuevo_usuario.get_num_equipos(convocatoria.id)
-            if num_equipos >= convocatoria.num_max_equipos:
+            if cupo.limite_equipos_alcanzado:
                 form.add_error('nip_nuevo_coordinador', _('El usuario ha alcanzado el máximo de proyectos en los que puede participar.'))
                 return self.form_invalid(form)
 
             # Límite de participantes del proyecto
-            num_efectivos = proyecto.participantes.filter(tipo_participacion='participante').count()
-            num_invitados = proyecto.participantes.filter(tipo_participacion='invitado').count()
-            total_ocupado = num_efectivos + num_invitados
+            total_ocupado = proyecto.num_participantes + proyecto.num_invitados
             
             if convocatoria.num_max_participantes and total_ocupado >= convocatoria.num_max_participantes:
                 form.add_error(None, _('El proyecto ha alcanzado el límite máximo de participantes, no se puede añadir a un usuario externo como coordinador.'))
@@ -0,0 +1,152 @@
+"""Colas de tareas en segundo plano.
+
+Las tareas Huey se reparten en colas con nombre (véase `settings.COLAS_TAREAS`), cada una con su
+propio consumidor (`manage.py consumir_cola <cola>`) y su número de trabajadores, de modo que,
+p. ej., la generación de los PDF de las memorias no retrasa el envío de los correos.  Dentro de
+cada cola se ejecutan antes las tareas de mayor prioridad (opción `priority` de `tarea`).
+
+La cola `general` es `settings.HUEY`, la de `huey.contrib.djhuey`, y ejecuta las tareas
+periódicas.  Las colas con `resultados` guardan el resultado de sus tareas y marcan las que están
+en curso, para poder consultar su estado con `get_estado_tarea`.
+
+El backend de todas las colas se elige con `settings.HUEY_BACKEND`; `manage.py medir_colas` mide
+la latencia de las colas con carga.
+"""
+
+import time
+from collections.abc import Callable
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from huey import MemoryHuey, PriorityRedisHuey, SqliteHuey, signals
+from huey.api import Huey
+from huey.exceptions import TaskException
+
+# Señales con las que termina la ejecución de una tarea, con o sin éxito.
+_SENALES_FIN = (
+    signals.SIGNAL_COMPLETE,
+    signals.SIGNAL_ERROR,
+    signals.SIGNAL_CANCELED,
+    signals.SIGNAL_INTERRUPTED,
+    signals.SIGNAL_LOCKED,
+    signals.SIGNAL_TIMEOUT,
+)
+
+# Segundos tras los que una tarea que sigue marcada como en curso se da por interrumpida (p. ej.
+# porque el proceso que la ejecutaba murió sin emitir las señales de fin).
+DURACION_MAXIMA_TAREA = 15 * 60
+
+_colas: dict[str, Huey] = {}
+
+
+def _clave_en_curso(id_tarea: str) -> str:
+    return f'en-curso:{id_tarea}'
+
+
+def _registrar_estado(huey: Huey) -> None:
+    @huey.signal(signals.SIGNAL_EXECUTING)
+    def marcar_en_curso(signal, task, *args):
+        huey.put(_clave_en_curso(task.id), time.time())
+
+    @huey.signal(*_SENALES_FIN)
+    def desmarcar_en_curso(signal, task, *args):
+        huey.delete(_clave_en_curso(task.id))
+
+
+def crear_huey(nombre: str, backend: str, ubicacion: str, resultados: bool = True) -> Huey:
+    """Crea la cola indicada con el backend `sqlite`, `redis` o `memoria`.
+
+    Con `sqlite`, cada cola se guarda en el fichero `<nombre>.db` del directorio `ubicacion`;
+    con `redis`, `ubicacion` es la URL del servidor (Redis 5 o posterior, por las prioridades).
+    """
+    if backend == 'sqlite':
+        huey = SqliteHuey(
+            nombre, filename=str(Path(ubicacion) / f'{nombre}.db'), results=resultados
+        )
+    elif backend == 'redis':
+        huey = PriorityRedisHuey(nombre, url=ubicacion, results=resultados)
+    elif backend == 'memoria':
+        huey = MemoryHuey(nombre, results=resultados)
+    else:
+        raise ImproperlyConfigured(f'Backend de colas de tareas desconocido: {backend}')
+
+    if resultados:
+        _registrar_estado(huey)
+    return huey
+
+
+def get_cola(nombre: str) -> Huey:
+    """Devuelve la cola con el nombre indicado, creándola la primera vez."""
+    if nombre == 'general':
+        return settings.HUEY
+    if nombre not in _colas:
+        if nombre not in settings.COLAS_TAREAS:
+            raise ImproperlyConfigured(f'Cola de tareas desconocida: {nombre}')
+        _colas[nombre] = crear_huey(
+            nombre,
+            settings.HUEY_BACKEND,
+            settings.HUEY_LOCATION,
+            settings.COLAS_TAREAS[nombre]['resultados'],
+        )
+    return _colas[nombre]
+
+
+def set_inmediato(inmediato: bool) -> None:
+    """Ejecuta las tareas de todas las colas al encolarlas (p. ej. en las pruebas), o no."""
+    for nombre in settings.COLAS_TAREAS:
+        get_cola(nombre).immediate = inmediato
+
+
+def tarea(cola: str, **opciones) -> Callable:
+    """Decorador que define una tarea de la cola indicada.
+
+    Como `huey.contrib.djhuey.db_task`, cierra las conexiones a la BD caducadas antes y después
+    de ejecutar la tarea.  Las opciones (`priority`, `retries`...) se pasan a `Huey.task`.
+    """
+    huey = get_cola(cola)
+
+    def decorador(fn):
+        @wraps(fn)
+        def ejecutar(*args, **kwargs):
+            if not huey.immediate:
+                close_old_connections()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if not huey.immediate:
+                    close_old_connections()
+
+        envoltorio = huey.task(**opciones)(ejecutar)
+        envoltorio.call_local = fn
+        return envoltorio
+
+    return decorador
+
+
+def get_estado_tarea(cola: str, id_tarea: str) -> str:
+    """Devuelve el estado de una tarea de una cola con `resultados`.
+
+    Puede ser `pendiente`, `en curso`, `error` o `terminada`.  Las tareas que devuelven `None`
+    no guardan su resultado, así que siguen figurando como pendientes tras terminar.  Las que
+    llevan en curso más de `DURACION_MAXIMA_TAREA` segundos se consideran interrumpidas (`error`).
+    """
+    huey = get_cola(cola)
+    inicio = huey.get(_clave_en_curso(id_tarea), peek=True)
+    if inicio is not None:
+        if time.time() - inicio < DURACION_MAXIMA_TAREA:
+            return 'en curso'
+        huey.delete(_clave_en_curso(id_tarea))
+        return 'error'
+    try:
+        resultado = huey.result(id_tarea, preserve=True)
+    except TaskException:
+        return 'error'
+    return 'pendiente' if resultado is None else 'terminada'
+
+
+def olvidar_tarea(cola: str, id_tarea: str) -> None:
+    """Descarta el resultado guardado de la tarea, p. ej. antes de volver a encolarla."""
+    get_cola(cola).delete(id_tarea)
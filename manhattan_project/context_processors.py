@@ -1,6 +1,9 @@
 import os
 import subprocess
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from indo.cache import get_convocatorias_recientes
 
 # Variable global para cachear la versión y no ejecutar git/leer archivo en cada petición
 _APP_VERSION_CACHE = None
@@ -39,3 +42,11 @@ def entorno(request):
         'ENTORNO': settings.ENTORNO,
         'APP_VERSION': get_app_version()
     }
+
+
+def convocatorias(request):
+    """Últimas convocatorias, para el selector de convocatoria.
+
+    Se leen de la caché (véase `indo.cache`) sólo si la plantilla las usa.
+    """
+    return {'convocatorias': SimpleLazyObject(get_convocatorias_recientes)}
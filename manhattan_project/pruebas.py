@@ -0,0 +1,21 @@
+"""Ejecución de las pruebas (`manage.py test`)."""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Las pruebas no deben usar la caché configurada, que puede ser la de ficheros, compartida con el
+# servidor de desarrollo y que se conserva entre ejecuciones.
+CACHES_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """Ejecuta las pruebas con una caché en memoria, propia de cada ejecución."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._ajustes_cache = override_settings(CACHES=CACHES_PRUEBAS)
+        self._ajustes_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._ajustes_cache.disable()
+        super().teardown_test_environment(**kwargs)
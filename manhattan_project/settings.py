@@ -21,10 +21,8 @@ from datetime import date
 from pathlib import Path
 
 from django.urls import reverse_lazy
-from huey import SqliteHuey
 
-# from huey import RedisHuey
-# from redis import ConnectionPool
+from manhattan_project.colas import crear_huey
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -222,6 +220,7 @@ TEMPLATES = [
                 'social_django.context_processors.backends',
                 'social_django.context_processors.login_redirect',
                 'manhattan_project.context_processors.entorno',
+                'manhattan_project.context_processors.convocatorias',
             ]
         },
     }
@@ -266,6 +265,8 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = os.environ.get('EMAIL_PORT', 587)
 EMAIL_USE_LOCALTIME = True
 EMAIL_USE_TLS = True
+# Límite de envío del servidor SMTP, respetado por la cola de correo (`indo.mail`).
+EMAIL_MENSAJES_POR_MINUTO = int(os.environ.get('EMAIL_MENSAJES_POR_MINUTO', 600))
 
 # ADMIN
 # ------------------------------------------------------------------------------
@@ -516,6 +517,44 @@ WSDL_VINCULACIONES = os.environ.get('WSDL_VINCULACIONES')
 USER_VINCULACIONES = os.environ.get('USER_VINCULACIONES')
 PASS_VINCULACIONES = os.environ.get('PASS_VINCULACIONES')
 
+# Clientes de los web services SOAP (véase `accounts.soap`)
+SOAP_TIMEOUT = int(os.environ.get('SOAP_TIMEOUT', 10))  # segundos
+SOAP_CONEXIONES = int(os.environ.get('SOAP_CONEXIONES', 10))  # conexiones persistentes por WS
+# Caché de los WSDL compartida por todos los procesos (si está vacío, se guardan en memoria).
+SOAP_CACHE_WSDL = os.environ.get('SOAP_CACHE_WSDL', str(BASE_DIR / 'cola' / 'wsdl.db'))
+SOAP_DURACION_CACHE = int(os.environ.get('SOAP_DURACION_CACHE', 86400))  # segundos
+# Segundos durante los que los datos de un usuario obtenidos de Identidades se consideran al día,
+# y tras los cuales ya no se usan mientras se actualizan en segundo plano.
+IDENTIDAD_VIGENCIA = int(os.environ.get('IDENTIDAD_VIGENCIA', 3600))
+IDENTIDAD_VIGENCIA_MAXIMA = int(os.environ.get('IDENTIDAD_VIGENCIA_MAXIMA', 7 * 86400))
+
+# Caché compartida por todos los procesos (véase `indo.cache`).  `CACHE_BACKEND` puede ser
+# `ficheros`, `redis` (o un servidor compatible, como Valkey; requiere el paquete `redis`),
+# `memcached` (requiere `pymemcache`) o `memoria` (propia de cada proceso, no compartida).
+_BACKENDS_CACHE = {
+    'ficheros': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        str(BASE_DIR / 'cola' / 'cache'),
+    ),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'memoria': ('django.core.cache.backends.locmem.LocMemCache', 'manhattan'),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'ficheros')
+CACHES = {
+    'default': {
+        'BACKEND': _BACKENDS_CACHE[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', _BACKENDS_CACHE[CACHE_BACKEND][1]),
+        'KEY_PREFIX': 'manhattan',
+    }
+}
+if CACHE_BACKEND in ('ficheros', 'memoria'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRADAS', 10000))
+    }
+# Las pruebas usan su propia caché en memoria.
+TEST_RUNNER = 'manhattan_project.pruebas.EjecutorPruebas'
+
 # Titular actual del Vicerrectorado de Política Académica
 VICERRECTOR = os.environ.get('VICERRECTOR')
 # Titular actual de Secretaría General
@@ -523,10 +562,44 @@ SECRETARIO = os.environ.get('SECRETARIO')
 SECRETARIO_SEXO = os.environ.get('SECRETARIO_SEXO')
 
 
-# Tareas en segundo plano
-# pool = ConnectionPool(host='localhost', port=6379, max_connections=20)
-# HUEY = RedisHuey('manhattan', connection_pool=pool)
-HUEY = SqliteHuey(filename='cola/huey.db')
+# Tareas en segundo plano, repartidas en colas con su propio consumidor (véase
+# `manhattan_project.colas`).  `HUEY_BACKEND` puede ser `sqlite` (un fichero por cola en el
+# directorio `HUEY_LOCATION`), `redis` (o un servidor compatible, como Valkey; requiere el paquete
+# `redis`) o `memoria` (propia de cada proceso, sólo para pruebas y mediciones).
+_UBICACIONES_HUEY = {
+    'sqlite': str(BASE_DIR / 'cola'),
+    'redis': 'redis://127.0.0.1:6379/2',
+    'memoria': '',
+}
+HUEY_BACKEND = os.environ.get('HUEY_BACKEND', 'sqlite')
+HUEY_LOCATION = os.environ.get('HUEY_LOCATION', _UBICACIONES_HUEY.get(HUEY_BACKEND, ''))
+# Para cada cola: número y tipo (`thread` o `process`) de los trabajadores de su consumidor,
+# prioridad de su proceso para el sistema operativo (`nice`; más alto, menos prioritario) y si
+# guarda los resultados de las tareas para consultar su estado.
+COLAS_TAREAS = {
+    # Tareas periódicas
+    'general': {'trabajadores': 1, 'tipo': 'thread', 'nice': 0, 'resultados': False},
+    # Memorias, certificados y «hace constar»
+    'pdf': {
+        'trabajadores': int(os.environ.get('COLA_PDF_TRABAJADORES', 2)),
+        'tipo': 'process',
+        'nice': 10,
+        'resultados': True,
+    },
+    'correo': {'trabajadores': 1, 'tipo': 'thread', 'nice': 0, 'resultados': False},
+    # Consultas a Gestión de Identidades
+    'identidades': {
+        'trabajadores': int(os.environ.get('COLA_IDENTIDADES_TRABAJADORES', 2)),
+        'tipo': 'thread',
+        'nice': 0,
+        'resultados': False,
+    },
+}
+HUEY = crear_huey('general', HUEY_BACKEND, HUEY_LOCATION, COLAS_TAREAS['general']['resultados'])
+# Certificados y «hace constar» generados en segundo plano (fuera de MEDIA_ROOT, que es público).
+DOCUMENTOS_PDF_ROOT = os.environ.get('DOCUMENTOS_PDF_ROOT', str(BASE_DIR / 'cola' / 'documentos'))
+# Segundos tras los que se borran (véase `indo.tasks.borrar_documentos_pdf_caducados`).
+DOCUMENTOS_PDF_VIGENCIA = int(os.environ.get('DOCUMENTOS_PDF_VIGENCIA', 86400))
 
 # Script para crear un ticket en la cola adecuada del sistema de Help Desk
 ADD_TICKET_URL = os.environ.get('ADD_TICKET_URL')
@@ -534,3 +607,5 @@ ADD_TICKET_URL = os.environ.get('ADD_TICKET_URL')
 # Repositorio institucional de documentos
 REPO_WSURL = os.environ.get('REPO_WSURL')
 REPO_EMAIL = os.environ.get('REPO_EMAIL')
+# Tiempo máximo de espera (segundos) de la respuesta del repositorio a cada lote de memorias
+REPO_TIMEOUT = int(os.environ.get('REPO_TIMEOUT', 60))